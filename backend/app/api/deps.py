@@ -1,14 +1,69 @@
+import hmac
+import time
+from dataclasses import dataclass
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.db.models import User
+from app.services.cache import TTLCache
+from app.services import invalidation_bus
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Мінімальний знімок користувача, потрібний для перевірки прав у роутерах.
+    """
+    id: int
+    email: str
+    role: str
+    pharmacy_id: Optional[int]
+    is_active: bool
+
+
+# Ключ - subject токена (email)
+principal_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+_lookup_seconds = {"hit": 0.0, "miss": 0.0}
+
+
+def invalidate_principal(email: str):
+    """
+    Викликати при видаленні користувача або зміні його ролі / аптеки.
+    """
+    principal_cache.delete(email)
+
+
+def _on_principal_event(emails):
+    # Подія з іншого воркера (див. invalidation_bus)
+    if emails is None:
+        principal_cache.clear()
+        return
+    for email in emails:
+        principal_cache.delete(email)
+
+
+invalidation_bus.subscribe("principal", _on_principal_event)
+invalidation_bus.on_full_flush(principal_cache.clear)
+
+
+def principal_cache_stats() -> dict:
+    stats = principal_cache.stats()
+    stats["avg_hit_lookup_ms"] = round(_lookup_seconds["hit"] * 1000 / stats["hits"], 4) if stats["hits"] else 0.0
+    stats["avg_miss_lookup_ms"] = round(_lookup_seconds["miss"] * 1000 / stats["misses"], 4) if stats["misses"] else 0.0
+    return stats
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -21,14 +76,44 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
+
+    started = time.perf_counter()
+    principal = principal_cache.get(email)
+    if principal is not None:
+        _lookup_seconds["hit"] += time.perf_counter() - started
+        return _active(principal)
+
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if user is None:
         raise credentials_exception
-    
-    return user
 
-def get_current_admin(current_user: User = Depends(get_current_user)):
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        role=user.role,
+        pharmacy_id=user.pharmacy_id,
+        is_active=user.is_active
+    )
+    principal_cache.set(email, principal)
+    _lookup_seconds["miss"] += time.perf_counter() - started
+    return _active(principal)
+
+def _active(principal: Principal) -> Principal:
+    # Як і при логіні: деактивований користувач не працює і з ще чинним access-токеном
+    if not principal.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+def get_current_admin(current_user: Principal = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough privileges")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_metrics_reader(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Optional[Principal]:
+    """
+    Доступ до /metrics: спільний токен збирача метрик (METRICS_TOKEN) або JWT адміна.
+    """
+    if settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return None
+    return get_current_admin(await get_current_user(token, db))
@@ -6,9 +6,93 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: str | None = None # за замовчуванням виводиться з DATABASE_URL (asyncpg)
+
+    # Пул з'єднань з БД (окремий пул на кожен рушій і кожен воркер)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800 # секунд; -1 - не перевідкривати
+
+    # Репліка для читання (GET-ендпоінти). Не задано - усе читається з основної БД
+    READ_REPLICA_URL: str | None = None
+    ASYNC_READ_REPLICA_URL: str | None = None
+    READ_YOUR_WRITES_SECONDS: int = 5 # скільки після запису читати з основної БД
+
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 120
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+
+    # Кеш користувачів для get_current_user
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+
+    # Кеш статистики дашбордів
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+
+    # Умовні GET (ETag / 304) для довідників: ліки, аптеки, місця зберігання
+    REFERENCE_CACHE_MAX_ENTRIES: int = 1024 # готові тіла відповідей (по версії й аптеці)
+    REFERENCE_CACHE_TTL_SECONDS: int = 300 # страховка на випадок втраченої події шини
+
+    # Шина інвалідації кешів між воркерами (Postgres LISTEN/NOTIFY; на інших СУБД не запускається)
+    INVALIDATION_BUS_ENABLED: bool = True
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_RECONNECT_MAX_SECONDS: float = 30.0
+
+    # Терміни придатності: щоденний сканер (тривоги партіям, що спливають) і /inventory/expired
+    # None - лише на PostgreSQL (воркери домовляються advisory-блокуванням); на інших СУБД кожен воркер
+    # сканував і списував би паралельно - там true лише для одного процесу або cron (scripts/expiry_scan.py)
+    EXPIRY_SCANNER_ENABLED: bool | None = None
+    EXPIRY_SCAN_INTERVAL_SECONDS: int = 86400
+    EXPIRY_ALERT_DAYS: int = 7 # за скільки днів до терміну піднімати тривогу (warning; прострочено - critical)
+
+    # Масове списання: порція UPDATE (і транзакція) та автосписання прострочених партій сканером
+    DISPOSAL_CHUNK_SIZE: int = 500
+    AUTO_WRITE_OFF_ENABLED: bool = False
+    AUTO_WRITE_OFF_GRACE_DAYS: int = 0 # скільки днів після терміну чекати перед автосписанням
+
+    # Потоковий імпорт партій (накладні постачальників, CSV / NDJSON)
+    BATCH_IMPORT_MAX_ROWS: int = 200000
+    BATCH_IMPORT_CHUNK_SIZE: int = 1000 # рядків на INSERT і транзакцію
+    BATCH_IMPORT_MAX_ERRORS: int = 1000 # скільки помилок рядків повертати у відповіді
+    BATCH_IMPORT_SPOOL_BYTES: int = 8 * 1024 * 1024 # більші тіла запиту буферизуються на диск
+    BATCH_IMPORT_MAX_BYTES: int = 256 * 1024 * 1024 # більше тіло запиту відхиляється (413) ще під час читання
+
+    # Пул процесів для bcrypt (хешування / перевірка паролів)
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_QUEUE_SIZE: int = 32
+    BULK_IMPORT_MAX_ROWS: int = 5000
+    # Окремий постійний пул для масового імпорту; None - ядра, що лишаються після пулу логінів
+    BULK_IMPORT_HASH_WORKERS: int | None = None
+    BULK_IMPORT_MAX_CONCURRENT: int = 1 # одночасних імпортів на воркер, решта отримує 503
+
+    # Обмеження частоти спроб входу (token bucket)
+    LOGIN_RATE_PER_IP_PER_MINUTE: int = 30
+    LOGIN_BURST_PER_IP: int = 10
+    LOGIN_RATE_PER_ACCOUNT_IP_PER_MINUTE: int = 5 # на пару (акаунт, IP)
+    LOGIN_BURST_PER_ACCOUNT_IP: int = 5
+    LOGIN_RATE_PER_ACCOUNT_PER_MINUTE: int = 20 # на акаунт з усіх адрес (підбір з багатьох IP)
+    LOGIN_BURST_PER_ACCOUNT: int = 20
+    RATE_LIMIT_REDIS_URL: str | None = None # спільні ліміти для кількох воркерів (pip install -r requirements-redis.txt)
+
+    # Журнал аудиту: "sync" - у транзакції запиту, "async" - буфер + фоновий пакетний запис
+    AUDIT_MODE: str = "sync"
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_SPILL_DIR: str = "audit_spill" # файли-буфери (по одному на процес); відносний - від каталогу backend
+    AUDIT_SPILL_MAX_ATTEMPTS: int = 5 # повтори рядків з помилкою даних, після яких вони йдуть у файл .dead
+
+    # Швидка серіалізація великих списків (колонки-кортежі + TypeAdapter замість ORM + response_model)
+    FAST_LIST_SERIALIZATION: bool = False
+
+    # Внутрішній ендпоінт /metrics (формат Prometheus)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: str | None = None # токен збирача (Authorization: Bearer); без нього /metrics доступний лише адміну
+    REQUEST_METRICS_SAMPLE_RATE: float = 0.1 # частка запитів з підрахунком SQL (0..1)
+    SLOW_REQUEST_THRESHOLD_MS: int = 500
+    SLOW_REQUEST_TOP_STATEMENTS: int = 5
 
 model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
@@ -0,0 +1,141 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Інструментування запитів: латентність по шаблону маршруту (/inventory/batches/{batch_id}),
+# кількість SQL-запитів і сумарний час у БД на один HTTP-запит.
+# Латентність пишеться для кожного запиту; SQL-статистика збирається лише для частки
+# запитів REQUEST_METRICS_SAMPLE_RATE, щоб хуки курсора не додавали помітних накладних витрат.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route template", ["method", "route", "status"]
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements per request (sampled)", ["method", "route"],
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250)
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Total time spent in SQL per request (sampled)", ["method", "route"]
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """
+    SQL-статистика одного HTTP-запиту. Живе в contextvar, тому потрапляє і в
+    threadpool sync-ендпоінтів, і в greenlet-и AsyncSession.
+    """
+    __slots__ = ("statement_count", "db_time", "statements")
+
+    def __init__(self):
+        self.statement_count = 0
+        self.db_time = 0.0
+        self.statements: Dict[str, List[float]] = {} # текст запиту -> [кількість, сумарний час]
+
+    def record(self, statement: str, elapsed: float):
+        self.statement_count += 1
+        self.db_time += elapsed
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def top_statements(self, limit: int) -> List[dict]:
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {"statement": " ".join(statement.split())[:300], "count": count, "total_ms": round(total * 1000, 2)}
+            for statement, (count, total) in ranked
+        ]
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+# --- ХУКИ SQLALCHEMY ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("request_metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("request_metrics_started")
+    if started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+def instrument_sql(engine):
+    """
+    Підключає підрахунок SQL-запитів до рушія (sync Engine або AsyncEngine.sync_engine).
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- ASGI MIDDLEWARE ---
+def _route_template(scope) -> str:
+    # FastAPI кладе знайдений маршрут у scope["route"]; сирий шлях як мітку не беремо,
+    # інакше кожен /sales/{id} стане окремим рядом метрики
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE) if route is not None else UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats() if random.random() < settings.REQUEST_METRICS_SAMPLE_RATE else None
+        token = _current_stats.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_stats.reset(token)
+            self._observe(scope, status_code, elapsed, stats)
+
+    def _observe(self, scope, status_code: int, elapsed: float, stats: Optional[RequestStats]):
+        method = scope["method"]
+        route = _route_template(scope)
+        REQUEST_LATENCY.observe(elapsed, method=method, route=route, status=status_code)
+        if stats is not None:
+            REQUEST_SQL_STATEMENTS.observe(stats.statement_count, method=method, route=route)
+            REQUEST_DB_TIME.observe(stats.db_time, method=method, route=route)
+
+        if elapsed * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            logger.warning(
+                "Slow request %s %s -> %s in %.1f ms; sql: %s",
+                method, route, status_code, elapsed * 1000,
+                {
+                    "statements": stats.statement_count,
+                    "db_ms": round(stats.db_time * 1000, 2),
+                    "top": stats.top_statements(settings.SLOW_REQUEST_TOP_STATEMENTS)
+                } if stats is not None else "not sampled"
+            )
@@ -1,5 +1,11 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, List, Optional, Union
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -16,4 +22,110 @@ def create_access_token(subject: Union[str, Any]) -> str:
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"exp": expire, "sub": str(subject)}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+def create_refresh_token() -> str:
+    # Непрозорий випадковий токен. У БД зберігається тільки його хеш.
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# --- ПУЛ ДЛЯ BCRYPT ---
+# bcrypt займає ~250 мс CPU на операцію. Виносимо його в окремі процеси (обхід GIL),
+# щоб сплеск логінів не забирав потоки та CPU в інших ендпоінтів.
+
+class PasswordHasherBusy(Exception):
+    """
+    Черга пулу паролів переповнена - запит відхиляється одразу, а не чекає.
+    """
+    pass
+
+_password_executor: Optional[ProcessPoolExecutor] = None
+_password_inflight = 0
+
+def _get_password_executor() -> ProcessPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _password_executor
+
+async def _run_password_task(fn, *args):
+    global _password_inflight
+    if _password_inflight >= settings.PASSWORD_POOL_WORKERS + settings.PASSWORD_POOL_QUEUE_SIZE:
+        raise PasswordHasherBusy()
+
+    _password_inflight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_password_executor(), fn, *args)
+    finally:
+        _password_inflight -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_task(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_password_task(get_password_hash, password)
+
+# --- ПУЛ ДЛЯ МАСОВОГО ІМПОРТУ ---
+# Постійний (без запуску процесів на кожен імпорт) і окремий від пулу логінів;
+# кількість одночасних імпортів обмежена, щоб разом вони не перевантажували CPU.
+
+_import_executor: Optional[ProcessPoolExecutor] = None
+_imports_running = 0
+
+def _import_workers() -> int:
+    if settings.BULK_IMPORT_HASH_WORKERS:
+        return settings.BULK_IMPORT_HASH_WORKERS
+    return max(1, (os.cpu_count() or 1) - settings.PASSWORD_POOL_WORKERS)
+
+def _get_import_executor() -> ProcessPoolExecutor:
+    global _import_executor
+    if _import_executor is None:
+        _import_executor = ProcessPoolExecutor(
+            max_workers=_import_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _import_executor
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [get_password_hash(password) for password in passwords]
+
+async def hash_passwords_async(passwords: List[str]) -> List[str]:
+    """
+    Масове хешування на пулі імпорту. Не більше BULK_IMPORT_MAX_CONCURRENT імпортів
+    одночасно - наступний отримує PasswordHasherBusy (503), а не ділить CPU з попереднім.
+    """
+    global _imports_running
+    if not passwords:
+        return []
+    if _imports_running >= settings.BULK_IMPORT_MAX_CONCURRENT:
+        raise PasswordHasherBusy()
+
+    _imports_running += 1
+    try:
+        workers = _import_workers()
+        chunksize = max(1, len(passwords) // (workers * 4))
+        loop = asyncio.get_running_loop()
+        executor = _get_import_executor()
+        chunks = await asyncio.gather(*[
+            loop.run_in_executor(executor, _hash_many, passwords[start:start + chunksize])
+            for start in range(0, len(passwords), chunksize)
+        ])
+        return [hashed for chunk in chunks for hashed in chunk]
+    finally:
+        _imports_running -= 1
+
+def shutdown_password_executor():
+    global _password_executor, _import_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=True, cancel_futures=True)
+        _password_executor = None
+    if _import_executor is not None:
+        _import_executor.shutdown(wait=True, cancel_futures=True)
+        _import_executor = None
@@ -0,0 +1,59 @@
+from functools import lru_cache
+from typing import List, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing_extensions import TypedDict
+
+# Швидкий шлях для великих списків: замість ORM-об'єктів (identity map, lazy-атрибути)
+# + валідації кожного в response_model + stdlib json - вибираються лише потрібні колонки
+# кортежами і серіалізуються заздалегідь зібраним TypeAdapter у pydantic-core (Rust).
+# Увімкнення - FAST_LIST_SERIALIZATION; формат відповіді той самий, що й у response_model.
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    # TypedDict з полями моделі: рядки-словники серіалізуються без валідації і без попереджень
+    row_type = TypedDict(f"{model.__name__}Row", {name: field.annotation for name, field in model.model_fields.items()})
+    return TypeAdapter(List[row_type])
+
+
+def _row_columns(query, model: Type[BaseModel]):
+    entity = query.column_descriptions[0]["entity"]
+    return [getattr(entity, name) for name in model.model_fields]
+
+
+def dump_rows(rows: List[dict], model: Type[BaseModel]) -> bytes:
+    """
+    JSON списку рядків-словників з полями response_model (без валідації).
+    """
+    return _list_adapter(model).dump_json(rows)
+
+
+async def fast_list_body(db: AsyncSession, query, model: Type[BaseModel]) -> bytes:
+    """
+    Виконує select(Entity)... як select(колонки response_model) і повертає готовий JSON.
+    Фільтри та join-и запиту зберігаються.
+    """
+    result = await db.execute(query.with_only_columns(*_row_columns(query, model)))
+    names = list(model.model_fields)
+    rows = [dict(zip(names, row)) for row in result.tuples()]
+    return dump_rows(rows, model)
+
+
+async def fast_list_response(db: AsyncSession, query, model: Type[BaseModel]) -> Response:
+    return Response(content=await fast_list_body(db, query, model), media_type="application/json")
+
+
+@lru_cache(maxsize=None)
+def _orm_list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def serialize_list(objects, model: Type[BaseModel]) -> bytes:
+    """
+    JSON списку ORM-об'єктів у форматі response_model (для вкладених моделей, де колонок-кортежів замало).
+    """
+    adapter = _orm_list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(objects, from_attributes=True))
@@ -1,9 +1,23 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+from app.core.request_metrics import instrument_sql
 
-engine = create_engine(settings.DATABASE_URL)
+# Налаштування пулу з'єднань (спільні для sync і async рушіїв)
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+)
+
+engine = create_engine(settings.DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+instrument_engine(engine, "primary")
+instrument_sql(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -14,4 +28,49 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# --- АСИНХРОННИЙ ДОСТУП (гарячі маршрути) ---
+def _async_database_url(url: str) -> str:
+    # postgresql:// (psycopg2) -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://
+    driver, _, rest = url.partition("://")
+    dialect = driver.split("+")[0]
+    async_driver = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}.get(dialect, driver)
+    return f"{async_driver}://{rest}"
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL),
+    poolclass=InstrumentedAsyncAdaptedQueuePool,
+    **POOL_OPTIONS
+)
+instrument_engine(async_engine.sync_engine, "primary_async")
+instrument_sql(async_engine.sync_engine)
+
+# expire_on_commit=False: після коміту об'єкти лишаються придатними для серіалізації без lazy-load
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# --- РЕПЛІКА ДЛЯ ЧИТАННЯ ---
+# Без READ_REPLICA_URL фабрики репліки - це фабрики основної БД (один сервер для всього).
+if settings.READ_REPLICA_URL:
+    replica_engine = create_engine(settings.READ_REPLICA_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
+    instrument_engine(replica_engine, "replica")
+    instrument_sql(replica_engine)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+
+    async_replica_engine = create_async_engine(
+        settings.ASYNC_READ_REPLICA_URL or _async_database_url(settings.READ_REPLICA_URL),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **POOL_OPTIONS
+    )
+    instrument_engine(async_replica_engine.sync_engine, "replica_async")
+    instrument_sql(async_replica_engine.sync_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+else:
+    ReplicaSessionLocal = SessionLocal
+    AsyncReplicaSessionLocal = AsyncSessionLocal
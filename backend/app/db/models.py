@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, Text, Date, DateTime, DECIMAL, JSON
+from sqlalchemy import BigInteger, Column, Integer, String, Boolean, ForeignKey, Float, Text, Date, DateTime, DECIMAL, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -28,20 +28,22 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=False)
     role = Column(String, nullable=False) # admin, manager, pharmacist
-    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=True)
+    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=True, index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     pharmacy = relationship("Pharmacy", back_populates="users")
     sales = relationship("Sale", back_populates="seller")
     audit_logs = relationship("AuditLog", back_populates="user")
+    # Сесії видаляє сама БД (ondelete="CASCADE"), без завантаження рядків у сесію ORM
+    sessions = relationship("AuthSession", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 # 3. МІСЦЯ ЗБЕРІГАННЯ
 class StorageLocation(Base):
     __tablename__ = "storage_locations"
 
     id = Column(Integer, primary_key=True, index=True)
-    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=False)
+    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     description = Column(Text)
     is_refrigerated = Column(Boolean, default=False)
@@ -90,6 +92,15 @@ class Batch(Base):
     storage_location = relationship("StorageLocation", back_populates="batches")
     sale_items = relationship("SaleItem", back_populates="batch")
 
+    __table_args__ = (
+        # Партії з залишком за терміном придатності (сканер термінів, /inventory/expired)
+        Index("ix_batches_location_expiry_in_stock", "storage_location_id", "expiration_date",
+              postgresql_where=(current_quantity > 0)),
+        # Перерахунок stock_levels: партії з залишком одних ліків по місцях зберігання аптеки
+        Index("ix_batches_medicine_location_in_stock", "medicine_id", "storage_location_id",
+              postgresql_where=(current_quantity > 0)),
+    )
+
 # 6. IOT ПРИСТРОЇ
 class IoTDevice(Base):
     __tablename__ = "iot_devices"
@@ -123,7 +134,9 @@ class Alert(Base):
     __tablename__ = "alerts"
 
     id = Column(Integer, primary_key=True, index=True)
-    device_id = Column(Integer, ForeignKey("iot_devices.id"), nullable=False)
+    # Тривога датчика (device_id) або терміну придатності партії (batch_id)
+    device_id = Column(Integer, ForeignKey("iot_devices.id"), nullable=True)
+    batch_id = Column(Integer, ForeignKey("batches.id", ondelete="CASCADE"), nullable=True)
     severity = Column(String, nullable=False) # warning, critical
     message = Column(Text, nullable=False)
     is_resolved = Column(Boolean, default=False)
@@ -132,12 +145,22 @@ class Alert(Base):
 
     device = relationship("IoTDevice", back_populates="alerts")
 
+    __table_args__ = (
+        # Активні тривоги (дашборди, перевірка при кожному показнику сенсора)
+        Index("ix_alerts_device_active", "device_id", postgresql_where=(is_resolved == False)),
+        Index("ix_alerts_batch_active", "batch_id", postgresql_where=(is_resolved == False)),
+    )
+
+# Місце зберігання тривоги - датчика або партії. Запит має містити
+# outerjoin(IoTDevice, Alert.device_id == IoTDevice.id) і outerjoin(Batch, Alert.batch_id == Batch.id).
+ALERT_LOCATION_ID = func.coalesce(IoTDevice.storage_location_id, Batch.storage_location_id)
+
 # 9. ПРОДАЖІ
 class Sale(Base):
     __tablename__ = "sales"
 
     id = Column(Integer, primary_key=True, index=True)
-    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=False)
+    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id"), nullable=False, index=True)
     seller_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     total_amount = Column(DECIMAL(10, 2), default=0.00)
     status = Column(String, default="completed")
@@ -170,4 +193,64 @@ class AuditLog(Base):
     details = Column(JSON)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    user = relationship("User", back_populates="audit_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="audit_logs")
+
+    __table_args__ = (
+        # Пагінація по ключу (created_at, id) та типові фільтри розслідувань
+        Index("ix_audit_logs_created_id", "created_at", "id"),
+        Index("ix_audit_logs_action_created", "action", "created_at", "id"),
+        Index("ix_audit_logs_user_created", "user_id", "created_at", "id"),
+    )
+
+# Ключі з details, за якими фільтрується журнал. Ті самі вирази використовуються
+# і в індексах, і в запитах - інакше планувальник індекс не підхопить.
+# Через CAST в індексі нечислові pharmacy_id / sale_id не мають дійти до INSERT -
+# їх відсіює audit_service (_checked_details).
+AUDIT_PHARMACY_ID = AuditLog.details["pharmacy_id"].as_integer()
+AUDIT_BATCH_NUMBER = AuditLog.details["batch_number"].as_string()
+AUDIT_SALE_ID = AuditLog.details["sale_id"].as_integer()
+
+Index("ix_audit_logs_pharmacy_created", AUDIT_PHARMACY_ID, AuditLog.created_at,
+      postgresql_where=AUDIT_PHARMACY_ID.is_not(None))
+Index("ix_audit_logs_batch_number", AUDIT_BATCH_NUMBER,
+      postgresql_where=AUDIT_BATCH_NUMBER.is_not(None))
+Index("ix_audit_logs_sale_id", AUDIT_SALE_ID,
+      postgresql_where=AUDIT_SALE_ID.is_not(None))
+
+# 12. СЕСІЇ (Refresh-токени)
+class AuthSession(Base):
+    __tablename__ = "auth_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False) # sha256 від refresh-токена
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    revoked_at = Column(DateTime(timezone=True))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    user = relationship("User", back_populates="sessions")
+
+# 13. ЗАЛИШКИ ПО АПТЕКАХ (матеріалізований агрегат партій)
+class StockLevel(Base):
+    """
+    Сума current_quantity партій з залишком і найближчий термін придатності по (аптека, ліки).
+    Оновлюється в тій самій транзакції, що й партії (app.services.stock_levels.refresh_stock_levels).
+    """
+    __tablename__ = "stock_levels"
+
+    pharmacy_id = Column(Integer, ForeignKey("pharmacies.id", ondelete="CASCADE"), primary_key=True)
+    medicine_id = Column(Integer, ForeignKey("medicines.id", ondelete="CASCADE"), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    nearest_expiry = Column(Date) # NULL - партій з залишком немає
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# 14. ВЕРСІЇ ДОВІДНИКІВ (ETag умовних GET)
+class ReferenceVersion(Base):
+    """
+    Лічильник змін колекції-довідника, спільний для всіх воркерів: ETag, виданий одним
+    воркером, збігається в будь-якому іншому (app.services.reference_cache).
+    """
+    __tablename__ = "reference_versions"
+
+    collection = Column(String, primary_key=True) # medicines, pharmacies, locations; "locations:<id аптеки>" - одна аптека
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,91 @@
+import time
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import Counter, Gauge, Histogram
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connection checkouts", ["pool"])
+POOL_OVERFLOW_HITS = Counter("db_pool_overflow_checkouts_total", "Checkouts served beyond pool_size", ["pool"])
+POOL_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that hit pool_timeout", ["pool"])
+POOL_CONNECTS = Counter("db_pool_connects_total", "New DBAPI connections opened", ["pool"])
+POOL_INVALIDATIONS = Counter("db_pool_invalidations_total", "Connections invalidated (hard and soft)", ["pool", "kind"])
+
+_pools: Dict[str, QueuePool] = {}
+
+
+def _collect(reader) -> Dict[Tuple, float]:
+    return {(label,): reader(pool) for label, pool in _pools.items()}
+
+Gauge("db_pool_size", "Configured pool_size", ["pool"], collect=lambda: _collect(lambda p: p.size()))
+Gauge("db_pool_in_use", "Connections currently checked out", ["pool"], collect=lambda: _collect(lambda p: p.checkedout()))
+Gauge("db_pool_idle", "Idle connections in the pool", ["pool"], collect=lambda: _collect(lambda p: p.checkedin()))
+Gauge("db_pool_overflow", "Connections open beyond pool_size", ["pool"], collect=lambda: _collect(lambda p: max(0, p.overflow())))
+
+
+class _WaitTimingMixin:
+    """
+    Вимірює очікування на видачу з'єднання. Подія "checkout" спрацьовує вже після
+    отримання з'єднання, тому час очікування знімаємо навколо _do_get().
+    """
+    metrics_label = "default"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(pool=self.metrics_label)
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, pool=self.metrics_label)
+        if self.checkedout() > self.size():
+            POOL_OVERFLOW_HITS.inc(pool=self.metrics_label)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() створює новий пул - переносимо мітку і реєстрацію
+        new_pool = super().recreate()
+        new_pool.metrics_label = self.metrics_label
+        _pools[self.metrics_label] = new_pool
+        return new_pool
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, label: str):
+    """
+    Підключає лічильники до пулу рушія (sync Engine або AsyncEngine.sync_engine).
+    """
+    pool = engine.pool
+    if isinstance(pool, _WaitTimingMixin):
+        pool.metrics_label = label
+        _pools[label] = pool
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        POOL_CHECKOUTS.inc(pool=label)
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        POOL_CONNECTS.inc(pool=label)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        POOL_INVALIDATIONS.inc(pool=label, kind="hard")
+
+    @event.listens_for(engine, "soft_invalidate")
+    def on_soft_invalidate(dbapi_connection, connection_record, exception):
+        POOL_INVALIDATIONS.inc(pool=label, kind="soft")
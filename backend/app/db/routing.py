@@ -0,0 +1,73 @@
+import time
+
+from fastapi import Request
+
+from app.core.config import settings
+from app.db.database import SessionLocal, AsyncSessionLocal, ReplicaSessionLocal, AsyncReplicaSessionLocal
+
+# Маршрутизація читань на репліку з виходом "read-your-writes":
+#  - заголовок X-Read-Your-Writes: 1 - запит читає з основної БД;
+#  - після успішного запису клієнт отримує cookie на READ_YOUR_WRITES_SECONDS,
+#    поки вона діє - його GET-запити теж ідуть в основну БД (репліка може відставати).
+
+READ_YOUR_WRITES_HEADER = "x-read-your-writes"
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _read_from_primary(request: Request) -> bool:
+    if request.headers.get(READ_YOUR_WRITES_HEADER, "").lower() not in ("", "0", "false"):
+        return True
+    until = request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if until is None:
+        return False
+    try:
+        return float(until) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """
+    Сесія для безпечних GET-ендпоінтів: репліка, або основна БД для read-your-writes.
+    """
+    factory = SessionLocal if _read_from_primary(request) else ReplicaSessionLocal
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    factory = AsyncSessionLocal if _read_from_primary(request) else AsyncReplicaSessionLocal
+    async with factory() as db:
+        yield db
+
+
+class ReadYourWritesMiddleware:
+    """
+    Після успішного запиту, що змінює дані (POST/PUT/PATCH/DELETE), ставить
+    cookie з моментом, до якого читання цього клієнта йдуть в основну БД.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS or not settings.READ_REPLICA_URL:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + settings.READ_YOUR_WRITES_SECONDS
+                cookie = (
+                    f"{READ_YOUR_WRITES_COOKIE}={until:.3f}; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode("latin-1"))]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
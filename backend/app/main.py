@@ -1,8 +1,24 @@
-from fastapi import FastAPI
-from app.db.database import engine, Base
+from typing import Optional
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.db.database import SessionLocal
 from app.routers import auth_router, pharmacies_router, inventory_router, iot_router, sales_router, admin_router
+from app.services.stock_index import stock_index
+from app.services.tenant_scope import tenant_scope
+from app.services.medicine_index import medicine_index
+from app.services.reference_cache import collection_versions
+from app.core.config import settings
+from app.api.deps import Principal, get_metrics_reader
+from app.core.security import PasswordHasherBusy, shutdown_password_executor
+from app.services.audit_service import audit_writer
+from app.services.expiry_service import expiry_scanner, scanner_enabled as expiry_scanner_enabled
+from app.services.invalidation_bus import invalidation_listener, is_enabled as invalidation_bus_enabled
+from app.core.metrics import render_prometheus
+from app.core.request_metrics import RequestMetricsMiddleware
+from app.db.routing import ReadYourWritesMiddleware
 
-Base.metadata.create_all(bind=engine)
+# Схема БД керується міграціями (alembic upgrade head) окремим кроком розгортання -
+# під час старту воркера жодного DDL і жодної інтроспекції таблиць.
 
 app = FastAPI(
     title="PharmaSmart API",
@@ -10,6 +26,9 @@ app = FastAPI(
     description="API"
 )
 
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(auth_router.router, prefix="/auth", tags=["Auth"])
 app.include_router(pharmacies_router.router, prefix="/pharmacies", tags=["Pharmacies"])
 app.include_router(inventory_router.router, prefix="/inventory", tags=["Inventory"])
@@ -17,6 +36,56 @@ app.include_router(iot_router.router, prefix="/iot", tags=["IoT Monitoring"])
 app.include_router(sales_router.router, prefix="/sales", tags=["Sales (Business Logic)"])
 app.include_router(admin_router.router, prefix="/admin", tags=["Administration"])
 
+@app.on_event("startup")
+def start_invalidation_listener():
+    # До побудови індексів: LISTEN вже активний, зміни інших воркерів під час побудови не губляться
+    if invalidation_bus_enabled():
+        invalidation_listener.start()
+
+@app.on_event("startup")
+def build_in_memory_indexes():
+    db = SessionLocal()
+    try:
+        stock_index.rebuild(db)
+        tenant_scope.rebuild(db)
+        medicine_index.rebuild(db)
+        collection_versions.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_background_workers():
+    if settings.AUDIT_MODE == "async":
+        audit_writer.start()
+    if expiry_scanner_enabled():
+        expiry_scanner.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    if settings.AUDIT_MODE == "async":
+        audit_writer.stop()
+    invalidation_listener.stop()
+    expiry_scanner.stop()
+    shutdown_password_executor()
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, please retry"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(reader: Optional[Principal] = Depends(get_metrics_reader)):
+    """
+    Внутрішні метрики (пул з'єднань, латентність і SQL по маршрутах) у форматі Prometheus.
+    Лише для збирача з METRICS_TOKEN або адміна.
+    """
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("", status_code=404)
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "PharmaSmart API is running"}
\ No newline at end of file
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from typing import List, Any, Optional
 
 from app.db.database import get_db
-from app.db.models import AuditLog, User, Sale, Alert, Pharmacy, IoTDevice, StorageLocation
-from app.api.deps import get_current_admin, get_current_user # Додали get_current_user
+from app.db.routing import get_read_db
+from app.db.models import AuditLog, User, AUDIT_PHARMACY_ID, AUDIT_BATCH_NUMBER, AUDIT_SALE_ID
+from app.api.deps import get_current_admin, get_current_user, principal_cache_stats # Додали get_current_user
+from app.services.dashboard_service import get_stats, get_stats_by_pharmacy, dashboard_cache
+from app.services.reference_cache import reference_cache_stats
 
 router = APIRouter()
 
@@ -22,20 +26,66 @@ class AuditLogResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _encode_cursor(log: AuditLog) -> str:
+    return base64.urlsafe_b64encode(f"{log.created_at.isoformat()}|{log.id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/audit-logs", response_model=List[AuditLogResponse])
 def read_audit_logs(
-    limit: int = 100,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    action: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    pharmacy_id: Optional[int] = None,
+    batch_number: Optional[str] = None,
+    sale_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_admin)
 ):
     """
-    Перегляд журналу дій. Останні 100 записів.
+    Перегляд журналу дій (від новіших до старіших).
+    Фільтри: дія, користувач, проміжок часу та ключі з details (pharmacy_id, batch_number, sale_id).
+    Пагінація по ключу: наступна сторінка - з cursor із заголовка X-Next-Cursor.
     """
-    return db.query(AuditLog).order_by(AuditLog.created_at.desc()).limit(limit).all()
+    query = db.query(AuditLog)
+
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if since:
+        query = query.filter(AuditLog.created_at >= since)
+    if until:
+        query = query.filter(AuditLog.created_at < until)
+    if pharmacy_id is not None:
+        query = query.filter(AUDIT_PHARMACY_ID == pharmacy_id)
+    if batch_number:
+        query = query.filter(AUDIT_BATCH_NUMBER == batch_number)
+    if sale_id is not None:
+        query = query.filter(AUDIT_SALE_ID == sale_id)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < (cursor_created_at, cursor_id))
+
+    logs = query.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit).all()
+
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = _encode_cursor(logs[-1])
+    return logs
 
 @router.get("/dashboard-stats")
 def get_dashboard_stats(
     pharmacy_id: Optional[int] = None, # Фільтр для адміна
+    # Основна БД: результат кешується на весь TTL, відставання репліки не має в нього потрапити
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user) # Пускаємо і менеджерів
 ):
@@ -54,33 +104,35 @@ def get_dashboard_stats(
     else:
         raise HTTPException(status_code=403, detail="Not enough privileges")
 
-    # --- ПІДГОТОВКА ЗАПИТІВ ---
-    sales_query = db.query(
-        func.count(Sale.id).label("count"),
-        func.sum(Sale.total_amount).label("revenue")
-    )
-    
-    alerts_query = db.query(func.count(Alert.id)).select_from(Alert)\
-        .join(IoTDevice).join(StorageLocation)\
-        .filter(Alert.is_resolved == False)
-
-    staff_query = db.query(func.count(User.id))
+    return get_stats(db, target_pharmacy_id)
 
-    if target_pharmacy_id:
-        sales_query = sales_query.filter(Sale.pharmacy_id == target_pharmacy_id)
-        
-        alerts_query = alerts_query.filter(StorageLocation.pharmacy_id == target_pharmacy_id)
-        
-        staff_query = staff_query.filter(User.pharmacy_id == target_pharmacy_id)
-
-    sales_result = sales_query.first()
-    active_alerts = alerts_query.scalar()
-    staff_count = staff_query.scalar()
+@router.get("/dashboard-stats/by-pharmacy")
+def get_dashboard_stats_by_pharmacy(
+    # Основна БД - як і вище, результат кешується
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Статистика по кожній аптеці одним запитом.
+    - Адмін: усі аптеки мережі.
+    - Менеджер: тільки своя аптека.
+    """
+    if current_user.role == "admin":
+        return get_stats_by_pharmacy(db)
+    elif current_user.role == "manager":
+        if not current_user.pharmacy_id:
+            return []
+        return get_stats_by_pharmacy(db, current_user.pharmacy_id)
+    else:
+        raise HTTPException(status_code=403, detail="Not enough privileges")
 
+@router.get("/cache-stats")
+def get_cache_stats(current_user: User = Depends(get_current_admin)):
+    """
+    Метрики кешу користувачів (hit rate, середній час пошуку).
+    """
     return {
-        "pharmacy_filter": target_pharmacy_id if target_pharmacy_id else "All Network",
-        "total_sales_orders": sales_result.count or 0,
-        "total_revenue": float(sales_result.revenue or 0),
-        "active_alerts": active_alerts or 0,
-        "total_staff": staff_count or 0
-    }
\ No newline at end of file
+        "principal_cache": principal_cache_stats(),
+        "dashboard_cache": dashboard_cache.stats(),
+        "reference_cache": reference_cache_stats()
+    }
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+import csv
+import io
+from fastapi import APIRouter, Depends, HTTPException, status, Body, UploadFile, File, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional, Any
 
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
+from app.db.routing import get_async_read_db
 from app.db.models import User, Pharmacy
-from app.schemas.auth_schemas import Token
-from app.schemas.user_schemas import UserCreate, UserResponse
-from app.core.security import verify_password, get_password_hash, create_access_token
-from app.api.deps import get_current_user
+from app.schemas.auth_schemas import Token, RefreshRequest
+from app.schemas.user_schemas import UserCreate, UserResponse, BulkImportResult
+from app.core.config import settings
+from app.core.security import verify_password_async, get_password_hash_async, hash_passwords_async, create_access_token
+from app.api.deps import get_current_user, invalidate_principal
+from app.services.session_service import open_session, rotate_session, revoke_session, delete_user_sessions, RefreshTokenInvalid
+from app.services.rate_limiter import check_login_allowed
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.invalidation_bus import publish, publish_async
 
 router = APIRouter()
 
@@ -24,30 +36,49 @@ router = APIRouter()
         400: {"description": "Користувач з таким email вже існує"}
     }
 )
-def register_initial_admin(user_in: UserCreate, db: Session = Depends(get_db)):
+async def register_initial_admin(user_in: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Створення користувача без авторизації.
     """
-    if db.query(User).filter(User.email == user_in.email).first():
+    if (await db.execute(select(User.id).where(User.email == user_in.email))).first():
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists.",
         )
+
+    # Завершуємо читальну транзакцію - з'єднання повертається в пул, поки bcrypt рахується в окремому процесі
+    await db.rollback()
     
     new_user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hash_async(user_in.password),
         full_name=user_in.full_name,
         role=user_in.role, # Тут можна передати 'admin'
         pharmacy_id=user_in.pharmacy_id,
         is_active=user_in.is_active
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await publish_async(db, {"dashboard": [new_user.pharmacy_id]})
+    await db.commit()
+    invalidate_dashboard([new_user.pharmacy_id])
+    await db.refresh(new_user)
     return new_user
 
 
+def _resolve_target_pharmacy(current_user: User, user_in: UserCreate) -> Optional[int]:
+    """
+    Правила створення співробітника: в яку аптеку його можна записати.
+    """
+    if current_user.role == "manager":
+        if user_in.role in ["admin", "manager"]:
+             raise HTTPException(status_code=403, detail="Managers can only create Pharmacists")
+        
+        # !ВАЖЛИВО: Менеджер не може обрати аптеку. Примусово ставимо його аптеку.
+        return current_user.pharmacy_id
+
+    return user_in.pharmacy_id
+
+
 # СТВОРЕННЯ СПІВРОБІТНИКІВ (Захищений маршрут)
 @router.post(
     "/users",
@@ -61,47 +92,186 @@ def register_initial_admin(user_in: UserCreate, db: Session = Depends(get_db)):
         400: {"description": "Email зайнятий"}
     }
 )
-def create_employee(
+async def create_employee(
     user_in: UserCreate, 
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_current_user)
 ):
     if current_user.role == "pharmacist":
         raise HTTPException(status_code=403, detail="Pharmacists cannot create users")
 
-    if current_user.role == "manager":
-        if user_in.role in ["admin", "manager"]:
-             raise HTTPException(status_code=403, detail="Managers can only create Pharmacists")
-        
-        # !ВАЖЛИВО: Менеджер не може обрати аптеку. Примусово ставимо його аптеку.
-        target_pharmacy_id = current_user.pharmacy_id
-    
-    elif current_user.role == "admin":
-        target_pharmacy_id = user_in.pharmacy_id
+    target_pharmacy_id = _resolve_target_pharmacy(current_user, user_in)
 
     if target_pharmacy_id:
-        pharmacy = db.query(Pharmacy).filter(Pharmacy.id == target_pharmacy_id).first()
+        pharmacy = (await db.execute(select(Pharmacy.id).where(Pharmacy.id == target_pharmacy_id))).first()
         if not pharmacy:
             raise HTTPException(status_code=404, detail="Pharmacy not found")
 
-    if db.query(User).filter(User.email == user_in.email).first():
+    if (await db.execute(select(User.id).where(User.email == user_in.email))).first():
         raise HTTPException(status_code=400, detail="Email already registered")
 
+    # Завершуємо читальну транзакцію - з'єднання повертається в пул, поки bcrypt рахується в окремому процесі
+    await db.rollback()
+
     new_user = User(
         email=user_in.email,
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hash_async(user_in.password),
         full_name=user_in.full_name,
         role=user_in.role,
         pharmacy_id=target_pharmacy_id, # Використовуємо обчислене значення
         is_active=True
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await publish_async(db, {"dashboard": [target_pharmacy_id]})
+    await db.commit()
+    invalidate_dashboard([target_pharmacy_id])
+    await db.refresh(new_user)
     return new_user
 
 
 
+# МАСОВИЙ ІМПОРТ СПІВРОБІТНИКІВ
+def _raw_email(raw: dict) -> Optional[str]:
+    # Рядок, що не пройшов валідацію, може містити будь-що (число, список) - у відповідь лише рядок
+    email = raw.get("email")
+    return str(email) if email is not None else None
+
+
+async def _import_users(rows: List[dict], db: AsyncSession, current_user: User) -> dict:
+    if current_user.role == "pharmacist":
+        raise HTTPException(status_code=403, detail="Pharmacists cannot create users")
+    if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Too many rows (max {settings.BULK_IMPORT_MAX_ROWS})")
+
+    errors = []
+    candidates = [] # (номер рядка, UserCreate, аптека)
+    seen_emails = set()
+
+    # 1. Валідація полів і прав - без звернень до БД
+    for row_number, raw in enumerate(rows, start=1):
+        try:
+            user_in = UserCreate.model_validate(raw)
+            target_pharmacy_id = _resolve_target_pharmacy(current_user, user_in)
+        except ValidationError as e:
+            errors.append({"row": row_number, "email": _raw_email(raw), "detail": str(e.errors()[0]["msg"])})
+            continue
+        except HTTPException as e:
+            errors.append({"row": row_number, "email": _raw_email(raw), "detail": e.detail})
+            continue
+
+        if user_in.email in seen_emails:
+            errors.append({"row": row_number, "email": user_in.email, "detail": "Duplicate email in import"})
+            continue
+        seen_emails.add(user_in.email)
+        candidates.append((row_number, user_in, target_pharmacy_id))
+
+    # 2. Один запит на всі email і один - на всі аптеки
+    emails = [user_in.email for _, user_in, _ in candidates]
+    pharmacy_ids = {pid for _, _, pid in candidates if pid}
+    taken_emails = set((await db.execute(select(User.email).where(User.email.in_(emails)))).scalars()) if emails else set()
+    known_pharmacies = set((await db.execute(select(Pharmacy.id).where(Pharmacy.id.in_(pharmacy_ids)))).scalars()) if pharmacy_ids else set()
+
+    valid = []
+    for row_number, user_in, target_pharmacy_id in candidates:
+        if user_in.email in taken_emails:
+            errors.append({"row": row_number, "email": user_in.email, "detail": "Email already registered"})
+        elif target_pharmacy_id and target_pharmacy_id not in known_pharmacies:
+            errors.append({"row": row_number, "email": user_in.email, "detail": "Pharmacy not found"})
+        else:
+            valid.append((row_number, user_in, target_pharmacy_id))
+
+    # Завершуємо читальну транзакцію - з'єднання повертається в пул, поки bcrypt рахується в окремих процесах
+    await db.rollback()
+
+    # 3. Паралельне хешування на пулі імпорту
+    hashes = await hash_passwords_async([user_in.password for _, user_in, _ in valid])
+
+    # 4. Одна транзакція, одна пакетна вставка. Email, який паралельний запит зайняв після перевірки,
+    # не валить увесь пакет: такий рядок пропускається (ON CONFLICT DO NOTHING) і стає помилкою
+    created = []
+    if valid:
+        upsert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        inserted = set((await db.execute(
+            upsert(User).on_conflict_do_nothing(index_elements=[User.email]).returning(User.email),
+            [
+                {
+                    "email": user_in.email,
+                    "hashed_password": hashed,
+                    "full_name": user_in.full_name,
+                    "role": user_in.role,
+                    "pharmacy_id": target_pharmacy_id,
+                    "is_active": True
+                }
+                for (_, user_in, target_pharmacy_id), hashed in zip(valid, hashes)
+            ]
+        )).scalars())
+        for row_number, user_in, target_pharmacy_id in valid:
+            if user_in.email in inserted:
+                created.append(target_pharmacy_id)
+            else:
+                errors.append({"row": row_number, "email": user_in.email, "detail": "Email already registered"})
+
+    if created:
+        dashboard = list(set(created))
+        await publish_async(db, {"dashboard": dashboard})
+        await db.commit()
+        invalidate_dashboard(dashboard)
+    else:
+        await db.rollback()
+
+    errors.sort(key=lambda e: e["row"])
+    return {"created": len(created), "errors": errors}
+
+
+@router.post(
+    "/users/bulk",
+    response_model=BulkImportResult,
+    summary="Масовий імпорт співробітників (JSON)",
+    description="Ті самі правила, що й POST /auth/users. Помилки повертаються по рядках, валідні рядки створюються.",
+    responses={
+        403: {"description": "Фармацевтам доступ заборонено"},
+        413: {"description": "Забагато рядків"},
+        503: {"description": "Вже виконується інший імпорт"}
+    }
+)
+async def bulk_create_employees(
+    rows: List[dict] = Body(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await _import_users(rows, db, current_user)
+
+
+@router.post(
+    "/users/bulk/csv",
+    response_model=BulkImportResult,
+    summary="Масовий імпорт співробітників (CSV)",
+    description="Колонки: email, full_name, role, password, pharmacy_id.",
+    responses={
+        400: {"description": "Файл неможливо розібрати (не UTF-8, зламаний CSV)"},
+        403: {"description": "Фармацевтам доступ заборонено"},
+        413: {"description": "Забагато рядків"},
+        503: {"description": "Вже виконується інший імпорт"}
+    }
+)
+async def bulk_create_employees_csv(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+        rows = [
+            {key: value for key, value in row.items() if value not in (None, "")}
+            for row in csv.DictReader(io.StringIO(content))
+        ]
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File is not valid UTF-8")
+    except csv.Error as e:
+        raise HTTPException(status_code=400, detail=f"Malformed CSV: {e}")
+    return await _import_users(rows, db, current_user)
+
+
 # ВХІД В СИСТЕМУ
 @router.post(
     "/login",
@@ -109,13 +279,32 @@ def create_employee(
     summary="Вхід (Отримання токена)",
     responses={
         401: {"description": "Невірний логін або пароль"},
-        400: {"description": "Користувач неактивний"}
+        400: {"description": "Користувач неактивний"},
+        429: {"description": "Забагато спроб входу"}
     }
 )
-def login_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login_access_token(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Ліміт перевіряється ДО звернення до БД і bcrypt
+    allowed, retry_after = await check_login_allowed(request.client.host if request.client else None, form_data.username)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    # Лише потрібні колонки: рядок лишається придатним після завершення транзакції
+    user = (await db.execute(
+        select(User.id, User.email, User.hashed_password, User.is_active).where(User.email == form_data.username)
+    )).first()
+    # Завершуємо читальну транзакцію - з'єднання повертається в пул, поки bcrypt рахується в окремому процесі
+    await db.rollback()
     
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -126,7 +315,45 @@ def login_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Ses
         raise HTTPException(status_code=400, detail="Inactive user")
 
     access_token = create_access_token(subject=user.email)
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = open_session(db, user.id)
+    await db.commit()
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+# ОНОВЛЕННЯ ТОКЕНА (без перевірки пароля)
+@router.post(
+    "/refresh",
+    response_model=Token,
+    summary="Оновлення access-токена",
+    description="Приймає refresh-токен, відкликає його і видає нову пару токенів.",
+    responses={
+        401: {"description": "Refresh-токен недійсний, прострочений або відкликаний"}
+    }
+)
+def refresh_access_token(body: RefreshRequest, db: Session = Depends(get_db)):
+    try:
+        email, refresh_token = rotate_session(db, body.refresh_token)
+    except RefreshTokenInvalid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    access_token = create_access_token(subject=email)
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
+# ВИХІД (Відкликання сесії)
+@router.post(
+    "/logout",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Вихід із системи",
+    description="Відкликає refresh-токен. Access-токен діє до кінця свого короткого терміну."
+)
+def logout(body: RefreshRequest, db: Session = Depends(get_db)):
+    revoke_session(db, body.refresh_token)
+    return None
 
 
 
@@ -165,8 +392,13 @@ def delete_user(
     
     # Адмін проходить без перевірок
 
+    email, dashboard = user_to_delete.email, [user_to_delete.pharmacy_id]
+    delete_user_sessions(db, user_to_delete.id)
     db.delete(user_to_delete)
+    publish(db, {"principal": [email], "dashboard": dashboard})
     db.commit()
+    invalidate_principal(email)
+    invalidate_dashboard(dashboard)
     return None
 
 
@@ -180,22 +412,23 @@ def delete_user(
         403: {"description": "Фармацевтам доступ заборонено"}
     }
 )
-def read_users(
+async def read_users(
     pharmacy_id: Optional[int] = None, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(User)
+    query = select(User)
 
     if current_user.role == "admin":
         if pharmacy_id:
-            query = query.filter(User.pharmacy_id == pharmacy_id)
+            query = query.where(User.pharmacy_id == pharmacy_id)
     
     elif current_user.role == "manager":
         # Жорстка фільтрація: Тільки своя аптека
-        query = query.filter(User.pharmacy_id == current_user.pharmacy_id)
+        query = query.where(User.pharmacy_id == current_user.pharmacy_id)
     
     else:
         raise HTTPException(status_code=403, detail="Not enough privileges")
 
-    return query.all()
\ No newline at end of file
+    result = await db.execute(query)
+    return result.scalars().all()
\ No newline at end of file
@@ -1,13 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import tempfile
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, timedelta
 
-from app.db.database import get_db
-from app.db.models import Medicine, Batch, StorageLocation, User, Pharmacy
-from app.schemas.inventory_schemas import MedicineCreate, MedicineResponse, BatchCreate, BatchResponse, BatchDispose
+from app.core.config import settings
+from app.core.serialization import dump_rows, fast_list_body, fast_list_response
+from app.db.database import get_db, get_async_db
+from app.db.routing import get_async_read_db
+from app.db.models import Medicine, Batch, User, Pharmacy, StockLevel
+from app.schemas.inventory_schemas import MedicineCreate, MedicineResponse, BatchCreate, BatchResponse, BatchDispose, BatchBulkDispose, BatchBulkDisposeResult, BatchImportResult, MedicineAvailability, StockLevelResponse
 from app.api.deps import get_current_user, get_current_admin
 from app.services.audit_service import log_action
+from app.services.batch_import import ImportMalformed, ImportTooLarge, import_batches
+from app.services.disposal_service import write_off_batches
+from app.services.invalidation_bus import publish
+from app.services.stock_index import stock_index
+from app.services.stock_levels import refresh_stock_levels
+from app.services.tenant_scope import tenant_scope, in_pharmacy, scope_query, target_pharmacy
+from app.services.reference_cache import MEDICINES, bump_versions, collection_versions, conditional_response
+from app.services.medicine_index import medicine_index, medicine_row
 
 router = APIRouter()
 
@@ -29,21 +45,57 @@ def create_medicine(
 ):
     db_medicine = Medicine(**medicine.model_dump())
     db.add(db_medicine)
+    db.flush()
+    versions = bump_versions(db, MEDICINES)
+    publish(db, {"medicine": [db_medicine.id], "reference": versions})
     db.commit()
     db.refresh(db_medicine)
+    medicine_index.upsert(medicine_row(db_medicine))
+    collection_versions.advance(versions)
     return db_medicine
 
+def _encode_cursor(key) -> str:
+    rank, name, medicine_id = key
+    return base64.urlsafe_b64encode(f"{rank}|{medicine_id}|{name}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        rank, medicine_id, name = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 2)
+        return int(rank), name, int(medicine_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get(
     "/medicines",
     response_model=List[MedicineResponse],
     summary="Отримати список ліків",
-    description="Доступно всім авторизованим користувачам."
+    description=(
+        "Доступно всім авторизованим користувачам. Без параметрів - увесь довідник (підтримує If-None-Match). "
+        "З q / manufacturer / prescription / cursor / limit - пошук по індексу в пам'яті: спершу назви, що "
+        "починаються з q, далі збіги підрядка в назві чи виробнику; наступна сторінка - cursor із X-Next-Cursor."
+    )
 )
-def get_medicines(
-    db: Session = Depends(get_db),
+async def get_medicines(
+    request: Request,
+    q: Optional[str] = None,
+    manufacturer: Optional[str] = None,
+    prescription: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    # Основна БД: тіло кешується під версією до наступної зміни, відставання репліки закешувалось би теж
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Medicine).all()
+    if q or manufacturer or prescription is not None or cursor or limit:
+        after = _decode_cursor(cursor) if cursor else None
+        rows, next_key = medicine_index.search(q, manufacturer, prescription, after=after, limit=limit or 50)
+        headers = {"X-Next-Cursor": _encode_cursor(next_key)} if next_key else None
+        return Response(content=dump_rows(rows, MedicineResponse), media_type="application/json", headers=headers)
+
+    return await conditional_response(
+        request, db, MEDICINES, None,
+        lambda: fast_list_body(db, select(Medicine), MedicineResponse)
+    )
 
 @router.delete(
     "/medicines/{medicine_id}",
@@ -66,7 +118,11 @@ def delete_medicine(
     # Тут може виникнути помилка IntegrityError, якщо є партії цих ліків.
     # Але це правильно - не можна видаляти ліки, які є на складі.
     db.delete(medicine)
+    versions = bump_versions(db, MEDICINES)
+    publish(db, {"medicine": [medicine_id], "reference": versions})
     db.commit()
+    medicine_index.remove(medicine_id)
+    collection_versions.advance(versions)
     return None
 
 
@@ -87,12 +143,12 @@ def add_batch(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    location = db.query(StorageLocation).filter(StorageLocation.id == batch.storage_location_id).first()
-    if not location:
+    location_pharmacy_id = tenant_scope.pharmacy_of_location(batch.storage_location_id, db)
+    if location_pharmacy_id is None:
         raise HTTPException(status_code=404, detail="Storage location not found")
 
     if current_user.role != "admin":
-        if location.pharmacy_id != current_user.pharmacy_id:
+        if location_pharmacy_id != current_user.pharmacy_id:
             raise HTTPException(
                 status_code=403, 
                 detail="You can only add batches to your own pharmacy storage locations"
@@ -104,32 +160,91 @@ def add_batch(
 
     db_batch = Batch(**batch.model_dump())
     db.add(db_batch)
+    db.flush()
+    refresh_stock_levels(db, [(location_pharmacy_id, db_batch.medicine_id)])
+    publish(db, {"batch": [db_batch.id]})
     db.commit()
     db.refresh(db_batch)
+    stock_index.upsert_batch(
+        db_batch.id, db_batch.medicine_id, location_pharmacy_id,
+        db_batch.current_quantity, db_batch.expiration_date
+    )
     return db_batch
 
+# Формат імпорту за Content-Type, якщо не задано параметром format
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+
+@router.post(
+    "/batches/import",
+    response_model=BatchImportResult,
+    summary="Масовий прийом товару (CSV / NDJSON)",
+    description=(
+        "Тіло запиту - файл накладної: CSV з заголовком або NDJSON (об'єкт на рядок) з полями BatchCreate; "
+        "current_quantity за замовчуванням дорівнює initial_quantity. Ті самі правила, що й POST /inventory/batches. "
+        "Помилкові рядки пропускаються і повертаються у відповіді, валідні - створюються."
+    ),
+    responses={
+        400: {"description": "Файл неможливо розібрати (не UTF-8, зламаний CSV)"},
+        413: {"description": "Забагато рядків або завеликий файл"},
+        415: {"description": "Невідомий формат (ні CSV, ні NDJSON)"}
+    }
+)
+async def import_batches_stream(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = format or IMPORT_CONTENT_TYPES.get(content_type)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson (or pass ?format=)")
+
+    too_large = HTTPException(status_code=413, detail=f"File too large (max {settings.BATCH_IMPORT_MAX_BYTES} bytes)")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > settings.BATCH_IMPORT_MAX_BYTES:
+        raise too_large
+
+    # Тіло читається потоком: невеликі файли - у пам'яті, більші - у тимчасовому файлі на диску.
+    # Ліміт рахується по прочитаному: Content-Length може бути відсутнім (chunked) або неправдивим
+    with tempfile.SpooledTemporaryFile(max_size=settings.BATCH_IMPORT_SPOOL_BYTES) as spool:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > settings.BATCH_IMPORT_MAX_BYTES:
+                raise too_large
+            spool.write(chunk)
+        try:
+            return await run_in_threadpool(import_batches, db, spool, fmt, current_user)
+        except ImportTooLarge:
+            raise HTTPException(status_code=413, detail=f"Too many rows (max {settings.BATCH_IMPORT_MAX_ROWS})")
+        except ImportMalformed as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
 @router.get(
     "/batches",
     response_model=List[BatchResponse],
     summary="Перегляд залишків на складі",
     description="Адмін бачить все (може фільтрувати). Менеджер - тільки свою аптеку."
 )
-def read_batches(
+async def read_batches(
     pharmacy_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Batch).join(StorageLocation)
+    query = scope_query(select(Batch), current_user, pharmacy_id, location_column=Batch.storage_location_id)
+    if query is None:
+        return []
 
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.filter(StorageLocation.pharmacy_id == pharmacy_id)
-    else:
-        if not current_user.pharmacy_id:
-            return []
-        query = query.filter(StorageLocation.pharmacy_id == current_user.pharmacy_id)
-
-    return query.all()
+    if settings.FAST_LIST_SERIALIZATION:
+        return await fast_list_response(db, query, BatchResponse)
+    result = await db.execute(query)
+    return result.scalars().all()
 
 @router.delete(
     "/batches/{batch_id}",
@@ -149,21 +264,104 @@ def delete_batch(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
 
+    batch_pharmacy_id = tenant_scope.pharmacy_of_location(batch.storage_location_id, db)
     if current_user.role != "admin":
-        location = db.query(StorageLocation).filter(StorageLocation.id == batch.storage_location_id).first()
-        
-        if not location or location.pharmacy_id != current_user.pharmacy_id:
+        if batch_pharmacy_id != current_user.pharmacy_id:
             raise HTTPException(status_code=403, detail="You can only delete batches in your pharmacy")
 
+    medicine_id = batch.medicine_id
     db.delete(batch)
+    db.flush()
+    refresh_stock_levels(db, [(batch_pharmacy_id, medicine_id)])
+    publish(db, {"batch": [batch_id]})
     db.commit()
+    stock_index.remove_batch(batch_id)
     return None
 
+# НАЯВНІСТЬ У МЕРЕЖІ ("У якій аптеці є?")
+@router.get(
+    "/availability",
+    response_model=List[MedicineAvailability],
+    summary="Пошук наявності ліків у мережі",
+    description="Шукає по medicine_id або по префіксу назви (q). Відповідь з in-memory індексу, без запитів до БД."
+)
+def get_availability(
+    medicine_id: Optional[int] = None,
+    q: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    if medicine_id is not None:
+        medicine = medicine_index.get(medicine_id)
+        medicines = [(medicine_id, medicine["name"] if medicine else None)]
+    elif q:
+        medicines = [(row["id"], row["name"]) for row in medicine_index.search_prefix(q, limit=limit)]
+    else:
+        raise HTTPException(status_code=400, detail="Provide medicine_id or q")
+
+    result = []
+    for mid, name in medicines:
+        stock = stock_index.availability(mid)
+        pharmacies = sorted(stock.items(), key=lambda item: item[1], reverse=True)
+        result.append({
+            "medicine_id": mid,
+            "medicine_name": name,
+            "pharmacies": [{"pharmacy_id": pid, "quantity": qty} for pid, qty in pharmacies]
+        })
+    return result
+
+# ЗАЛИШКИ АПТЕКИ (матеріалізована таблиця stock_levels)
+def _stock_pharmacy(current_user: User, pharmacy_id: Optional[int]) -> int:
+    visible, target_pharmacy_id = target_pharmacy(current_user, pharmacy_id)
+    if not visible:
+        raise HTTPException(status_code=403, detail="Not enough privileges")
+    if target_pharmacy_id is None:
+        raise HTTPException(status_code=400, detail="Provide pharmacy_id")
+    return target_pharmacy_id
+
+@router.get(
+    "/stock-levels",
+    response_model=List[StockLevelResponse],
+    summary="Залишки аптеки по всіх ліках",
+    description="Сума залишків партій і найближчий термін придатності. Адмін - pharmacy_id обов'язковий, решта - своя аптека."
+)
+async def read_stock_levels(
+    pharmacy_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    target_pharmacy_id = _stock_pharmacy(current_user, pharmacy_id)
+    # Діапазон по префіксу первинного ключа (pharmacy_id, medicine_id)
+    query = select(StockLevel).where(StockLevel.pharmacy_id == target_pharmacy_id, StockLevel.quantity > 0)\
+        .order_by(StockLevel.medicine_id)
+    if settings.FAST_LIST_SERIALIZATION:
+        return await fast_list_response(db, query, StockLevelResponse)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.get(
+    "/stock-levels/{medicine_id}",
+    response_model=StockLevelResponse,
+    summary="Залишок ліків в аптеці",
+    description="Один пошук за первинним ключем (pharmacy_id, medicine_id). Немає запису - залишок 0."
+)
+async def read_stock_level(
+    medicine_id: int,
+    pharmacy_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    target_pharmacy_id = _stock_pharmacy(current_user, pharmacy_id)
+    level = await db.get(StockLevel, (target_pharmacy_id, medicine_id))
+    if level is None:
+        return {"pharmacy_id": target_pharmacy_id, "medicine_id": medicine_id, "quantity": 0}
+    return level
+
 @router.get("/expired", response_model=List[BatchResponse])
-def get_expired_batches(
+async def get_expired_batches(
     days_to_expire: int = 0,
     pharmacy_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -171,25 +369,37 @@ def get_expired_batches(
     - days_to_expire=0: Покаже тільки те, що ВЖЕ прострочено (сьогодні або раніше).
     - days_to_expire=30: Покаже те, що прострочено + те, що зіпсується за 30 днів.
     """
-    today = date.today()
-    target_date = today + timedelta(days=days_to_expire)
-    
-    # Шукаємо партії де дата закінчення <= (сьогодні + N днів)
-    # І при цьому товару має бути > 0
-    query = db.query(Batch).join(StorageLocation).filter(
+    target_date = date.today() + timedelta(days=days_to_expire)
+
+    # Діапазонний запит по частковому індексу (storage_location_id, expiration_date) WHERE current_quantity > 0.
+    # Саме БД, а не індекс у пам'яті: партії, додані чи продані іншим воркером, видно одразу
+    query = select(Batch).where(
         Batch.expiration_date <= target_date,
         Batch.current_quantity > 0
     )
+    query = scope_query(query, current_user, pharmacy_id, location_column=Batch.storage_location_id)
+    if query is None:
+        return []
 
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.filter(StorageLocation.pharmacy_id == pharmacy_id)
-    else:
-        if not current_user.pharmacy_id:
-            return []
-        query = query.filter(StorageLocation.pharmacy_id == current_user.pharmacy_id)
+    result = await db.execute(query.order_by(Batch.expiration_date.asc(), Batch.id.asc()))
+    return result.scalars().all()
 
-    return query.order_by(Batch.expiration_date.asc()).all()
+@router.get("/expiry-buckets", summary="Кошики терміну придатності")
+def get_expiry_buckets(
+    pharmacy_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Партії та кількість товару за терміном придатності: прострочено, до 7, до 30 і до 90 днів.
+    Рахується з індексу наявності в пам'яті (оновлюється після кожної складської операції).
+    """
+    visible, target_pharmacy_id = target_pharmacy(current_user, pharmacy_id)
+    if not visible:
+        raise HTTPException(status_code=403, detail="Not enough privileges")
+    return {
+        "pharmacy_id": target_pharmacy_id,
+        "buckets": stock_index.expiry_buckets(target_pharmacy_id)
+    }
 
 # СПИСАННЯ ТОВАРУ (Disposal)
 @router.post("/dispose", status_code=status.HTTP_200_OK)
@@ -206,16 +416,18 @@ def dispose_batch(
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
 
-    location = db.query(StorageLocation).filter(StorageLocation.id == batch.storage_location_id).first()
+    location_pharmacy_id = tenant_scope.pharmacy_of_location(batch.storage_location_id, db)
     
     if current_user.role != "admin":
-        if location.pharmacy_id != current_user.pharmacy_id:
+        if location_pharmacy_id != current_user.pharmacy_id:
              raise HTTPException(status_code=403, detail="You can only dispose items in your pharmacy")
 
     if batch.current_quantity < disposal_data.quantity:
         raise HTTPException(status_code=400, detail="Not enough items to dispose")
 
     batch.current_quantity -= disposal_data.quantity
+    db.flush()
+    refresh_stock_levels(db, [(location_pharmacy_id, batch.medicine_id)])
 
     # Запис в Аудит 
     log_action(
@@ -227,9 +439,44 @@ def dispose_batch(
             "medicine_id": batch.medicine_id,
             "quantity_removed": disposal_data.quantity,
             "reason": disposal_data.reason,
-            "pharmacy_id": location.pharmacy_id
+            "pharmacy_id": location_pharmacy_id
         }
     )
 
+    publish(db, {"batch": [batch.id]})
     db.commit()
-    return {"message": "Batch disposed successfully", "remaining_quantity": batch.current_quantity}
\ No newline at end of file
+    stock_index.set_quantity(batch.id, batch.current_quantity)
+    return {"message": "Batch disposed successfully", "remaining_quantity": batch.current_quantity}
+
+# МАСОВЕ СПИСАННЯ (наприклад, прострочене на кінець місяця)
+@router.post("/dispose/bulk", response_model=BatchBulkDisposeResult, status_code=status.HTTP_200_OK)
+def dispose_batches_bulk(
+    disposal_data: BatchBulkDispose,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Списання всього залишку партій: вказаних (batch_ids) або всіх прострочених на дату expired_on.
+    Права ті самі, що й у /dispose: Адмін - будь-яка аптека, решта - тільки своя.
+    Виконується порціями set-based запитів (UPDATE ... RETURNING + один INSERT в аудит на порцію).
+    """
+    visible, target_pharmacy_id = target_pharmacy(current_user, disposal_data.pharmacy_id)
+    if not visible:
+        raise HTTPException(status_code=403, detail="You can only dispose items in your pharmacy")
+
+    conditions = []
+    if target_pharmacy_id is not None:
+        conditions.append(in_pharmacy(Batch.storage_location_id, target_pharmacy_id))
+    if disposal_data.batch_ids:
+        conditions.append(Batch.id.in_(disposal_data.batch_ids))
+        if current_user.role != "admin":
+            # Як і в /dispose: чужа партія - 403, а не тихий пропуск
+            locations = db.execute(
+                select(Batch.storage_location_id).where(Batch.id.in_(disposal_data.batch_ids)).distinct()
+            ).scalars().all()
+            if any(tenant_scope.pharmacy_of_location(location_id, db) != current_user.pharmacy_id for location_id in locations):
+                raise HTTPException(status_code=403, detail="You can only dispose items in your pharmacy")
+    if disposal_data.expired_on is not None or not disposal_data.batch_ids:
+        conditions.append(Batch.expiration_date <= (disposal_data.expired_on or date.today()))
+
+    return write_off_batches(db, current_user.id, disposal_data.reason, conditions)
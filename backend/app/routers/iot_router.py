@@ -1,13 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager
 from typing import List, Optional
 from datetime import datetime
 
-from app.db.database import get_db
-from app.db.models import IoTDevice, SensorReading, Medicine, Batch, Alert, User, StorageLocation
-from app.schemas.iot_schemas import IoTDeviceCreate, IoTDeviceResponse, SensorReadingCreate, SensorReadingResponse
+from app.core.config import settings
+from app.core.serialization import fast_list_response
+from app.db.database import get_db, get_async_db
+from app.db.routing import get_async_read_db
+from app.db.models import IoTDevice, SensorReading, Medicine, Batch, Alert, User, ALERT_LOCATION_ID
+from app.schemas.iot_schemas import IoTDeviceCreate, IoTDeviceResponse, SensorReadingCreate, SensorReadingResponse, AlertResponse
 from app.api.deps import get_current_user, get_current_admin
 from app.services.audit_service import log_action
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.invalidation_bus import publish, publish_async
+from app.services.tenant_scope import tenant_scope, scope_query
 
 router = APIRouter()
 
@@ -28,15 +36,15 @@ def register_device(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    location = db.query(StorageLocation).filter(StorageLocation.id == device.storage_location_id).first()
-    if not location:
+    location_pharmacy_id = tenant_scope.pharmacy_of_location(device.storage_location_id, db)
+    if location_pharmacy_id is None:
         raise HTTPException(status_code=404, detail="Storage location not found")
 
     if current_user.role != "admin":
         if current_user.role == "pharmacist":
              raise HTTPException(status_code=403, detail="Pharmacists cannot register devices")
         
-        if location.pharmacy_id != current_user.pharmacy_id:
+        if location_pharmacy_id != current_user.pharmacy_id:
             raise HTTPException(
                 status_code=403, 
                 detail="You can only register devices in your pharmacy"
@@ -53,8 +61,11 @@ def register_device(
         storage_location_id=device.storage_location_id
     )
     db.add(db_device)
+    db.flush()
+    publish(db, {"device": [db_device.id]})
     db.commit()
     db.refresh(db_device)
+    tenant_scope.set_device(db_device.id, db_device.storage_location_id)
     return db_device
 
 
@@ -65,12 +76,20 @@ def register_device(
     summary="Прийом телеметрії",
     description="Аналізує Температуру ТА Вологість."
 )
-def receive_metrics(
+async def receive_metrics(
     serial_number: str, 
     reading: SensorReadingCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    device = db.query(IoTDevice).filter(IoTDevice.serial_number == serial_number).first()
+    # Датчик разом з його активними тривогами - одним запитом (у device.alerts лише незакриті)
+    result = await db.execute(
+        select(IoTDevice)
+        .outerjoin(Alert, and_(Alert.device_id == IoTDevice.id, Alert.is_resolved == False))
+        .options(contains_eager(IoTDevice.alerts))
+        .where(IoTDevice.serial_number == serial_number)
+        .order_by(Alert.id)
+    )
+    device = result.unique().scalars().first()
     if not device:
         raise HTTPException(status_code=404, detail="Device not found")
 
@@ -81,16 +100,19 @@ def receive_metrics(
         battery_level=reading.battery_level
     )
     db.add(db_reading)
+    alerts_changed = False
     
     if device.storage_location_id:
         
-        active_alerts = db.query(Alert).filter(
-            Alert.device_id == device.id, 
-            Alert.is_resolved == False
-        ).all()
+        active_alerts = list(device.alerts)
 
-        batches_here = db.query(Batch).filter(Batch.storage_location_id == device.storage_location_id).all()
-        unique_medicines = {batch.medicine for batch in batches_here}
+        # Унікальні ліки на цьому місці зберігання - одним запитом, без lazy-load batch.medicine
+        result = await db.execute(
+            select(Medicine).where(
+                Medicine.id.in_(select(Batch.medicine_id).where(Batch.storage_location_id == device.storage_location_id))
+            )
+        )
+        unique_medicines = result.scalars().all()
 
         for medicine in unique_medicines:
             min_t, max_t = medicine.min_temperature, medicine.max_temperature
@@ -119,18 +141,27 @@ def receive_metrics(
                         is_resolved=False
                     )
                     db.add(new_alert)
+                    alerts_changed = True
                     print(f"[AUTO] Alert Created: {msg_text}")
             
             else:
                 if existing_med_alert:
                     existing_med_alert.is_resolved = True
                     existing_med_alert.resolved_at = datetime.utcnow()
+                    alerts_changed = True
                     log_action(db, user_id=None, action="ALERT_AUTO_RESOLVED", 
                                details={"medicine": medicine.name, "reason": "Conditions normalized"})
                     print(f"[AUTO] Alert Resolved for {medicine.name}")
 
-    db.commit()
-    db.refresh(db_reading)
+    if alerts_changed:
+        # Аптека з індексу в пам'яті; якщо місце ще невідоме воркеру - скидаємо весь кеш
+        pharmacy_id = tenant_scope.pharmacy_of_location(device.storage_location_id)
+        dashboard = [pharmacy_id] if pharmacy_id is not None else None
+        await publish_async(db, {"dashboard": dashboard})
+    await db.commit()
+    if alerts_changed:
+        invalidate_dashboard(dashboard)
+    # id та recorded_at вже повернув INSERT ... RETURNING - окремий refresh не потрібен
     return db_reading
 
 
@@ -156,15 +187,18 @@ def delete_device(
     if current_user.role != "admin":
         # Перевіряємо, чи пристрій належить аптеці менеджера
         if device.storage_location_id:
-            location = db.query(StorageLocation).filter(StorageLocation.id == device.storage_location_id).first()
-            if not location or location.pharmacy_id != current_user.pharmacy_id:
+            if tenant_scope.pharmacy_of_location(device.storage_location_id, db) != current_user.pharmacy_id:
                 raise HTTPException(status_code=403, detail="Not your device")
         else:
              # Якщо пристрій ніде не встановлений, видаляти може тільки адмін
              raise HTTPException(status_code=403, detail="Only admin can delete unassigned devices")
 
+    dashboard = [tenant_scope.pharmacy_of_device(device_id, db)]
     db.delete(device)
+    publish(db, {"device": [device_id], "dashboard": dashboard})
     db.commit()
+    tenant_scope.remove_device(device_id)
+    invalidate_dashboard(dashboard)
     return None
 
 
@@ -175,42 +209,40 @@ def delete_device(
     summary="Список датчиків",
     description="Менеджер бачить тільки свої. Адмін - усі."
 )
-def read_devices(
+async def read_devices(
     pharmacy_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(IoTDevice)
+    query = scope_query(select(IoTDevice), current_user, pharmacy_id, location_column=IoTDevice.storage_location_id)
+    if query is None:
+        return []
 
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.join(StorageLocation).filter(StorageLocation.pharmacy_id == pharmacy_id)
-    else:
-        if not current_user.pharmacy_id:
-            return []
-        query = query.join(StorageLocation).filter(StorageLocation.pharmacy_id == current_user.pharmacy_id)
-
-    return query.all()
+    if settings.FAST_LIST_SERIALIZATION:
+        return await fast_list_response(db, query, IoTDeviceResponse)
+    result = await db.execute(query)
+    return result.scalars().all()
 
 # ОТРИМАННЯ АКТИВНИХ ТРИВОГ
-@router.get("/alerts", summary="Список активних тривог")
-def get_active_alerts(
+@router.get("/alerts", response_model=List[AlertResponse], summary="Список активних тривог")
+async def get_active_alerts(
     pharmacy_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Join таблиць: Alert -> Device -> Location
-    query = db.query(Alert).join(IoTDevice).join(StorageLocation).filter(Alert.is_resolved == False)
+    # Тривоги датчиків і партій (терміни придатності); аптека - за місцями зберігання з пам'яті
+    query = select(Alert)\
+        .outerjoin(IoTDevice, Alert.device_id == IoTDevice.id)\
+        .outerjoin(Batch, Alert.batch_id == Batch.id)\
+        .where(Alert.is_resolved == False)
+    query = scope_query(query, current_user, pharmacy_id, location_column=ALERT_LOCATION_ID)
+    if query is None:
+        return []
 
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.filter(StorageLocation.pharmacy_id == pharmacy_id)
-    else:
-        if not current_user.pharmacy_id:
-            return []
-        query = query.filter(StorageLocation.pharmacy_id == current_user.pharmacy_id)
-        
-    return query.all()
+    if settings.FAST_LIST_SERIALIZATION:
+        return await fast_list_response(db, query, AlertResponse)
+    result = await db.execute(query)
+    return result.scalars().all()
 
 # ВИРІШЕННЯ ТРИВОГИ (Resolve)
 @router.put("/alerts/{alert_id}/resolve", summary="Закрити інцидент")
@@ -223,12 +255,17 @@ def resolve_alert(
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
-    device = db.query(IoTDevice).filter(IoTDevice.id == alert.device_id).first()
-    location = db.query(StorageLocation).filter(StorageLocation.id == device.storage_location_id).first()
-    
-    if current_user.role != "admin":
-        if location.pharmacy_id != current_user.pharmacy_id:
-            raise HTTPException(status_code=403, detail="Not your alert")
+    if alert.device_id is not None:
+        device = db.query(IoTDevice).filter(IoTDevice.id == alert.device_id).first()
+        alert_pharmacy_id = tenant_scope.pharmacy_of_device(alert.device_id, db)
+        source = {"device_sn": device.serial_number}
+    else:
+        location_id = db.query(Batch.storage_location_id).filter(Batch.id == alert.batch_id).scalar()
+        alert_pharmacy_id = tenant_scope.pharmacy_of_location(location_id, db)
+        source = {"batch_id": alert.batch_id}
+
+    if current_user.role != "admin" and alert_pharmacy_id != current_user.pharmacy_id:
+        raise HTTPException(status_code=403, detail="Not your alert")
 
     # Логіка закриття
     alert.is_resolved = True
@@ -241,10 +278,12 @@ def resolve_alert(
         action="ALERT_RESOLVED",
         details={
             "alert_id": alert.id,
-            "device_sn": device.serial_number,
+            **source,
             "message": alert.message
         }
     )
     
+    publish(db, {"dashboard": [alert_pharmacy_id]})
     db.commit()
+    invalidate_dashboard([alert_pharmacy_id])
     return {"status": "resolved"}
\ No newline at end of file
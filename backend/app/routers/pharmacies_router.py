@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 
-from app.db.database import get_db
+from app.core.serialization import fast_list_body, serialize_list
+from app.db.database import get_db, get_async_db
 from app.db.models import Pharmacy, StorageLocation, User
 from app.schemas.pharmacy_schemas import PharmacyCreate, PharmacyResponse, StorageLocationCreate, StorageLocationResponse
-from app.api.deps import get_current_user, get_current_admin
+from app.api.deps import get_current_user, get_current_admin, invalidate_principal
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.invalidation_bus import publish
+from app.services.tenant_scope import tenant_scope, scope_query
+from app.services.reference_cache import LOCATIONS, PHARMACIES, bump_versions, collection_versions, conditional_response, pharmacy_keys
 
 router = APIRouter()
 
@@ -38,7 +45,12 @@ def create_pharmacy(
         phone=pharmacy.phone
     )
     db.add(db_pharmacy)
+    db.flush()
+    versions = bump_versions(db, PHARMACIES)
+    publish(db, {"dashboard": [db_pharmacy.id], "reference": versions})
     db.commit()
+    invalidate_dashboard([db_pharmacy.id])
+    collection_versions.advance(versions)
     db.refresh(db_pharmacy)
     return db_pharmacy
 
@@ -47,22 +59,28 @@ def create_pharmacy(
     "/", 
     response_model=List[PharmacyResponse],
     summary="Отримати список аптек",
-    description="Адмін бачить усі. Менеджер і Фармацевт - тільки свою."
+    description="Адмін бачить усі. Менеджер і Фармацевт - тільки свою. Підтримує If-None-Match."
 )
-def read_pharmacies(
-    db: Session = Depends(get_db),
+async def read_pharmacies(
+    request: Request,
+    # Основна БД: тіло кешується під версією (див. reference_cache)
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Pharmacy)
+    # storage_locations входять у відповідь - підтягуємо їх одразу (lazy-load в async неможливий)
+    query = select(Pharmacy).options(selectinload(Pharmacy.storage_locations))
+
+    # Адмін бачить все, інші - тільки ту аптеку, до якої прив'язані
+    query = scope_query(query, current_user, pharmacy_column=Pharmacy.id)
+    if query is None:
+        return []
 
-    if current_user.role == "admin":
-        # Адмін бачить все
-        return query.all()
-    else:
-        # Інші бачать тільки ту аптеку, до якої прив'язані
-        if not current_user.pharmacy_id:
-            return []
-        return query.filter(Pharmacy.id == current_user.pharmacy_id).all()
+    async def build():
+        result = await db.execute(query)
+        return serialize_list(result.scalars().all(), PharmacyResponse)
+
+    scope = None if current_user.role == "admin" else current_user.pharmacy_id
+    return await conditional_response(request, db, PHARMACIES, scope, build)
 
 
 @router.delete(
@@ -83,9 +101,21 @@ def delete_pharmacy(
     if not pharmacy:
         raise HTTPException(status_code=404, detail="Pharmacy not found")
     
+    # ORM обнулить users.pharmacy_id - закешовані principal цих співробітників застаріють
+    staff_emails = [email for (email,) in db.query(User.email).filter(User.pharmacy_id == pharmacy_id).all()]
+
     # Спроба видалення (може впасти, якщо є залежні дані)
     db.delete(pharmacy)
+    versions = bump_versions(db, *pharmacy_keys(PHARMACIES, pharmacy_id))
+    publish(db, {
+        "dashboard": [pharmacy_id], "reference": versions,
+        **({"principal": staff_emails} if staff_emails else {})
+    })
     db.commit()
+    for email in staff_emails:
+        invalidate_principal(email)
+    invalidate_dashboard([pharmacy_id])
+    collection_versions.advance(versions)
     return None
 
 
@@ -126,8 +156,14 @@ def create_storage_location(
         pharmacy_id=location.pharmacy_id
     )
     db.add(db_location)
+    db.flush()
+    # Аптеки теж: місця зберігання вкладені у відповідь /pharmacies/
+    versions = bump_versions(db, *pharmacy_keys(LOCATIONS, location.pharmacy_id), *pharmacy_keys(PHARMACIES, location.pharmacy_id))
+    publish(db, {"location": [db_location.id], "reference": versions})
     db.commit()
     db.refresh(db_location)
+    tenant_scope.set_location(db_location.id, db_location.pharmacy_id)
+    collection_versions.advance(versions)
     return db_location
 
 
@@ -135,25 +171,25 @@ def create_storage_location(
     "/locations", 
     response_model=List[StorageLocationResponse],
     summary="Список місць зберігання",
-    description="Адмін може фільтрувати по pharmacy_id. Інші бачать тільки свої."
+    description="Адмін може фільтрувати по pharmacy_id. Інші бачать тільки свої. Підтримує If-None-Match."
 )
-def read_storage_locations(
+async def read_storage_locations(
+    request: Request,
     pharmacy_id: Optional[int] = None, 
-    db: Session = Depends(get_db),
+    # Основна БД: тіло кешується під версією (див. reference_cache)
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(StorageLocation)
-
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.filter(StorageLocation.pharmacy_id == pharmacy_id)
-    else:
-        # прив'язка до СВОЄЇ аптеки
-        if not current_user.pharmacy_id:
-            return []
-        query = query.filter(StorageLocation.pharmacy_id == current_user.pharmacy_id)
-
-    return query.all()
+    # прив'язка до СВОЄЇ аптеки (адмін - усі або фільтр pharmacy_id)
+    query = scope_query(select(StorageLocation), current_user, pharmacy_id, pharmacy_column=StorageLocation.pharmacy_id)
+    if query is None:
+        return []
+
+    scope = pharmacy_id if current_user.role == "admin" else current_user.pharmacy_id
+    return await conditional_response(
+        request, db, LOCATIONS, scope,
+        lambda: fast_list_body(db, query, StorageLocationResponse)
+    )
 
 
 @router.delete(
@@ -180,5 +216,9 @@ def delete_storage_location(
             raise HTTPException(status_code=403, detail="Not enough privileges to manage this pharmacy")
 
     db.delete(location)
+    versions = bump_versions(db, *pharmacy_keys(LOCATIONS, location.pharmacy_id), *pharmacy_keys(PHARMACIES, location.pharmacy_id))
+    publish(db, {"location": [location_id], "reference": versions})
     db.commit()
+    tenant_scope.remove_location(location_id)
+    collection_versions.advance(versions)
     return None
\ No newline at end of file
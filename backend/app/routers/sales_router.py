@@ -1,12 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from typing import List, Optional
 
-from app.db.database import get_db
-from app.db.models import Sale, SaleItem, Batch, User, Pharmacy, StorageLocation
+from app.db.database import get_async_db
+from app.db.routing import get_read_db, get_async_read_db
+from app.db.models import Sale, SaleItem, Batch, User, Pharmacy
 from app.schemas.sales_schemas import SaleCreate, SaleResponse
 from app.api.deps import get_current_user
 from app.services.audit_service import log_action
+from app.services.stock_index import stock_index
+from app.services.stock_levels import refresh_stock_levels_async
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.invalidation_bus import publish_async
+from app.services.tenant_scope import tenant_scope, scope_query
 
 router = APIRouter()
 
@@ -17,62 +26,66 @@ router = APIRouter()
     summary="Оформлення продажу (Чек)",
     description="Фармацевт продає ліки. Система списує їх зі складу та розраховує суму."
 )
-def create_sale(
+async def create_sale(
     sale_data: SaleCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     if not current_user.pharmacy_id:
         raise HTTPException(status_code=403, detail="User must be assigned to a pharmacy to sell")
 
-    new_sale = Sale(
-        pharmacy_id=current_user.pharmacy_id,
-        seller_id=current_user.id,
-        total_amount=0.0,
-        status="completed"
+    # Списання всіх партій чека одним UPDATE ... RETURNING: залишок перевіряється вже після
+    # атомарного зменшення (паралельний продаж тих самих партій не загубиться), будь-яка помилка - відкат
+    quantities = {}
+    for item in sale_data.items:
+        quantities[item.batch_id] = quantities.get(item.batch_id, 0) + item.quantity
+    result = await db.execute(
+        update(Batch)
+        .where(Batch.id.in_(list(quantities)))
+        .values(current_quantity=Batch.current_quantity - case(quantities, value=Batch.id))
+        .returning(Batch.id, Batch.batch_number, Batch.medicine_id, Batch.storage_location_id, Batch.current_quantity)
+        .execution_options(synchronize_session=False)
     )
-    db.add(new_sale)
-    db.flush() # Щоб отримати ID нового чека (new_sale.id)
+    batches = {}
+    for batch in result:
+        # Аптека місця зберігання - з пам'яті (tenant_scope), невідоме воркеру місце - з БД
+        batch_pharmacy_id = tenant_scope.pharmacy_of_location(batch.storage_location_id)
+        if batch_pharmacy_id is None:
+            batch_pharmacy_id = await db.run_sync(tenant_scope.load_location, batch.storage_location_id)
+        batches[batch.id] = (batch, batch_pharmacy_id)
 
     total_sum = 0.0
+    item_rows = [] # Позиції чека - вставляються одним запитом
     items_summary = [] # Для логу аудиту
 
     # Обробляємо кожну позицію в чеку
     for item in sale_data.items:
         # Шукаємо партію ліків
-        batch = db.query(Batch).filter(Batch.id == item.batch_id).first()
+        batch, batch_pharmacy_id = batches.get(item.batch_id, (None, None))
         
         if not batch:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=404, detail=f"Batch {item.batch_id} not found")
 
-        location = db.query(StorageLocation).filter(StorageLocation.id == batch.storage_location_id).first()
-        if location.pharmacy_id != current_user.pharmacy_id:
-             db.rollback()
+        if batch_pharmacy_id != current_user.pharmacy_id:
+             await db.rollback()
              raise HTTPException(status_code=403, detail=f"Batch {batch.batch_number} belongs to another pharmacy")
 
-        if batch.current_quantity < item.quantity:
-             db.rollback()
-             raise HTTPException(
-                 status_code=400, 
-                 detail=f"Not enough stock for Batch {batch.batch_number}. Available: {batch.current_quantity}"
-             )
-        
-        # Логіка списання
-        batch.current_quantity -= item.quantity
+        if batch.current_quantity < 0:
+             await db.rollback()
+             available = batch.current_quantity + quantities[batch.id]
+             raise HTTPException(status_code=400, detail=f"Not enough stock for Batch {batch.batch_number}. Available: {available}")
         
         item_price = 100.00 
         
         cost = item_price * item.quantity
         total_sum += cost
 
-        db_item = SaleItem(
-            sale_id=new_sale.id,
-            batch_id=batch.id,
-            quantity=item.quantity,
-            price_at_moment=item_price
-        )
-        db.add(db_item)
+        item_rows.append({
+            "batch_id": batch.id,
+            "quantity": item.quantity,
+            "price_at_moment": item_price
+        })
         
         items_summary.append({
             "batch": batch.batch_number, 
@@ -80,7 +93,25 @@ def create_sale(
             "subtotal": cost
         })
 
-    new_sale.total_amount = total_sum
+    # Сума відома заздалегідь - чек вставляється одразу з нею (без окремого UPDATE)
+    new_sale = Sale(
+        pharmacy_id=current_user.pharmacy_id,
+        seller_id=current_user.id,
+        total_amount=total_sum,
+        status="completed"
+    )
+    db.add(new_sale)
+    await db.flush() # Щоб отримати ID нового чека (new_sale.id)
+
+    # Один INSERT ... RETURNING на всі позиції замість запиту на кожну
+    for row in item_rows:
+        row["sale_id"] = new_sale.id
+    result = await db.scalars(insert(SaleItem).returning(SaleItem), item_rows)
+    set_committed_value(new_sale, "items", result.all())
+    # Зміни партій уже записані UPDATE вище
+    await refresh_stock_levels_async(db, [
+        (batch_pharmacy_id, batch.medicine_id) for batch, batch_pharmacy_id in batches.values()
+    ])
     
     log_action(
         db,
@@ -93,8 +124,11 @@ def create_sale(
         }
     )
 
-    db.commit()
-    db.refresh(new_sale)
+    await publish_async(db, {"batch": list(batches), "dashboard": [current_user.pharmacy_id]})
+    await db.commit()
+    for batch, _ in batches.values():
+        stock_index.set_quantity(batch.id, batch.current_quantity)
+    invalidate_dashboard([current_user.pharmacy_id])
     return new_sale
 
 @router.get(
@@ -103,25 +137,20 @@ def create_sale(
     summary="Історія продажів",
     description="Адмін бачить все. Менеджер - тільки свою аптеку."
 )
-def read_sales(
+async def read_sales(
     pharmacy_id: Optional[int] = None,
     limit: int = 100,
     skip: int = 0,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Юзаєм joinedload, щоб одразу підтягнути список товарів (items) у чеку
-    query = db.query(Sale).options(joinedload(Sale.items))
-
-    if current_user.role == "admin":
-        if pharmacy_id:
-            query = query.filter(Sale.pharmacy_id == pharmacy_id)
-    else:
-        if not current_user.pharmacy_id:
-            return []
-        query = query.filter(Sale.pharmacy_id == current_user.pharmacy_id)
+    # selectinload: товари (items) чеків підтягуються одним додатковим запитом
+    query = scope_query(select(Sale).options(selectinload(Sale.items)), current_user, pharmacy_id, pharmacy_column=Sale.pharmacy_id)
+    if query is None:
+        return []
 
-    return query.order_by(Sale.created_at.desc()).offset(skip).limit(limit).all()
+    result = await db.execute(query.order_by(Sale.created_at.desc()).offset(skip).limit(limit))
+    return result.scalars().all()
 
 @router.get(
     "/{sale_id}",
@@ -134,7 +163,7 @@ def read_sales(
 )
 def read_sale_detail(
     sale_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     sale = db.query(Sale).options(joinedload(Sale.items)).filter(Sale.id == sale_id).first()
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import date, datetime
+from typing import List
 
 # --- Ліки (Номенклатура) ---
     
@@ -52,4 +53,48 @@ class BatchResponse(BatchBase):
 class BatchDispose(BaseModel):
     batch_id: int
     quantity: int
-    reason: str # Наприклад: "Expired", "Damaged", "Lost"
\ No newline at end of file
+    reason: str # Наприклад: "Expired", "Damaged", "Lost"
+
+# Потоковий імпорт партій
+class BatchImportError(BaseModel):
+    row: int # номер рядка у файлі
+    batch_number: str | None = None
+    detail: str
+
+class BatchImportResult(BaseModel):
+    created: int
+    failed: int
+    errors: List[BatchImportError] # перші BATCH_IMPORT_MAX_ERRORS помилок
+
+class BatchBulkDispose(BaseModel):
+    # Списується весь залишок. Без batch_ids - усі партії з терміном <= expired_on (за замовчуванням сьогодні)
+    batch_ids: List[int] | None = None
+    expired_on: date | None = None
+    pharmacy_id: int | None = None # фільтр для адміна; інші ролі - тільки своя аптека
+    reason: str = "Expired"
+
+class BatchBulkDisposeResult(BaseModel):
+    disposed_batches: int
+    quantity_removed: int
+    batch_ids: List[int]
+
+# --- Наявність у мережі ---
+class PharmacyStock(BaseModel):
+    pharmacy_id: int
+    quantity: int
+
+class MedicineAvailability(BaseModel):
+    medicine_id: int
+    medicine_name: str | None = None
+    pharmacies: List[PharmacyStock]
+
+# --- Залишки по аптеці (stock_levels) ---
+class StockLevelResponse(BaseModel):
+    pharmacy_id: int
+    medicine_id: int
+    quantity: int
+    nearest_expiry: date | None = None # найближчий термін серед партій з залишком
+    updated_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
@@ -38,7 +38,8 @@ class IoTDeviceResponse(IoTDeviceBase):
 # --- Алерти (Тривоги) ---
 class AlertResponse(BaseModel):
     id: int
-    device_id: int
+    device_id: Optional[int] = None
+    batch_id: Optional[int] = None
     severity: str
     message: str
     is_resolved: bool
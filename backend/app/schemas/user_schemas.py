@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
+from typing import List
 
 # Базова схема (спільні поля)
 class UserBase(BaseModel):
@@ -19,4 +20,14 @@ class UserResponse(UserBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True  # Дозволяє читати дані прямо з ORM моделі
\ No newline at end of file
+        from_attributes = True  # Дозволяє читати дані прямо з ORM моделі
+
+# Результат масового імпорту
+class BulkImportError(BaseModel):
+    row: int
+    email: str | None = None
+    detail: str
+
+class BulkImportResult(BaseModel):
+    created: int
+    errors: List[BulkImportError]
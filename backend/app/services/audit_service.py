@@ -1,6 +1,61 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy import event, insert
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.database import SessionLocal
 from app.db.models import AuditLog
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Події async-режиму чекають у session.info до коміту транзакції виклику
+_PENDING_KEY = "audit_pending"
+
+# Ключі details з індексами по CAST(details ->> key AS INTEGER) - див. models.AUDIT_PHARMACY_ID
+_INTEGER_DETAIL_KEYS = ("pharmacy_id", "sale_id")
+_INT4_RANGE = range(-2**31, 2**31)
+
+
+def _as_int4(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not re.fullmatch(r"[+-]?\d+", value):
+            return None
+        value = int(value)
+    return value if isinstance(value, int) and value in _INT4_RANGE else None
+
+
+def _checked_details(details: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Значення pharmacy_id / sale_id, яке Postgres не приведе до integer, зламало б увесь INSERT
+    (у режимі async - разом з пакетом чужих подій). Числові рядки стають числами,
+    решта зберігається під ключем <key>_raw і в індекс не потрапляє.
+    """
+    if not details or not any(details.get(key) is not None for key in _INTEGER_DETAIL_KEYS):
+        return details
+    checked = dict(details)
+    for key in _INTEGER_DETAIL_KEYS:
+        value = checked.get(key)
+        if value is None:
+            continue
+        number = _as_int4(value)
+        if number is None:
+            checked[f"{key}_raw"] = checked.pop(key)
+        else:
+            checked[key] = number
+    return checked
+
 
 def log_action(
     db: Session,
@@ -10,10 +65,315 @@ def log_action(
 ):
     """
     Функція для запису дій у журнал аудиту.
+    AUDIT_MODE=sync - рядок додається в транзакцію виклику.
+    AUDIT_MODE=async - подія потрапляє в буфер після коміту транзакції виклику
+    (при відкаті відкидається), фоновий потік записує її пакетом.
     """
+    details = _checked_details(details)
+    if settings.AUDIT_MODE == "async":
+        _defer(db, user_id, action, [details])
+        return
+
     new_log = AuditLog(
         user_id=user_id,
         action=action,
         details=details
     )
-    db.add(new_log)
\ No newline at end of file
+    db.add(new_log)
+
+
+def log_actions(
+    db: Session,
+    user_id: Optional[int],
+    action: str,
+    details_list: List[Dict[str, Any]]
+):
+    """
+    Пакет однотипних подій (масові операції): у режимі sync - один INSERT на весь пакет
+    у транзакції виклику, у режимі async - у буфер фонового запису, як і log_action.
+    """
+    if not details_list:
+        return
+    details_list = [_checked_details(details) for details in details_list]
+    if settings.AUDIT_MODE == "async":
+        _defer(db, user_id, action, details_list)
+        return
+
+    db.execute(insert(AuditLog), [
+        {"user_id": user_id, "action": action, "details": details} for details in details_list
+    ])
+
+
+def _defer(db, user_id: Optional[int], action: str, details_list: List[Optional[Dict[str, Any]]]):
+    # db - Session або AsyncSession; події прив'язуються до транзакції внутрішньої Session
+    session: Session = getattr(db, "sync_session", db)
+    if not session.in_transaction():
+        # Транзакція без з'єднання (воно береться лише під перший запит) - щоб відкат
+        # виклику до будь-якого SQL теж відкинув події
+        session.begin()
+    pending = session.info.setdefault(_PENDING_KEY, [])
+    pending.extend((user_id, action, details) for details in details_list)
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_committed(session: Session):
+    for user_id, action, details in session.info.pop(_PENDING_KEY, ()):
+        audit_writer.enqueue(user_id, action, details)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back(session: Session, previous_transaction):
+    if not previous_transaction.nested:
+        session.info.pop(_PENDING_KEY, None)
+
+
+class AuditWriter:
+    """
+    Буфер подій аудиту з фоновим пакетним записом.
+    Гарантія at-least-once: якщо БД недоступна, пакет дописується у локальний
+    append-only файл свого процесу і повторно відправляється при наступному скиданні.
+    Файли процесів, яких уже немає (перезапуск воркера), дочитує будь-який живий воркер.
+    Рядки, які БД відхиляє через самі дані (IntegrityError, DataError), після max_attempts
+    проходів повтору переносяться у файл .dead і більше не повторюються.
+    """
+
+    def __init__(self, spill_dir: str, batch_size: int, flush_interval: float, max_attempts: int):
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._queue: "queue.SimpleQueue[dict]" = queue.SimpleQueue()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue(self, user_id: Optional[int], action: str, details: Optional[Dict[str, Any]]):
+        self._queue.put({
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "created_at": datetime.now(timezone.utc)
+        })
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    # --- ФОНОВИЙ ПОТІК ---
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Зупинка з фінальним скиданням буфера (викликається при shutdown).
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Audit flush failed")
+
+    # --- СКИДАННЯ ---
+    def flush(self):
+        with self._flush_lock:
+            self._replay_spill()
+            while True:
+                rows = self._drain()
+                if not rows:
+                    return
+                if not self._insert(rows):
+                    self._spill(rows)
+                    return
+
+    def _drain(self) -> List[dict]:
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _insert(self, rows: List[dict]) -> bool:
+        error = self._try_insert(rows)
+        if error is not None:
+            logger.error("Audit insert failed, spilling %d events to %s", len(rows), self.spill_dir, exc_info=error)
+        return error is None
+
+    def _try_insert(self, rows: List[dict]) -> Optional[Exception]:
+        db = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), rows)
+            db.commit()
+            return None
+        except Exception as exc:
+            db.rollback()
+            return exc
+        finally:
+            db.close()
+
+    def _insert_each(self, rows: List[dict]) -> Tuple[List[dict], List[dict], Optional[Exception]]:
+        """
+        Пакет, відхилений через дані: рядки записуються по одному.
+        Повертає (рядки з помилкою даних, ще не записані рядки, помилка з'єднання з БД).
+        """
+        rejected = []
+        for position, row in enumerate(rows):
+            error = self._try_insert([row])
+            if isinstance(error, (IntegrityError, DataError)):
+                rejected.append(row)
+            elif error is not None:
+                return rejected, rows[position:], error
+        return rejected, [], None
+
+    # --- ФАЙЛИ-БУФЕРИ ---
+    # audit_spill.<pid>.jsonl - дописує лише свій процес;
+    # audit_spill.<pid>.<token>.<attempts>.replay - забраний на повтор (перейменування атомарне),
+    #   attempts - скільки проходів повтору вже відхилили рядки файлу через дані;
+    # audit_spill.<pid>.<token>.dead - рядки, що не записались за max_attempts проходів (не повторюються)
+    _SPILL_NAME = re.compile(r"audit_spill\.(?P<pid>\d+)(?:\.jsonl|\.\w+(?:\.(?P<attempts>\d+))?\.replay)")
+
+    def _spill(self, rows: List[dict]):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._append_rows(os.path.join(self.spill_dir, f"audit_spill.{os.getpid()}.jsonl"), rows)
+
+    @staticmethod
+    def _append_rows(path: str, rows: List[dict]):
+        with open(path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({**row, "created_at": row["created_at"].isoformat()}, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def _rewrite_rows(cls, path: str, rows: List[dict]):
+        # Атомарна заміна: після обриву процесу у файлі або старі, або нові рядки
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        cls._append_rows(tmp_path, rows)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_rows(path: str) -> List[dict]:
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    row["created_at"] = datetime.fromisoformat(row["created_at"])
+                    rows.append(row)
+        return rows
+
+    def _replay_path(self, attempts: int, token: Optional[str] = None) -> str:
+        token = token or uuid.uuid4().hex[:8]
+        return os.path.join(self.spill_dir, f"audit_spill.{os.getpid()}.{token}.{attempts}.replay")
+
+    def _claim_spill_files(self) -> List[Tuple[str, int]]:
+        """
+        Свої файли і файли завершених процесів перейменовуються у файли повтору цього процесу.
+        Файли живих воркерів не чіпаються: ті можуть саме дописувати в них.
+        Повертає (шлях, кількість попередніх проходів з помилкою даних).
+        """
+        try:
+            names = sorted(os.listdir(self.spill_dir))
+        except FileNotFoundError:
+            return []
+
+        pid = os.getpid()
+        claimed = []
+        for name in names:
+            match = self._SPILL_NAME.fullmatch(name)
+            if match is None:
+                continue
+            owner = int(match["pid"])
+            attempts = int(match["attempts"] or 0)
+            path = os.path.join(self.spill_dir, name)
+            if owner != pid and _pid_alive(owner):
+                continue
+            if owner == pid and name.endswith(".replay"):
+                # Попередній повтор цього процесу обірвався або відкладений
+                claimed.append((path, attempts))
+                continue
+            replay_path = self._replay_path(attempts)
+            try:
+                os.replace(path, replay_path)
+            except FileNotFoundError:
+                continue # інший воркер забрав файл раніше
+            claimed.append((replay_path, attempts))
+        return claimed
+
+    def _replay_spill(self):
+        for replay_path, attempts in self._claim_spill_files():
+            rows = self._read_rows(replay_path)
+            rejected: List[dict] = []
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                unwritten = []
+                error = self._try_insert(chunk)
+                if isinstance(error, (IntegrityError, DataError)):
+                    chunk_rejected, unwritten, error = self._insert_each(chunk)
+                    rejected.extend(chunk_rejected)
+                elif error is not None:
+                    # БД недоступна: у файлі вже лише незаписані рядки, спробуємо наступного разу
+                    logger.error("Audit spill replay failed, %d events left in %s",
+                                 len(rejected) + len(rows) - start, replay_path, exc_info=error)
+                    return
+                # Записане прибирається з файлу одразу: обрив чи збій наступного пакета не повторить його
+                self._rewrite_rows(replay_path, rejected + unwritten + rows[start + self.batch_size:])
+                if error is not None:
+                    logger.error("Audit spill replay failed, %d events left in %s",
+                                 len(rejected) + len(unwritten) + len(rows) - start - len(chunk), replay_path, exc_info=error)
+                    return
+
+            token = os.path.basename(replay_path).split(".")[2]
+            if not rejected:
+                os.remove(replay_path)
+            elif attempts + 1 >= self.max_attempts:
+                dead_path = os.path.join(self.spill_dir, f"audit_spill.{os.getpid()}.{token}.dead")
+                self._append_rows(dead_path, rejected)
+                os.remove(replay_path)
+                logger.error("Audit spill: %d events rejected %d times, moved to %s", len(rejected), attempts + 1, dead_path)
+            else:
+                os.replace(replay_path, self._replay_path(attempts + 1, token))
+                logger.warning("Audit spill: %d events rejected by the database (attempt %d of %d)",
+                               len(rejected), attempts + 1, self.max_attempts)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _spill_dir() -> str:
+    # Абсолютний шлях: відносний AUDIT_SPILL_DIR рахується від каталогу backend, а не від cwd процесу
+    path = Path(settings.AUDIT_SPILL_DIR)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[2] / path
+    return str(path)
+
+
+audit_writer = AuditWriter(
+    spill_dir=_spill_dir(),
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.AUDIT_SPILL_MAX_ATTEMPTS
+)
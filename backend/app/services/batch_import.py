@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Batch, Medicine, StorageLocation, User
+from app.schemas.inventory_schemas import BatchCreate
+from app.services.invalidation_bus import publish
+from app.services.stock_index import stock_index
+from app.services.stock_levels import refresh_stock_levels
+
+# Розмір IN-списку для перевірки існування (SQLite обмежує кількість параметрів запиту)
+IN_CHUNK = 10000
+
+
+class ImportTooLarge(Exception):
+    pass
+
+
+class ImportMalformed(Exception):
+    """
+    Файл неможливо розібрати (не UTF-8, зламаний CSV). Виявляється ще в першому проході,
+    до будь-яких вставок.
+    """
+
+
+def _rows(source: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Інкрементальний розбір: (номер рядка у файлі, сирий рядок). Файл у пам'ять не читається.
+    """
+    source.seek(0)
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for raw in reader:
+                yield reader.line_num, {key: value for key, value in raw.items() if key and value not in (None, "")}
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+    except UnicodeDecodeError as e:
+        raise ImportMalformed("File is not valid UTF-8") from e
+    except csv.Error as e:
+        raise ImportMalformed(f"Malformed CSV: {e}") from e
+    finally:
+        text.detach() # файл закриває власник, не обгортка
+
+
+def _int_or_none(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _existing(db: Session, query, column, ids: Set[int]) -> List[Any]:
+    # Один запит на типовий файл; великі множини - порціями IN_CHUNK
+    ids = sorted(ids)
+    rows = []
+    for start in range(0, len(ids), IN_CHUNK):
+        rows.extend(db.execute(query.where(column.in_(ids[start:start + IN_CHUNK]))).all())
+    return rows
+
+
+def import_batches(db: Session, source: IO[bytes], fmt: str, current_user: User) -> dict:
+    """
+    Масовий прийом товару з CSV/NDJSON у два проходи по файлу:
+    1. збір усіх medicine_id / storage_location_id (лише множини id);
+    2. перевірка рядків за тими самими правилами, що й POST /inventory/batches, і вставка
+       валідних порціями BATCH_IMPORT_CHUNK_SIZE (коміт на порцію).
+    Помилкові рядки пропускаються і повертаються списком (перші BATCH_IMPORT_MAX_ERRORS).
+    """
+    # --- ПРОХІД 1 ---
+    medicine_ids, location_ids = set(), set()
+    total = 0
+    for _, raw in _rows(source, fmt):
+        total += 1
+        if total > settings.BATCH_IMPORT_MAX_ROWS:
+            raise ImportTooLarge()
+        if isinstance(raw, dict):
+            for ids, key in ((medicine_ids, "medicine_id"), (location_ids, "storage_location_id")):
+                value = _int_or_none(raw.get(key))
+                if value is not None:
+                    ids.add(value)
+
+    # Один запит на ліки і один на місця зберігання
+    known_medicines = {row[0] for row in _existing(db, select(Medicine.id), Medicine.id, medicine_ids)}
+    location_pharmacy = dict(_existing(db, select(StorageLocation.id, StorageLocation.pharmacy_id), StorageLocation.id, location_ids))
+
+    # --- ПРОХІД 2 ---
+    created, failed = 0, 0
+    errors: List[dict] = []
+    chunk: List[dict] = []
+
+    def fail(row_number: int, raw, detail: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < settings.BATCH_IMPORT_MAX_ERRORS:
+            batch_number = raw.get("batch_number") if isinstance(raw, dict) else None
+            errors.append({"row": row_number, "batch_number": str(batch_number) if batch_number is not None else None, "detail": detail})
+
+    for row_number, raw in _rows(source, fmt):
+        if not isinstance(raw, dict):
+            fail(row_number, raw, "Malformed line")
+            continue
+        if "current_quantity" not in raw and "initial_quantity" in raw:
+            # У накладній зазвичай лише кількість, що надійшла
+            raw["current_quantity"] = raw["initial_quantity"]
+        try:
+            batch = BatchCreate.model_validate(raw)
+        except ValidationError as e:
+            error = e.errors()[0]
+            fail(row_number, raw, f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+            continue
+
+        pharmacy_id = location_pharmacy.get(batch.storage_location_id)
+        if pharmacy_id is None:
+            fail(row_number, raw, "Storage location not found")
+        elif current_user.role != "admin" and pharmacy_id != current_user.pharmacy_id:
+            fail(row_number, raw, "You can only add batches to your own pharmacy storage locations")
+        elif batch.medicine_id not in known_medicines:
+            fail(row_number, raw, "Medicine ID not found")
+        else:
+            chunk.append(batch.model_dump())
+            if len(chunk) >= settings.BATCH_IMPORT_CHUNK_SIZE:
+                created += _insert_chunk(db, chunk, location_pharmacy)
+                chunk = []
+
+    if chunk:
+        created += _insert_chunk(db, chunk, location_pharmacy)
+
+    return {"created": created, "failed": failed, "errors": errors}
+
+
+def _insert_chunk(db: Session, rows: List[dict], location_pharmacy: Dict[int, int]) -> int:
+    # Багаторядковий INSERT ... RETURNING (insertmanyvalues): id потрібні індексу наявності і шині
+    inserted = db.execute(
+        insert(Batch).returning(
+            Batch.id, Batch.medicine_id, Batch.storage_location_id, Batch.current_quantity, Batch.expiration_date
+        ),
+        rows
+    ).all()
+    refresh_stock_levels(db, [(location_pharmacy[location_id], medicine_id) for _, medicine_id, location_id, _, _ in inserted])
+    publish(db, {"batch": [row[0] for row in inserted]})
+    db.commit()
+    for batch_id, medicine_id, location_id, quantity, expiration_date in inserted:
+        stock_index.upsert_batch(batch_id, medicine_id, location_pharmacy[location_id], quantity, expiration_date)
+    return len(inserted)
@@ -0,0 +1,130 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import ALERT_LOCATION_ID, Alert, Batch, IoTDevice, Pharmacy, Sale, StorageLocation, User
+from app.services.cache import TTLCache
+from app.services import invalidation_bus
+
+# Короткий TTL + явна інвалідація при записі продажів, тривог і користувачів.
+# Ключі: ("single" | "by_pharmacy", pharmacy_id або None - вся мережа)
+dashboard_cache = TTLCache(maxsize=1024, ttl=settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+
+def invalidate_dashboard(pharmacy_ids: Optional[Iterable[Optional[int]]] = None):
+    """
+    Скидає статистику змінених аптек і мережеві агрегати (вони включають будь-яку аптеку).
+    pharmacy_ids=None - аптека невідома, скидається весь кеш.
+    Той самий список передається в шину: publish(db, {"dashboard": [pharmacy_id, ...]}).
+    """
+    if pharmacy_ids is None:
+        dashboard_cache.clear()
+        return
+    for pharmacy_id in {*pharmacy_ids, None}:
+        dashboard_cache.delete(("single", pharmacy_id))
+        dashboard_cache.delete(("by_pharmacy", pharmacy_id))
+
+
+invalidation_bus.subscribe("dashboard", invalidate_dashboard)
+invalidation_bus.on_full_flush(invalidate_dashboard)
+
+
+def _with_alert_location(query):
+    # Тривога датчика - місце зберігання датчика, тривога терміну придатності - місце партії
+    return query.outerjoin(IoTDevice, Alert.device_id == IoTDevice.id)\
+        .outerjoin(Batch, Alert.batch_id == Batch.id)\
+        .join(StorageLocation, StorageLocation.id == ALERT_LOCATION_ID)
+
+
+def get_stats(db: Session, pharmacy_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Статистика однієї аптеки (або всієї мережі, якщо pharmacy_id = None).
+    """
+    key = ("single", pharmacy_id)
+    cached = dashboard_cache.get(key)
+    if cached is not None:
+        return cached
+
+    sales_query = db.query(
+        func.count(Sale.id).label("count"),
+        func.sum(Sale.total_amount).label("revenue")
+    )
+
+    alerts_query = _with_alert_location(db.query(func.count(Alert.id)).select_from(Alert))\
+        .filter(Alert.is_resolved == False)
+
+    staff_query = db.query(func.count(User.id))
+
+    if pharmacy_id:
+        sales_query = sales_query.filter(Sale.pharmacy_id == pharmacy_id)
+        alerts_query = alerts_query.filter(StorageLocation.pharmacy_id == pharmacy_id)
+        staff_query = staff_query.filter(User.pharmacy_id == pharmacy_id)
+
+    sales_result = sales_query.first()
+    active_alerts = alerts_query.scalar()
+    staff_count = staff_query.scalar()
+
+    stats = {
+        "pharmacy_filter": pharmacy_id if pharmacy_id else "All Network",
+        "total_sales_orders": sales_result.count or 0,
+        "total_revenue": float(sales_result.revenue or 0),
+        "active_alerts": active_alerts or 0,
+        "total_staff": staff_count or 0
+    }
+    dashboard_cache.set(key, stats)
+    return stats
+
+
+def get_stats_by_pharmacy(db: Session, pharmacy_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Статистика по кожній аптеці одним запитом: агрегати згруповані по pharmacy_id
+    у підзапитах і приєднані до аптек через LEFT JOIN.
+    """
+    key = ("by_pharmacy", pharmacy_id)
+    cached = dashboard_cache.get(key)
+    if cached is not None:
+        return cached
+
+    sales = select(
+        Sale.pharmacy_id,
+        func.count(Sale.id).label("orders"),
+        func.sum(Sale.total_amount).label("revenue")
+    ).group_by(Sale.pharmacy_id).subquery()
+
+    alerts = _with_alert_location(select(
+        StorageLocation.pharmacy_id,
+        func.count(Alert.id).label("alerts")
+    ).select_from(Alert))\
+        .where(Alert.is_resolved == False)\
+        .group_by(StorageLocation.pharmacy_id).subquery()
+
+    staff = select(
+        User.pharmacy_id,
+        func.count(User.id).label("staff")
+    ).where(User.pharmacy_id.is_not(None)).group_by(User.pharmacy_id).subquery()
+
+    query = db.query(
+        Pharmacy.id, Pharmacy.name,
+        sales.c.orders, sales.c.revenue, alerts.c.alerts, staff.c.staff
+    ).outerjoin(sales, sales.c.pharmacy_id == Pharmacy.id)\
+        .outerjoin(alerts, alerts.c.pharmacy_id == Pharmacy.id)\
+        .outerjoin(staff, staff.c.pharmacy_id == Pharmacy.id)
+
+    if pharmacy_id:
+        query = query.filter(Pharmacy.id == pharmacy_id)
+
+    stats = [
+        {
+            "pharmacy_id": row.id,
+            "pharmacy_name": row.name,
+            "total_sales_orders": row.orders or 0,
+            "total_revenue": float(row.revenue or 0),
+            "active_alerts": row.alerts or 0,
+            "total_staff": row.staff or 0
+        }
+        for row in query.order_by(Pharmacy.id).all()
+    ]
+    dashboard_cache.set(key, stats)
+    return stats
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Alert, Batch
+from app.services.audit_service import log_actions
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.invalidation_bus import publish
+from app.services.stock_index import stock_index
+from app.services.stock_levels import refresh_stock_levels
+from app.services.tenant_scope import tenant_scope
+
+
+def write_off_batches(
+    db: Session,
+    user_id: Optional[int],
+    reason: str,
+    conditions: List[Any],
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Списання всього залишку партій, що відповідають conditions (умови WHERE на Batch).
+    Порціями по chunk_size: на порцію - SELECT ... FOR UPDATE, один UPDATE ... RETURNING,
+    перерахунок stock_levels, один INSERT в аудит і окремий коміт, тож блокування на batches не тримаються довше однієї порції.
+    Якщо порція впала - попередні вже списані (повторний виклик продовжить з решти).
+    """
+    chunk_size = chunk_size or settings.DISPOSAL_CHUNK_SIZE
+    disposed_ids: List[int] = []
+    quantity_removed = 0
+
+    while True:
+        # Порція блокується і читається з поточними залишками (для аудиту: RETURNING
+        # віддає вже оновлені значення), потім обнуляється одним UPDATE
+        chunk = dict(db.execute(
+            select(Batch.id, Batch.current_quantity)
+            .where(Batch.current_quantity > 0, *conditions)
+            .order_by(Batch.id).limit(chunk_size)
+            .with_for_update()
+        ).all())
+        if not chunk:
+            break
+        rows = db.execute(
+            update(Batch)
+            .where(Batch.id.in_(list(chunk)))
+            .values(current_quantity=0)
+            .returning(Batch.id, Batch.batch_number, Batch.medicine_id, Batch.storage_location_id)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        batch_ids = [row[0] for row in rows]
+        pharmacies = {location_id: tenant_scope.pharmacy_of_location(location_id, db) for _, _, _, location_id in rows}
+        refresh_stock_levels(db, [(pharmacies[location_id], medicine_id) for _, _, medicine_id, location_id in rows])
+        log_actions(db, user_id, "BATCH_DISPOSAL", [
+            {
+                "batch_number": batch_number,
+                "medicine_id": medicine_id,
+                "quantity_removed": chunk[batch_id],
+                "reason": reason,
+                "pharmacy_id": pharmacies[location_id]
+            }
+            for batch_id, batch_number, medicine_id, location_id in rows
+        ])
+        # Тривоги терміну придатності списаних партій більше не актуальні
+        resolved = db.execute(
+            update(Alert)
+            .where(Alert.batch_id.in_(batch_ids), Alert.is_resolved == False)
+            .values(is_resolved=True, resolved_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        dashboard = list(set(pharmacies.values()))
+        publish(db, {"batch": batch_ids, **({"dashboard": dashboard} if resolved else {})})
+        db.commit()
+        for batch_id in batch_ids:
+            stock_index.set_quantity(batch_id, 0)
+        if resolved:
+            invalidate_dashboard(dashboard)
+
+        disposed_ids.extend(batch_ids)
+        quantity_removed += sum(chunk.values())
+        if len(chunk) < chunk_size:
+            break
+
+    return {"disposed_batches": len(disposed_ids), "quantity_removed": quantity_removed, "batch_ids": disposed_ids}
@@ -0,0 +1,192 @@
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge
+from app.db.database import SessionLocal, engine
+from app.db.models import Alert, Batch, Medicine
+from app.services.audit_service import log_action
+from app.services.dashboard_service import invalidate_dashboard
+from app.services.disposal_service import write_off_batches
+from app.services.invalidation_bus import publish
+from app.services.stock_index import stock_index
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокування: сканер запущено в кожному воркері, сканує (і списує) лише той, хто взяв блокування
+SCAN_LOCK_KEY = 0x45585059 # "EXPY"
+
+EXPIRY_ALERTS_RAISED = Counter("expiry_alerts_raised_total", "Expiry alerts raised by the scanner", ["severity"])
+
+Gauge(
+    "expiring_stock_quantity", "Units in stock by expiry bucket (network-wide)", ["bucket"],
+    collect=lambda: {(name,): bucket["quantity"] for name, bucket in stock_index.expiry_buckets(None).items()}
+)
+
+
+def run_expiry_scan(db: Session, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Один прохід сканера: кілька set-based запитів незалежно від кількості партій.
+    - закриває тривоги партій, яких уже немає в наявності;
+    - підвищує warning -> critical для партій, що прострочились;
+    - одним INSERT піднімає тривоги партіям, у яких термін спливає протягом EXPIRY_ALERT_DAYS
+      і ще немає активної тривоги.
+    Повертає лічильники змін (skipped=1 - сканує інший воркер).
+    """
+    today = today or date.today()
+    now = datetime.utcnow()
+
+    if db.bind.dialect.name == "postgresql":
+        locked = db.execute(select(func.pg_try_advisory_xact_lock(SCAN_LOCK_KEY))).scalar()
+        if not locked:
+            db.rollback()
+            return {"skipped": 1}
+
+    active_batch_alert = and_(Alert.batch_id.is_not(None), Alert.is_resolved == False)
+
+    resolved = db.execute(
+        update(Alert)
+        .where(active_batch_alert, Alert.batch_id.in_(select(Batch.id).where(Batch.current_quantity <= 0)))
+        .values(is_resolved=True, resolved_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    escalated = db.execute(
+        update(Alert)
+        .where(
+            active_batch_alert, Alert.severity == "warning",
+            Alert.batch_id.in_(select(Batch.id).where(Batch.expiration_date <= today, Batch.current_quantity > 0))
+        )
+        .values(severity="critical")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    # Партії в наявності (частковий індекс ix_batches_location_expiry_in_stock) без активної тривоги
+    candidates = db.execute(
+        select(Batch.id, Batch.batch_number, Batch.current_quantity, Batch.expiration_date, Medicine.name)
+        .join(Medicine, Batch.medicine_id == Medicine.id)
+        .where(
+            Batch.current_quantity > 0,
+            Batch.expiration_date <= today + timedelta(days=settings.EXPIRY_ALERT_DAYS),
+            ~select(Alert.id).where(Alert.batch_id == Batch.id, Alert.is_resolved == False).exists()
+        )
+    ).all()
+
+    new_alerts = [
+        {
+            "batch_id": batch_id,
+            "severity": "critical" if expiration_date <= today else "warning",
+            "message": f"Expiry: {name} (batch {batch_number}) - {quantity} pcs, expires {expiration_date.isoformat()}",
+            "is_resolved": False
+        }
+        for batch_id, batch_number, quantity, expiration_date, name in candidates
+    ]
+    if new_alerts:
+        db.execute(insert(Alert), new_alerts)
+
+    result = {"raised": len(new_alerts), "escalated": escalated, "resolved": resolved}
+    changed = any(result.values())
+    if changed:
+        log_action(db, user_id=None, action="EXPIRY_SCAN", details=result)
+        publish(db, {"dashboard": None})
+    db.commit()
+    if changed:
+        invalidate_dashboard()
+
+    for alert in new_alerts:
+        EXPIRY_ALERTS_RAISED.inc(severity=alert["severity"])
+    return result
+
+
+def auto_write_off(db: Session, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Автосписання (від імені системи) усього залишку партій, прострочених щонайменше
+    AUTO_WRITE_OFF_GRACE_DAYS днів тому.
+    """
+    today = today or date.today()
+    cutoff = today - timedelta(days=settings.AUTO_WRITE_OFF_GRACE_DAYS)
+    result = write_off_batches(db, None, "Expired (auto write-off)", [Batch.expiration_date <= cutoff])
+    return {"disposed_batches": result["disposed_batches"], "quantity_removed": result["quantity_removed"]}
+
+
+def run_scan_cycle(today: Optional[date] = None, write_off: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Повний прохід: автосписання (якщо write_off) і сканування під одним блокуванням SCAN_LOCK_KEY.
+    Списання комітить кожну порцію окремо, тому на Postgres береться блокування рівня сесії
+    на виділеному з'єднанні і тримається до кінця проходу; xact-блокування в run_expiry_scan
+    тим самим з'єднанням береться повторно без очікування.
+    Повертає {"write_off": ..., "scan": ...} або {"skipped": 1}, якщо прохід виконує інший воркер.
+    """
+    with engine.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            locked = connection.execute(select(func.pg_try_advisory_lock(SCAN_LOCK_KEY))).scalar()
+            connection.commit()
+            if not locked:
+                return {"skipped": 1}
+        try:
+            db = SessionLocal(bind=connection)
+            try:
+                result = {}
+                if write_off:
+                    result["write_off"] = auto_write_off(db, today)
+                result["scan"] = run_expiry_scan(db, today)
+                return result
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+        finally:
+            if postgres:
+                # Блокування рівня сесії переживає повернення з'єднання в пул - знімаємо явно
+                connection.rollback()
+                connection.execute(select(func.pg_advisory_unlock(SCAN_LOCK_KEY)))
+                connection.commit()
+
+
+def scanner_enabled() -> bool:
+    if settings.EXPIRY_SCANNER_ENABLED is not None:
+        return settings.EXPIRY_SCANNER_ENABLED
+    return engine.dialect.name == "postgresql"
+
+
+class ExpiryScanner:
+    """
+    Фоновий потік: сканування термінів придатності (і автосписання, якщо увімкнено)
+    одразу після старту і далі раз на interval секунд.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="expiry-scanner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                logger.info("Expiry scan: %s", run_scan_cycle(write_off=settings.AUTO_WRITE_OFF_ENABLED))
+            except Exception:
+                logger.exception("Expiry scan failed")
+            self._stopped.wait(self.interval)
+
+
+expiry_scanner = ExpiryScanner(settings.EXPIRY_SCAN_INTERVAL_SECONDS)
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import select
+import threading
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import func, select as sql_select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Ідентифікатор цього воркера: власні події він уже застосував локально, з шини їх пропускає
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+# Ліміт payload у NOTIFY - 8000 байт; довші списки ключів замінюються скиданням усього типу
+MAX_PAYLOAD_BYTES = 7900
+
+# Тип події -> обробники; обробник отримує список ключів або None ("скинути все цього типу")
+Handler = Callable[[Optional[List]], None]
+_handlers: Dict[str, List[Handler]] = {}
+_full_flush_handlers: List[Callable[[], None]] = []
+
+
+def subscribe(event_type: str, handler: Handler):
+    """
+    Реєструється власником кешу (модуль, де кеш оголошено).
+    """
+    _handlers.setdefault(event_type, []).append(handler)
+
+
+def on_full_flush(handler: Callable[[], None]):
+    """
+    Повне скидання кешу - після перепідключення слухача, коли частина подій могла загубитися.
+    """
+    _full_flush_handlers.append(handler)
+
+
+def is_enabled() -> bool:
+    return settings.INVALIDATION_BUS_ENABLED and engine.dialect.name == "postgresql"
+
+
+# --- ПУБЛІКАЦІЯ ---
+def _notify_statement(events: Dict[str, Optional[List]]):
+    payload = json.dumps({"origin": ORIGIN, "events": events}, separators=(",", ":"), default=str)
+    if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+        payload = json.dumps({"origin": ORIGIN, "events": {event_type: None for event_type in events}})
+    return sql_select(func.pg_notify(settings.INVALIDATION_CHANNEL, payload))
+
+
+def publish(db: Session, events: Dict[str, Optional[List]]):
+    """
+    Публікує події інвалідації в транзакції запиту: NOTIFY доставляється іншим воркерам
+    тільки після коміту (і не доставляється при відкаті). Викликати перед db.commit().
+    events: {"medicine": [id, ...], "dashboard": None, ...}; None - скинути весь кеш цього типу.
+    Локальні кеші свого воркера оновлює сам обробник запиту, як і раніше.
+    """
+    if is_enabled():
+        db.execute(_notify_statement(events))
+
+
+async def publish_async(db: AsyncSession, events: Dict[str, Optional[List]]):
+    if is_enabled():
+        await db.execute(_notify_statement(events))
+
+
+def dispatch(payload: str):
+    """
+    Застосування однієї події з шини до локальних кешів.
+    """
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("Malformed invalidation payload: %r", payload)
+        return
+    if message.get("origin") == ORIGIN:
+        return
+    for event_type, keys in message.get("events", {}).items():
+        for handler in _handlers.get(event_type, []):
+            try:
+                handler(keys)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", event_type)
+
+
+def full_flush():
+    for handler in _full_flush_handlers:
+        try:
+            handler()
+        except Exception:
+            logger.exception("Full cache flush handler failed")
+
+
+# --- СЛУХАЧ ---
+class InvalidationListener:
+    """
+    Фоновий потік з окремим (поза пулом) з'єднанням psycopg2, що слухає канал LISTEN.
+    Перше з'єднання відкривається синхронно в start() - до побудови кешів у пам'яті,
+    тож подія, закомічена під час побудови, вже чекає в черзі LISTEN.
+    Кожне наступне з'єднання (обрив або невдалий перший LISTEN) супроводжується
+    повним скиданням кешів: події, надіслані поки слухача не було, втрачено.
+    """
+
+    def __init__(self, channel: str, max_backoff: float, poll_interval: float = 5.0):
+        self.channel = channel
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.backend_pid: Optional[int] = None # для перевірок (pg_terminate_backend)
+        self.reconnects = 0
+        self._stopped = threading.Event()
+        self._connection = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if engine.dialect.driver != "psycopg2":
+            logger.warning("Invalidation listener needs psycopg2, got %s - not started", engine.dialect.driver)
+            return
+        self._stopped.clear()
+        try:
+            self._connect()
+        except Exception:
+            logger.exception("Invalidation listener could not connect, retrying in background")
+        self._thread = threading.Thread(target=self._run, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def _connect(self):
+        # Окреме з'єднання, від'єднане від пулу: LISTEN живе стільки, скільки з'єднання
+        raw = engine.raw_connection()
+        raw.detach()
+        connection = raw.dbapi_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        self._connection = connection
+        self.backend_pid = connection.get_backend_pid()
+
+    def _close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+            self.backend_pid = None
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stopped.is_set():
+            try:
+                if self._connection is None:
+                    # З'єднання з start() немає або воно обірвалось: кеші будувались без LISTEN
+                    self._connect()
+                    self.reconnects += 1
+                    logger.warning("Invalidation listener reconnected, flushing local caches")
+                    full_flush()
+                backoff = 0.5
+                self._listen()
+            except Exception:
+                logger.exception("Invalidation listener connection lost")
+            finally:
+                self._close()
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _listen(self):
+        connection = self._connection
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([connection], [], [], self.poll_interval)
+            if not readable:
+                # Тиша в каналі: перевіряємо, що з'єднання живе (інакше обрив помітимо лише з TCP keepalive)
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            connection.poll()
+            while connection.notifies:
+                dispatch(connection.notifies.pop(0).payload)
+
+
+invalidation_listener = InvalidationListener(
+    channel=settings.INVALIDATION_CHANNEL,
+    max_backoff=settings.INVALIDATION_RECONNECT_MAX_SECONDS
+)
@@ -0,0 +1,223 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.models import Medicine
+from app.schemas.inventory_schemas import MedicineResponse
+from app.services import invalidation_bus
+
+FIELDS = list(MedicineResponse.model_fields)
+
+# Ключ сортування видачі: (ранг, назва в нижньому регістрі, id).
+# Ранг 0 - назва починається з q, ранг 1 - q трапляється в назві чи виробнику.
+SortKey = Tuple[int, str, int]
+
+# Від якого розміру найменшої множини триграм вигідніше йти по відсортованих назвах, ніж перетинати множини
+DENSE_CANDIDATES = 1000
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class MedicineIndex:
+    """
+    Довідник ліків у пам'яті процесу для пошуку і пагінації без запитів до БД:
+    відсортовані назви (пошук по префіксу) + триграми назви й виробника (пошук підрядка).
+    Рядки зберігаються у форматі MedicineResponse і серіалізуються напряму.
+    Єдиний індекс назв ліків у процесі: ним же користується пошук наявності (stock_index - лише залишки).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[int, dict] = {}
+        self._sorted: List[Tuple[str, int]] = [] # (name_lower, medicine_id)
+        self._trigrams: Dict[str, Set[int]] = {}
+
+    # --- ПОБУДОВА І ОНОВЛЕННЯ ---
+    def rebuild(self, db: Session):
+        rows = [dict(zip(FIELDS, row)) for row in db.execute(select(*[getattr(Medicine, f) for f in FIELDS])).all()]
+        index = MedicineIndex()
+        for row in rows:
+            index._add(row)
+        index._sorted = sorted((row["name"].lower(), row["id"]) for row in rows)
+        with self._lock:
+            self._rows, self._sorted, self._trigrams = index._rows, index._sorted, index._trigrams
+
+    def reload(self, db: Session, medicine_ids: List[int]):
+        columns = [getattr(Medicine, f) for f in FIELDS]
+        found = {row.id: dict(zip(FIELDS, row)) for row in db.execute(select(*columns).where(Medicine.id.in_(medicine_ids)))}
+        for medicine_id in medicine_ids:
+            if medicine_id in found:
+                self.upsert(found[medicine_id])
+            else:
+                self.remove(medicine_id)
+
+    def upsert(self, row: dict):
+        with self._lock:
+            self._drop(row["id"])
+            self._add(row)
+            insort(self._sorted, (row["name"].lower(), row["id"]))
+
+    def remove(self, medicine_id: int):
+        with self._lock:
+            self._drop(medicine_id)
+
+    def _add(self, row: dict):
+        # Без _sorted: при повній перебудові він сортується один раз наприкінці
+        self._rows[row["id"]] = row
+        for trigram in _trigrams(self._search_text(row)):
+            self._trigrams.setdefault(trigram, set()).add(row["id"])
+
+    def _drop(self, medicine_id: int):
+        row = self._rows.pop(medicine_id, None)
+        if row is None:
+            return
+        entry = (row["name"].lower(), medicine_id)
+        pos = bisect_left(self._sorted, entry)
+        if pos < len(self._sorted) and self._sorted[pos] == entry:
+            del self._sorted[pos]
+        for trigram in _trigrams(self._search_text(row)):
+            ids = self._trigrams.get(trigram)
+            if ids is not None:
+                ids.discard(medicine_id)
+                if not ids:
+                    del self._trigrams[trigram]
+
+    @staticmethod
+    def _search_text(row: dict) -> str:
+        # Розділювач не дає триграмам "склеїти" кінець назви з початком виробника
+        return f"{row['name'].lower()}\x00{(row['manufacturer'] or '').lower()}"
+
+    # --- ПОШУК ---
+    def get(self, medicine_id: int) -> Optional[dict]:
+        return self._rows.get(medicine_id)
+
+    def search_prefix(self, prefix: str, limit: int = 20) -> List[dict]:
+        """
+        Ліки, назва яких починається з prefix (без урахування регістру), у порядку назв.
+        """
+        prefix = prefix.strip().lower()
+        with self._lock:
+            pos = bisect_left(self._sorted, (prefix, -1))
+            head = self._sorted[pos:pos + limit]
+            rows = self._rows
+        return [rows[medicine_id] for name, medicine_id in head if name.startswith(prefix) and medicine_id in rows]
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        manufacturer: Optional[str] = None,
+        prescription: Optional[bool] = None,
+        after: Optional[SortKey] = None,
+        limit: int = 50
+    ) -> Tuple[List[dict], Optional[SortKey]]:
+        """
+        Сторінка результатів після ключа after (keyset-пагінація) і ключ останнього рядка
+        для наступної сторінки (None - сторінка неповна, далі нічого).
+        """
+        q = (q or "").strip().lower()
+        manufacturer = (manufacturer or "").strip().lower()
+        after = after or (0, "", -1)
+        page: List[dict] = []
+        last_key = None
+
+        # Під замком лише копії зрізів списку назв і перетин множин; обхід і фільтрація -
+        # поза ним, щоб довгий пошук не блокував оновлення індексу й інші запити
+        with self._lock:
+            snapshot = self._snapshot(q, after)
+            rows = self._rows
+
+        for key in self._ordered_matches(q, after, rows, *snapshot):
+            row = rows.get(key[2])
+            if row is None: # видалено після знімка
+                continue
+            if manufacturer and not (row["manufacturer"] or "").lower().startswith(manufacturer):
+                continue
+            if prescription is not None and row["is_prescription"] != prescription:
+                continue
+            page.append(row)
+            last_key = key
+            if len(page) == limit:
+                break
+
+        return page, (last_key if len(page) == limit else None)
+
+    def _snapshot(self, q: str, after: SortKey):
+        """
+        (назви з префіксом q після after, відсортовані назви для обходу підрядком, кандидати з триграм).
+        Викликається під замком.
+        """
+        prefixed: List[Tuple[str, int]] = []
+        if after[0] == 0:
+            start = max(bisect_left(self._sorted, (q, -1)), bisect_right(self._sorted, (after[1], after[2])))
+            end = bisect_left(self._sorted, (q + "\U0010ffff", -1)) if q else len(self._sorted)
+            prefixed = self._sorted[start:end]
+
+        # Ранг 1: підрядок у назві чи виробнику (від 3 символів; коротші q шукаються лише по префіксу назви)
+        if len(q) < 3:
+            return prefixed, None, None
+        sets = sorted((self._trigrams.get(t, set()) for t in _trigrams(q)), key=len)
+        after_name, after_id = (after[1], after[2]) if after[0] == 1 else ("", -1)
+        if len(sets[0]) > DENSE_CANDIDATES:
+            # Кожна триграма q дуже поширена (популярний виробник): обхід у порядку назв до
+            # заповнення сторінки дешевший за перетин множин і сортування всіх збігів
+            return prefixed, self._sorted[bisect_right(self._sorted, (after_name, after_id)):], None
+        return prefixed, None, (set.intersection(*sets) if sets[0] else set())
+
+    def _ordered_matches(
+        self,
+        q: str,
+        after: SortKey,
+        rows: Dict[int, dict],
+        prefixed: List[Tuple[str, int]],
+        dense: Optional[List[Tuple[str, int]]],
+        candidates: Optional[Set[int]]
+    ) -> Iterator[SortKey]:
+        # Ранг 0: назва з префіксом q - прямо з відсортованого зрізу
+        for name, medicine_id in prefixed:
+            if name.startswith(q):
+                yield (0, name, medicine_id)
+
+        if dense is not None:
+            for name, medicine_id in dense:
+                if self._is_substring_match(q, rows.get(medicine_id), name):
+                    yield (1, name, medicine_id)
+        elif candidates is not None:
+            after_name, after_id = (after[1], after[2]) if after[0] == 1 else ("", -1)
+            matches = sorted(
+                (1, row["name"].lower(), medicine_id)
+                for medicine_id, row in ((medicine_id, rows.get(medicine_id)) for medicine_id in candidates)
+                if row is not None and self._is_substring_match(q, row, row["name"].lower())
+            )
+            yield from matches[bisect_right(matches, (1, after_name, after_id)):]
+
+    def _is_substring_match(self, q: str, row: Optional[dict], name: str) -> bool:
+        # Триграми дають лише кандидатів; назви з префіксом q уже видані рангом 0
+        return row is not None and not name.startswith(q) and q in self._search_text(row)
+
+medicine_index = MedicineIndex()
+
+
+def medicine_row(medicine: Medicine) -> dict:
+    return {field: getattr(medicine, field) for field in FIELDS}
+
+
+# --- ПОДІЇ З ІНШИХ ВОРКЕРІВ (invalidation_bus) ---
+def _reload(keys):
+    db = SessionLocal()
+    try:
+        if keys is None:
+            medicine_index.rebuild(db)
+        else:
+            medicine_index.reload(db, keys)
+    finally:
+        db.close()
+
+
+invalidation_bus.subscribe("medicine", _reload)
+invalidation_bus.on_full_flush(lambda: _reload(None))
@@ -0,0 +1,147 @@
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    from redis import asyncio as redis_asyncio
+except ImportError:  # Спільний бекенд необов'язковий (requirements-redis.txt)
+    redis_asyncio = None
+
+
+# --- СХОВИЩА БАКЕТІВ ---
+class InMemoryBucketStore:
+    """
+    Бакети в пам'яті процесу. O(1) на перевірку, періодичне прибирання неактивних ключів.
+    take - async лише заради спільного інтерфейсу з Redis: всередині жодного очікування.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self._buckets: Dict[str, List[float]] = {} # key -> [tokens, last_refill, idle_ttl]
+        self._lock = threading.Lock()
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    async def take(self, key: str, rate: float, capacity: int) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_sweep >= self._sweep_interval:
+                self._sweep(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # Повний бакет стає "порожнім місцем" через capacity / rate секунд простою
+                bucket = self._buckets[key] = [float(capacity), now, capacity / rate]
+
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return True, 0.0
+            bucket[0] = tokens
+            return False, (1 - tokens) / rate
+
+    def _sweep(self, now: float):
+        idle = [key for key, (_, last, ttl) in self._buckets.items() if now - last > ttl]
+        for key in idle:
+            del self._buckets[key]
+        self._last_sweep = now
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+_TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBucketStore:
+    """
+    Спільні бакети для кількох воркерів uvicorn. Той самий алгоритм, атомарно через Lua.
+    Асинхронний клієнт: мережевий виклик не блокує цикл подій.
+    """
+
+    def __init__(self, url: str, prefix: str = "pharmasmart:ratelimit:"):
+        if redis_asyncio is None:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed")
+        self._client = redis_asyncio.Redis.from_url(url)
+        self._script = self._client.register_script(_TOKEN_BUCKET_LUA)
+        self._prefix = prefix
+
+    async def take(self, key: str, rate: float, capacity: int) -> Tuple[bool, float]:
+        allowed, tokens = await self._script(keys=[self._prefix + key], args=[rate, capacity, time.time()])
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / rate
+
+
+# --- ЛІМІТЕР ---
+class TokenBucketLimiter:
+    def __init__(self, name: str, per_minute: int, burst: int, store):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.store = store
+
+    async def check(self, key: str) -> Tuple[bool, int]:
+        """
+        Повертає (дозволено, через скільки секунд повторити).
+        """
+        allowed, retry_after = await self.store.take(f"{self.name}:{key}", self.rate, self.capacity)
+        return allowed, math.ceil(retry_after)
+
+
+def _make_store():
+    if settings.RATE_LIMIT_REDIS_URL:
+        return RedisBucketStore(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryBucketStore()
+
+
+_store = _make_store()
+
+login_ip_limiter = TokenBucketLimiter(
+    "login-ip", settings.LOGIN_RATE_PER_IP_PER_MINUTE, settings.LOGIN_BURST_PER_IP, _store
+)
+login_account_ip_limiter = TokenBucketLimiter(
+    "login-account-ip", settings.LOGIN_RATE_PER_ACCOUNT_IP_PER_MINUTE, settings.LOGIN_BURST_PER_ACCOUNT_IP, _store
+)
+login_account_limiter = TokenBucketLimiter(
+    "login-account", settings.LOGIN_RATE_PER_ACCOUNT_PER_MINUTE, settings.LOGIN_BURST_PER_ACCOUNT, _store
+)
+
+
+async def check_login_allowed(client_ip: Optional[str], username: str) -> Tuple[bool, int]:
+    """
+    Перевірка перед будь-якою роботою логіну (БД, bcrypt). Три бакети:
+    - IP: будь-які акаунти з однієї адреси;
+    - пара (акаунт, IP): підбір пароля з однієї адреси обмежено швидко, не зачіпаючи власника акаунта;
+    - акаунт з усіх адрес: ширший ліміт проти підбору, розкиданого по багатьох IP.
+    """
+    client_ip = client_ip or "unknown"
+    account = username.strip().lower()
+    for limiter, key in (
+        (login_ip_limiter, client_ip),
+        (login_account_ip_limiter, f"{account}|{client_ip}"),
+        (login_account_limiter, account),
+    ):
+        allowed, retry_after = await limiter.check(key)
+        if not allowed:
+            return False, retry_after
+    return True, 0
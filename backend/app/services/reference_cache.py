@@ -0,0 +1,166 @@
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import ReferenceVersion
+from app.services import invalidation_bus
+from app.services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Умовні GET для довідників, що змінюються рідко (ліки, аптеки, місця зберігання).
+# Версія - лічильник у таблиці reference_versions: обробник запису збільшує його
+# у своїй транзакції, після коміту застосовує локально і передає іншим воркерам через шину.
+# Аптеки і місця зберігання мають ще й версію кожної аптеки ("locations:5"): зміна в одній
+# аптеці не скидає ETag інших. ETag = ключ версії + версія - однаковий у всіх воркерах
+# і переживає перезапуск. Без шини версія перечитується з БД на кожен умовний GET.
+
+MEDICINES = "medicines"
+PHARMACIES = "pharmacies"
+LOCATIONS = "locations"
+
+
+class CollectionVersions:
+    """
+    Локальна копія версій з reference_versions. Версії лише ростуть: подія з шини,
+    що прийшла пізніше за власний запис, нічого не відкочує.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    def advance(self, versions: Dict[str, int]):
+        with self._lock:
+            for collection, version in versions.items():
+                if version > self._versions.get(collection, 0):
+                    self._versions[collection] = version
+
+    def load(self, db: Session):
+        """
+        Версії з БД - при старті воркера і після перепідключення шини (частина подій могла загубитися).
+        """
+        rows = db.execute(select(ReferenceVersion.collection, ReferenceVersion.version)).all()
+        self.advance(dict(rows))
+
+    async def refresh(self, db: AsyncSession, key: str):
+        version = (await db.execute(
+            select(ReferenceVersion.version).where(ReferenceVersion.collection == key)
+        )).scalar()
+        if version is not None:
+            self.advance({key: version})
+
+    def etag(self, key: str) -> str:
+        with self._lock:
+            return f'"{key}-{self._versions.get(key, 0)}"'
+
+
+collection_versions = CollectionVersions()
+
+# (etag) -> готове тіло відповіді; ETag уже містить ключ версії (колекцію, аптеку) і саму версію.
+# TTL обмежує, як довго тіло живе, якщо подія шини про зміну загубилась.
+_bodies = TTLCache(maxsize=settings.REFERENCE_CACHE_MAX_ENTRIES, ttl=settings.REFERENCE_CACHE_TTL_SECONDS)
+
+
+def reference_cache_stats() -> dict:
+    return _bodies.stats()
+
+
+def clear_bodies():
+    # Дані змінено в обхід API (скрипти засіву) - версії могли не змінитися
+    _bodies.clear()
+
+
+def version_key(collection: str, pharmacy_id: Optional[int] = None) -> str:
+    # None - список усієї мережі (адмін без фільтра)
+    return collection if pharmacy_id is None else f"{collection}:{pharmacy_id}"
+
+
+def pharmacy_keys(collection: str, pharmacy_id: int) -> Tuple[str, str]:
+    # Зміна в аптеці застаріває і її список, і список усієї мережі
+    return collection, version_key(collection, pharmacy_id)
+
+
+def bump_versions(db: Session, *keys: str) -> Dict[str, int]:
+    """
+    Збільшує версії (ключі - колекції або version_key) у транзакції виклику (до publish і коміту)
+    і повертає нові значення.
+    Після коміту: collection_versions.advance(versions); у шину - подія {"reference": versions}.
+    """
+    upsert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+    statement = upsert(ReferenceVersion).values([
+        {"collection": key, "version": 1} for key in sorted(set(keys))
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[ReferenceVersion.collection],
+        set_={"version": ReferenceVersion.version + 1}
+    ).returning(ReferenceVersion.collection, ReferenceVersion.version)
+    return dict(db.execute(statement).all())
+
+
+def _matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+async def conditional_response(
+    request: Request,
+    db: AsyncSession,
+    collection: str,
+    scope: Optional[int],
+    build: Callable[[], Awaitable[bytes]]
+) -> Response:
+    """
+    304, якщо клієнт має актуальну версію (при працюючій шині - без звернення до БД);
+    інакше - тіло з кешу версії або зібране build() (і збережене під версією, прочитаною
+    ДО запиту в БД: запис, що закомітився під час побудови, все одно збільшить версію).
+    scope - аптека (для аптек і місць зберігання), None - уся мережа.
+    """
+    key = version_key(collection, scope)
+    if not invalidation_bus.is_enabled():
+        # Подій про записи інших воркерів не буде - версію бачимо лише в БД
+        await collection_versions.refresh(db, key)
+    etag = collection_versions.etag(key)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = _bodies.get(etag)
+    if body is None:
+        body = await build()
+        _bodies.set(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# --- ПОДІЇ З ІНШИХ ВОРКЕРІВ (invalidation_bus) ---
+def _reload_versions():
+    db = SessionLocal()
+    try:
+        collection_versions.load(db)
+    except Exception:
+        logger.exception("Failed to reload reference versions")
+    finally:
+        db.close()
+
+
+def _on_reference_event(versions):
+    # None - payload не вмістився в NOTIFY, самих версій немає: перечитуємо з БД
+    if versions is None:
+        _reload_versions()
+        return
+    collection_versions.advance(versions)
+
+
+invalidation_bus.subscribe("reference", _on_reference_event)
+invalidation_bus.on_full_flush(_reload_versions)
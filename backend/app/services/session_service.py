@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta, timezone
+from typing import Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.security import create_refresh_token, hash_refresh_token
+from app.db.models import AuthSession, User
+from app.services.cache import TTLCache
+
+
+class RefreshTokenInvalid(Exception):
+    pass
+
+
+# Локальний індекс відкликаних токенів: повторне використання вже ротованого
+# або відкликаного токена відсікається без звернення до БД.
+# Джерело правди - таблиця auth_sessions, тому відкликання в іншому воркері
+# діє одразу: ротація - це один атомарний UPDATE по унікальному хешу.
+_revoked_hashes = TTLCache(maxsize=100_000, ttl=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+
+
+def open_session(db: Session, user_id: int) -> str:
+    """
+    Створює нову сесію і повертає refresh-токен (коміт - на стороні виклику).
+    Лише db.add, тож підходить і для AsyncSession.
+    """
+    token = create_refresh_token()
+    db.add(AuthSession(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        expires_at=datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    return token
+
+
+def rotate_session(db: Session, token: str) -> Tuple[str, str]:
+    """
+    Перевіряє refresh-токен, відкликає його і видає новий.
+    Повертає (email користувача, новий refresh-токен).
+    """
+    token_hash = hash_refresh_token(token)
+    if _revoked_hashes.get(token_hash):
+        raise RefreshTokenInvalid()
+
+    now = datetime.now(timezone.utc)
+    row = db.execute(
+        update(AuthSession)
+        .where(
+            AuthSession.token_hash == token_hash,
+            AuthSession.revoked_at.is_(None),
+            AuthSession.expires_at > now
+        )
+        .values(revoked_at=now)
+        .returning(AuthSession.user_id),
+        execution_options={"synchronize_session": False}
+    ).first()
+
+    if row is None:
+        db.rollback()
+        raise RefreshTokenInvalid()
+
+    user = db.query(User.email, User.is_active).filter(User.id == row.user_id).first()
+    if user is None or not user.is_active:
+        db.rollback()
+        raise RefreshTokenInvalid()
+
+    new_token = open_session(db, row.user_id)
+    db.commit()
+    _revoked_hashes.set(token_hash, True)
+    return user.email, new_token
+
+
+def delete_user_sessions(db: Session, user_id: int):
+    """
+    Перед видаленням користувача. На Postgres сесії видаляє ON DELETE CASCADE;
+    SQLite без PRAGMA foreign_keys каскад не виконує - там один DELETE по user_id.
+    """
+    if db.bind.dialect.name != "sqlite":
+        return
+    db.execute(delete(AuthSession).where(AuthSession.user_id == user_id), execution_options={"synchronize_session": False})
+
+
+def revoke_session(db: Session, token: str):
+    token_hash = hash_refresh_token(token)
+    db.execute(
+        update(AuthSession)
+        .where(AuthSession.token_hash == token_hash, AuthSession.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc)),
+        execution_options={"synchronize_session": False}
+    )
+    db.commit()
+    _revoked_hashes.set(token_hash, True)
+
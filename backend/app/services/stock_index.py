@@ -0,0 +1,173 @@
+import threading
+from bisect import bisect_left, insort
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.db.models import Batch, StorageLocation
+from app.services import invalidation_bus
+
+
+# Кошики терміну придатності: (назва, верхня межа в днях від сьогодні)
+EXPIRY_BUCKETS = [("expired", 0), ("7d", 7), ("30d", 30), ("90d", 90)]
+
+
+class StockIndex:
+    """
+    Мережевий індекс наявності: ліки -> аптеки -> доступна (непрострочена) кількість.
+    Живе в пам'яті процесу, оновлюється інкрементально після кожного коміту складських операцій.
+    Назви ліків і пошук по них - у medicine_index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # batch_id -> (medicine_id, pharmacy_id)
+        self._batches: Dict[int, Tuple[int, int]] = {}
+        # medicine_id -> pharmacy_id -> batch_id -> (quantity, expiration_date)
+        self._stock: Dict[int, Dict[int, Dict[int, Tuple[int, date]]]] = {}
+        # Терміни придатності по аптеках: pharmacy_id -> відсортований список (expiration_date, batch_id)
+        self._expiry: Dict[int, List[Tuple[date, int]]] = {}
+
+    # --- ПОБУДОВА З БАЗИ ---
+    def rebuild(self, db: Session):
+        """
+        Повна перебудова індексу з БД (викликається на старті застосунку).
+        """
+        rows = db.query(
+            Batch.id, Batch.medicine_id, StorageLocation.pharmacy_id,
+            Batch.current_quantity, Batch.expiration_date
+        ).join(StorageLocation).filter(Batch.current_quantity > 0).all()
+
+        batches, stock, expiry = {}, {}, {}
+        for batch_id, medicine_id, pharmacy_id, quantity, expiration_date in rows:
+            batches[batch_id] = (medicine_id, pharmacy_id)
+            stock.setdefault(medicine_id, {}).setdefault(pharmacy_id, {})[batch_id] = (quantity, expiration_date)
+            expiry.setdefault(pharmacy_id, []).append((expiration_date, batch_id))
+        for entries in expiry.values():
+            entries.sort()
+
+        with self._lock:
+            self._batches = batches
+            self._stock = stock
+            self._expiry = expiry
+
+    def reload_batches(self, db: Session, batch_ids: List[int]):
+        """
+        Перечитати залишки вказаних партій з БД (відсутні в БД - видаляються з індексу).
+        """
+        rows = db.query(
+            Batch.id, Batch.medicine_id, StorageLocation.pharmacy_id,
+            Batch.current_quantity, Batch.expiration_date
+        ).join(StorageLocation).filter(Batch.id.in_(batch_ids)).all()
+        found = {row[0]: row for row in rows}
+        for batch_id in batch_ids:
+            if batch_id in found:
+                self.upsert_batch(*found[batch_id])
+            else:
+                self.remove_batch(batch_id)
+
+    # --- ІНКРЕМЕНТАЛЬНІ ОНОВЛЕННЯ ---
+    def upsert_batch(self, batch_id: int, medicine_id: int, pharmacy_id: int, quantity: int, expiration_date: date):
+        with self._lock:
+            self._drop_batch(batch_id)
+            if quantity <= 0:
+                return
+            self._batches[batch_id] = (medicine_id, pharmacy_id)
+            self._stock.setdefault(medicine_id, {}).setdefault(pharmacy_id, {})[batch_id] = (quantity, expiration_date)
+            insort(self._expiry.setdefault(pharmacy_id, []), (expiration_date, batch_id))
+
+    def set_quantity(self, batch_id: int, quantity: int):
+        """
+        Оновлення залишку партії після продажу чи списання.
+        """
+        with self._lock:
+            key = self._batches.get(batch_id)
+            if key is None:
+                return
+            medicine_id, pharmacy_id = key
+            if quantity <= 0:
+                self._drop_batch(batch_id)
+                return
+            batches = self._stock[medicine_id][pharmacy_id]
+            batches[batch_id] = (quantity, batches[batch_id][1])
+
+    def remove_batch(self, batch_id: int):
+        with self._lock:
+            self._drop_batch(batch_id)
+
+    def _drop_batch(self, batch_id: int):
+        key = self._batches.pop(batch_id, None)
+        if key is None:
+            return
+        medicine_id, pharmacy_id = key
+        pharmacies = self._stock.get(medicine_id, {})
+        batches = pharmacies.get(pharmacy_id, {})
+        entry = batches.pop(batch_id, None)
+        if not batches:
+            pharmacies.pop(pharmacy_id, None)
+        if not pharmacies:
+            self._stock.pop(medicine_id, None)
+        if entry is not None:
+            expiry = self._expiry.get(pharmacy_id, [])
+            pos = bisect_left(expiry, (entry[1], batch_id))
+            if pos < len(expiry) and expiry[pos] == (entry[1], batch_id):
+                del expiry[pos]
+
+    # --- ЗАПИТИ ---
+    def availability(self, medicine_id: int, today: Optional[date] = None) -> Dict[int, int]:
+        """
+        Доступна непрострочена кількість по аптеках: {pharmacy_id: quantity}.
+        """
+        today = today or date.today()
+        result = {}
+        with self._lock:
+            for pharmacy_id, batches in self._stock.get(medicine_id, {}).items():
+                total = sum(qty for qty, expiration_date in batches.values() if expiration_date > today)
+                if total > 0:
+                    result[pharmacy_id] = total
+        return result
+
+    def expiry_buckets(self, pharmacy_id: Optional[int], today: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Кошики терміну придатності (без перетинів): прострочено, до 7, до 30 і до 90 днів -
+        кількість партій і одиниць товару.
+        """
+        today = today or date.today()
+        bounds = [(name, today + timedelta(days=days)) for name, days in EXPIRY_BUCKETS]
+        buckets = {name: {"batches": 0, "quantity": 0} for name, _ in EXPIRY_BUCKETS}
+        with self._lock:
+            pharmacies = [pharmacy_id] if pharmacy_id is not None else list(self._expiry)
+            for pid in pharmacies:
+                for expiration_date, batch_id in self._expiry.get(pid, []):
+                    name = next((name for name, bound in bounds if expiration_date <= bound), None)
+                    if name is None:
+                        break
+                    medicine_id, _ = self._batches[batch_id]
+                    buckets[name]["batches"] += 1
+                    buckets[name]["quantity"] += self._stock[medicine_id][pid][batch_id][0]
+        return buckets
+
+stock_index = StockIndex()
+
+
+# --- ПОДІЇ З ІНШИХ ВОРКЕРІВ (invalidation_bus) ---
+def _reload(method_name: str):
+    def handler(keys):
+        db = SessionLocal()
+        try:
+            if keys is None:
+                stock_index.rebuild(db)
+            else:
+                getattr(stock_index, method_name)(db, keys)
+        finally:
+            db.close()
+    return handler
+
+
+def _full_rebuild():
+    _reload("rebuild")(None)
+
+
+invalidation_bus.subscribe("batch", _reload("reload_batches"))
+invalidation_bus.on_full_flush(_full_rebuild)
@@ -0,0 +1,125 @@
+from typing import Iterable, List, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.models import Batch, StockLevel, StorageLocation
+
+# (pharmacy_id, medicine_id)
+Pair = Tuple[int, int]
+
+
+def _aggregate():
+    # Залишки з партій - те, що має лежати в stock_levels
+    return select(
+        StorageLocation.pharmacy_id.label("pharmacy_id"),
+        Batch.medicine_id.label("medicine_id"),
+        func.sum(Batch.current_quantity).label("quantity"),
+        func.min(Batch.expiration_date).label("nearest_expiry")
+    ).join(StorageLocation, Batch.storage_location_id == StorageLocation.id)\
+        .where(Batch.current_quantity > 0)\
+        .group_by(StorageLocation.pharmacy_id, Batch.medicine_id)
+
+
+def _upsert(db: Session):
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+
+
+def refresh_stock_levels(db: Session, pairs: Iterable[Pair]):
+    """
+    Перерахунок рядків stock_levels для пар (аптека, ліки) з партій - у транзакції виклику,
+    ПІСЛЯ flush змін партій і ДО коміту. Два запити незалежно від кількості пар:
+    1. upsert-заглушка блокує рядки пар (у стабільному порядку - без взаємних блокувань).
+       Паралельна транзакція з тими самими парами чекає нашого коміту, тож наступний
+       запит бачить усі вже закомічені зміни партій;
+    2. UPDATE з корельованими підзапитами записує суму і найближчий термін.
+    """
+    pairs = sorted(set(pairs))
+    if not pairs:
+        return
+
+    lock = _upsert(db)(StockLevel).values([
+        {"pharmacy_id": pharmacy_id, "medicine_id": medicine_id, "quantity": 0} for pharmacy_id, medicine_id in pairs
+    ])
+    db.execute(lock.on_conflict_do_update(
+        index_elements=[StockLevel.pharmacy_id, StockLevel.medicine_id],
+        set_={"quantity": lock.table.c.quantity}
+    ))
+
+    in_stock = and_(
+        Batch.storage_location_id == StorageLocation.id,
+        StorageLocation.pharmacy_id == StockLevel.pharmacy_id,
+        Batch.medicine_id == StockLevel.medicine_id,
+        Batch.current_quantity > 0
+    )
+    db.execute(
+        update(StockLevel)
+        .where(tuple_(StockLevel.pharmacy_id, StockLevel.medicine_id).in_(pairs))
+        .values(
+            quantity=select(func.coalesce(func.sum(Batch.current_quantity), 0)).where(in_stock).scalar_subquery(),
+            nearest_expiry=select(func.min(Batch.expiration_date)).where(in_stock).scalar_subquery(),
+            updated_at=func.now()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def refresh_stock_levels_async(db, pairs: Iterable[Pair]):
+    pairs = list(pairs)
+    await db.run_sync(lambda session: refresh_stock_levels(session, pairs))
+
+
+def rebuild_stock_levels(db: Session) -> int:
+    """
+    Повна перебудова з партій (одна транзакція: DELETE + INSERT ... SELECT). Коміт - за викликом.
+    """
+    aggregate = _aggregate().subquery()
+    db.execute(delete(StockLevel))
+    result = db.execute(
+        insert(StockLevel).from_select(
+            ["pharmacy_id", "medicine_id", "quantity", "nearest_expiry"],
+            select(aggregate.c.pharmacy_id, aggregate.c.medicine_id, aggregate.c.quantity, aggregate.c.nearest_expiry)
+        )
+    )
+    return result.rowcount
+
+
+def find_drift(db: Session, limit: int = 100) -> List[dict]:
+    """
+    Розбіжності stock_levels з партіями (FULL OUTER JOIN агрегату і таблиці).
+    Рядок з нульовим залишком і без терміну рівнозначний відсутньому рядку.
+    """
+    aggregate = _aggregate().subquery()
+    expected_quantity = func.coalesce(aggregate.c.quantity, 0)
+    stored_quantity = func.coalesce(StockLevel.quantity, 0)
+    rows = db.execute(
+        select(
+            func.coalesce(aggregate.c.pharmacy_id, StockLevel.pharmacy_id),
+            func.coalesce(aggregate.c.medicine_id, StockLevel.medicine_id),
+            expected_quantity, stored_quantity,
+            aggregate.c.nearest_expiry, StockLevel.nearest_expiry
+        )
+        .select_from(aggregate)
+        .join(
+            StockLevel,
+            and_(StockLevel.pharmacy_id == aggregate.c.pharmacy_id, StockLevel.medicine_id == aggregate.c.medicine_id),
+            full=True
+        )
+        .where(
+            (expected_quantity != stored_quantity)
+            | aggregate.c.nearest_expiry.is_distinct_from(StockLevel.nearest_expiry)
+        )
+        .limit(limit)
+    ).all()
+    return [
+        {
+            "pharmacy_id": pharmacy_id,
+            "medicine_id": medicine_id,
+            "expected_quantity": expected,
+            "stored_quantity": stored,
+            "expected_nearest_expiry": expected_expiry,
+            "stored_nearest_expiry": stored_expiry
+        }
+        for pharmacy_id, medicine_id, expected, stored, expected_expiry, stored_expiry in rows
+    ]
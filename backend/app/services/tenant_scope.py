@@ -0,0 +1,170 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.database import SessionLocal
+from app.db.models import IoTDevice, StorageLocation
+from app.services import invalidation_bus
+
+
+class TenantScope:
+    """
+    Приналежність об'єктів аптекам: місце зберігання -> аптека, датчик -> місце зберігання.
+    Живе в пам'яті процесу (перебудова на старті, оновлення після комітів і подій шини
+    інвалідації), тож перевірка "чи це моя аптека" не потребує запитів до БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._location_pharmacy: Dict[int, int] = {}
+        self._device_location: Dict[int, Optional[int]] = {}
+
+    # --- ПОБУДОВА З БАЗИ ---
+    def rebuild(self, db: Session):
+        locations = db.query(StorageLocation.id, StorageLocation.pharmacy_id).all()
+        devices = db.query(IoTDevice.id, IoTDevice.storage_location_id).all()
+
+        with self._lock:
+            self._location_pharmacy = dict(locations)
+            self._device_location = dict(devices)
+
+    def reload_locations(self, db: Session, location_ids: List[int]):
+        found = dict(
+            db.query(StorageLocation.id, StorageLocation.pharmacy_id)
+            .filter(StorageLocation.id.in_(location_ids)).all()
+        )
+        for location_id in location_ids:
+            if location_id in found:
+                self.set_location(location_id, found[location_id])
+            else:
+                self.remove_location(location_id)
+
+    def reload_devices(self, db: Session, device_ids: List[int]):
+        found = dict(
+            db.query(IoTDevice.id, IoTDevice.storage_location_id)
+            .filter(IoTDevice.id.in_(device_ids)).all()
+        )
+        for device_id in device_ids:
+            if device_id in found:
+                self.set_device(device_id, found[device_id])
+            else:
+                self.remove_device(device_id)
+
+    # --- ІНКРЕМЕНТАЛЬНІ ОНОВЛЕННЯ ---
+    def set_location(self, location_id: int, pharmacy_id: int):
+        with self._lock:
+            self._location_pharmacy[location_id] = pharmacy_id
+
+    def remove_location(self, location_id: int):
+        with self._lock:
+            self._location_pharmacy.pop(location_id, None)
+            # ORM при видаленні місця зберігання відв'язує датчик (storage_location_id = NULL)
+            for device_id, device_location_id in self._device_location.items():
+                if device_location_id == location_id:
+                    self._device_location[device_id] = None
+
+    def set_device(self, device_id: int, location_id: Optional[int]):
+        with self._lock:
+            self._device_location[device_id] = location_id
+
+    def remove_device(self, device_id: int):
+        with self._lock:
+            self._device_location.pop(device_id, None)
+
+    # --- ЗАПИТИ ---
+    def pharmacy_of_location(self, location_id: Optional[int], db: Optional[Session] = None) -> Optional[int]:
+        """
+        Аптека місця зберігання. Якщо місця немає в пам'яті і передано db - дочитується з БД
+        (запис іншого воркера, подія про який ще не дійшла). None - місця не існує.
+        """
+        if location_id is None:
+            return None
+        pharmacy_id = self._location_pharmacy.get(location_id)
+        if pharmacy_id is None and db is not None:
+            pharmacy_id = self.load_location(db, location_id)
+        return pharmacy_id
+
+    def load_location(self, db: Session, location_id: int) -> Optional[int]:
+        pharmacy_id = db.query(StorageLocation.pharmacy_id).filter(StorageLocation.id == location_id).scalar()
+        if pharmacy_id is not None:
+            self.set_location(location_id, pharmacy_id)
+        return pharmacy_id
+
+    def location_of_device(self, device_id: int, db: Optional[Session] = None) -> Optional[int]:
+        if device_id in self._device_location:
+            return self._device_location[device_id]
+        if db is None:
+            return None
+        row = db.query(IoTDevice.storage_location_id).filter(IoTDevice.id == device_id).first()
+        if row is None:
+            return None
+        self.set_device(device_id, row[0])
+        return row[0]
+
+    def pharmacy_of_device(self, device_id: int, db: Optional[Session] = None) -> Optional[int]:
+        return self.pharmacy_of_location(self.location_of_device(device_id, db), db)
+
+
+tenant_scope = TenantScope()
+
+
+def target_pharmacy(current_user, pharmacy_id: Optional[int] = None) -> Tuple[bool, Optional[int]]:
+    """
+    (чи видно користувачу хоч щось, аптека для фільтра - None означає всю мережу).
+    Адмін бачить мережу або pharmacy_id з фільтра, решта - тільки свою аптеку.
+    """
+    if current_user.role == "admin":
+        return True, pharmacy_id
+    if current_user.pharmacy_id:
+        return True, current_user.pharmacy_id
+    return False, None
+
+
+def in_pharmacy(location_column, pharmacy_id: int):
+    """
+    Умова "місце зберігання належить аптеці" - підзапит до storage_locations, а не множина з пам'яті:
+    місце, створене іншим воркером, видно одразу, навіть до події шини (або без шини взагалі).
+    """
+    return location_column.in_(select(StorageLocation.id).where(StorageLocation.pharmacy_id == pharmacy_id))
+
+
+def scope_query(query, current_user, pharmacy_id: Optional[int] = None, *, location_column=None, pharmacy_column=None):
+    """
+    Обмеження запиту списку аптекою користувача (адмін - усією мережею або pharmacy_id з фільтра).
+    location_column - колонка storage_location_id (фільтр підзапитом за місцями зберігання аптеки,
+    див. in_pharmacy); pharmacy_column - колонка pharmacy_id самої таблиці.
+    Повертає None, якщо користувачу не видно нічого (не адмін і без аптеки).
+    """
+    visible, target = target_pharmacy(current_user, pharmacy_id)
+    if not visible:
+        return None
+    if target is None:
+        return query
+    if pharmacy_column is not None:
+        return query.where(pharmacy_column == target)
+    return query.where(in_pharmacy(location_column, target))
+
+
+# --- ПОДІЇ З ІНШИХ ВОРКЕРІВ (invalidation_bus) ---
+def _reload(method_name: str):
+    def handler(keys):
+        db = SessionLocal()
+        try:
+            if keys is None:
+                tenant_scope.rebuild(db)
+            else:
+                getattr(tenant_scope, method_name)(db, keys)
+        finally:
+            db.close()
+    return handler
+
+
+def _full_rebuild():
+    _reload("rebuild")(None)
+
+
+invalidation_bus.subscribe("location", _reload("reload_locations"))
+invalidation_bus.subscribe("device", _reload("reload_devices"))
+invalidation_bus.on_full_flush(_full_rebuild)
@@ -0,0 +1,217 @@
+"""initial schema: усі таблиці та індекси станом на перехід з create_all на міграції
+
+БД, створені раніше через Base.metadata.create_all, позначити без змін: `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 05:13:16.287342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('medicines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('manufacturer', sa.String(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('min_temperature', sa.Float(), nullable=False),
+    sa.Column('max_temperature', sa.Float(), nullable=False),
+    sa.Column('min_humidity', sa.Float(), nullable=True),
+    sa.Column('max_humidity', sa.Float(), nullable=True),
+    sa.Column('is_prescription', sa.Boolean(), nullable=True),
+    sa.Column('requires_smart_lock', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_medicines_id'), 'medicines', ['id'], unique=False)
+
+    op.create_table('pharmacies',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('address', sa.String(), nullable=False),
+    sa.Column('license_number', sa.String(), nullable=False),
+    sa.Column('license_expiry_date', sa.Date(), nullable=True),
+    sa.Column('phone', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('license_number')
+    )
+    op.create_index(op.f('ix_pharmacies_id'), 'pharmacies', ['id'], unique=False)
+
+    op.create_table('storage_locations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pharmacy_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('is_refrigerated', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_storage_locations_id'), 'storage_locations', ['id'], unique=False)
+    op.create_index(op.f('ix_storage_locations_pharmacy_id'), 'storage_locations', ['pharmacy_id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=False),
+    sa.Column('role', sa.String(), nullable=False),
+    sa.Column('pharmacy_id', sa.Integer(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_pharmacy_id'), 'users', ['pharmacy_id'], unique=False)
+
+    op.create_table('audit_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_logs_action_created', 'audit_logs', ['action', 'created_at', 'id'], unique=False)
+    op.create_index('ix_audit_logs_created_id', 'audit_logs', ['created_at', 'id'], unique=False)
+    op.create_index(op.f('ix_audit_logs_id'), 'audit_logs', ['id'], unique=False)
+    op.create_index('ix_audit_logs_user_created', 'audit_logs', ['user_id', 'created_at', 'id'], unique=False)
+
+    # Часткові індекси за ключами з details (ті самі вирази, що й у запитах журналу)
+    audit_logs = sa.table('audit_logs', sa.column('details', sa.JSON), sa.column('created_at'))
+    audit_pharmacy_id = audit_logs.c.details['pharmacy_id'].as_integer()
+    audit_batch_number = audit_logs.c.details['batch_number'].as_string()
+    audit_sale_id = audit_logs.c.details['sale_id'].as_integer()
+    op.create_index('ix_audit_logs_pharmacy_created', 'audit_logs', [audit_pharmacy_id, 'created_at'], unique=False,
+                    postgresql_where=audit_pharmacy_id.is_not(None))
+    op.create_index('ix_audit_logs_batch_number', 'audit_logs', [audit_batch_number], unique=False,
+                    postgresql_where=audit_batch_number.is_not(None))
+    op.create_index('ix_audit_logs_sale_id', 'audit_logs', [audit_sale_id], unique=False,
+                    postgresql_where=audit_sale_id.is_not(None))
+
+    op.create_table('auth_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_auth_sessions_id'), 'auth_sessions', ['id'], unique=False)
+    op.create_index(op.f('ix_auth_sessions_token_hash'), 'auth_sessions', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_auth_sessions_user_id'), 'auth_sessions', ['user_id'], unique=False)
+
+    op.create_table('batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('medicine_id', sa.Integer(), nullable=False),
+    sa.Column('storage_location_id', sa.Integer(), nullable=False),
+    sa.Column('batch_number', sa.String(), nullable=False),
+    sa.Column('initial_quantity', sa.Integer(), nullable=False),
+    sa.Column('current_quantity', sa.Integer(), nullable=False),
+    sa.Column('expiration_date', sa.Date(), nullable=False),
+    sa.Column('arrival_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['medicine_id'], ['medicines.id'], ),
+    sa.ForeignKeyConstraint(['storage_location_id'], ['storage_locations.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_batches_id'), 'batches', ['id'], unique=False)
+
+    op.create_table('iot_devices',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('storage_location_id', sa.Integer(), nullable=True),
+    sa.Column('serial_number', sa.String(), nullable=False),
+    sa.Column('device_type', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('last_seen', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['storage_location_id'], ['storage_locations.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('serial_number'),
+    sa.UniqueConstraint('storage_location_id')
+    )
+    op.create_index(op.f('ix_iot_devices_id'), 'iot_devices', ['id'], unique=False)
+
+    op.create_table('sales',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pharmacy_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=True),
+    sa.Column('total_amount', sa.DECIMAL(precision=10, scale=2), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ),
+    sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sales_id'), 'sales', ['id'], unique=False)
+    op.create_index(op.f('ix_sales_pharmacy_id'), 'sales', ['pharmacy_id'], unique=False)
+
+    op.create_table('alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('severity', sa.String(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('is_resolved', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('resolved_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['device_id'], ['iot_devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_alerts_device_active', 'alerts', ['device_id'], unique=False, postgresql_where=sa.text('is_resolved = false'))
+    op.create_index(op.f('ix_alerts_id'), 'alerts', ['id'], unique=False)
+
+    op.create_table('sale_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sale_id', sa.Integer(), nullable=False),
+    sa.Column('batch_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_at_moment', sa.DECIMAL(precision=10, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['batch_id'], ['batches.id'], ),
+    sa.ForeignKeyConstraint(['sale_id'], ['sales.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sale_items_id'), 'sale_items', ['id'], unique=False)
+
+    op.create_table('sensor_readings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=False),
+    sa.Column('temperature', sa.Float(), nullable=True),
+    sa.Column('humidity', sa.Float(), nullable=True),
+    sa.Column('battery_level', sa.Integer(), nullable=True),
+    sa.Column('recorded_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['device_id'], ['iot_devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sensor_readings_id'), 'sensor_readings', ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    # Індекси видаляються разом з таблицями
+    op.drop_table('sensor_readings')
+    op.drop_table('sale_items')
+    op.drop_table('alerts')
+    op.drop_table('sales')
+    op.drop_table('iot_devices')
+    op.drop_table('batches')
+    op.drop_table('auth_sessions')
+    op.drop_table('audit_logs')
+    op.drop_table('users')
+    op.drop_table('storage_locations')
+    op.drop_table('pharmacies')
+    op.drop_table('medicines')
@@ -0,0 +1,43 @@
+"""expiry: частковий індекс партій за терміном придатності, тривоги терміну придатності
+
+- batches (storage_location_id, expiration_date) WHERE current_quantity > 0
+- alerts.batch_id (тривога партії), alerts.device_id стає необов'язковим
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_batches_location_expiry_in_stock', 'batches', ['storage_location_id', 'expiration_date'],
+                    unique=False, postgresql_where=sa.text('current_quantity > 0'))
+
+    with op.batch_alter_table('alerts') as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_alerts_batch_id_batches', 'batches', ['batch_id'], ['id'], ondelete='CASCADE')
+        batch_op.alter_column('device_id', existing_type=sa.Integer(), nullable=True)
+    op.create_index('ix_alerts_batch_active', 'alerts', ['batch_id'], unique=False,
+                    postgresql_where=sa.text('is_resolved = false'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alerts_batch_active', table_name='alerts')
+    op.execute("DELETE FROM alerts WHERE device_id IS NULL")
+    with op.batch_alter_table('alerts') as batch_op:
+        batch_op.alter_column('device_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_constraint('fk_alerts_batch_id_batches', type_='foreignkey')
+        batch_op.drop_column('batch_id')
+    op.drop_index('ix_batches_location_expiry_in_stock', table_name='batches')
@@ -0,0 +1,52 @@
+"""stock_levels: залишки по (аптека, ліки) - сума партій і найближчий термін придатності
+
+- індекс batches (medicine_id, storage_location_id) WHERE current_quantity > 0 для перерахунку
+
+Таблиця заповнюється одним INSERT ... SELECT з партій; надалі її підтримують обробники
+складських операцій. Перевірка / перебудова: python -m scripts.stock_levels check|rebuild.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_batches_medicine_location_in_stock', 'batches', ['medicine_id', 'storage_location_id'],
+                    unique=False, postgresql_where=sa.text('current_quantity > 0'))
+
+    op.create_table('stock_levels',
+    sa.Column('pharmacy_id', sa.Integer(), nullable=False),
+    sa.Column('medicine_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('nearest_expiry', sa.Date(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['medicine_id'], ['medicines.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('pharmacy_id', 'medicine_id')
+    )
+    op.execute(
+        "INSERT INTO stock_levels (pharmacy_id, medicine_id, quantity, nearest_expiry) "
+        "SELECT storage_locations.pharmacy_id, batches.medicine_id, "
+        "SUM(batches.current_quantity), MIN(batches.expiration_date) "
+        "FROM batches JOIN storage_locations ON storage_locations.id = batches.storage_location_id "
+        "WHERE batches.current_quantity > 0 "
+        "GROUP BY storage_locations.pharmacy_id, batches.medicine_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stock_levels')
+    op.drop_index('ix_batches_medicine_location_in_stock', table_name='batches')
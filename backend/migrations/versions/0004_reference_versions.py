@@ -0,0 +1,33 @@
+"""reference_versions: спільні для воркерів версії довідників (ETag / 304)
+
+Рядки створюються першим записом у колекцію (upsert), тож таблиця стартує порожньою:
+версія 0 для всіх довідників.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reference_versions',
+    sa.Column('collection', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('collection')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reference_versions')
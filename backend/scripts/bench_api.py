@@ -0,0 +1,173 @@
+"""
+Наскрізний бенчмарк API: по сценарію на кожен роутер (auth, pharmacies,
+inventory, iot, sales, admin) з заданою конкурентністю. Результат - пропускна
+здатність і перцентилі латентності по сценаріях, з міткою запуску і комітом,
+щоб порівнювати прогони між ревізіями (--out дописує у спільний JSON-файл).
+
+Дані - з scripts.seed_network (облікові записи bench.*). Сценарій auth.login
+впирається в ліміти входу: для його вимірювання підняти LOGIN_* на сервері.
+
+Запуск (сервер вже працює на засіяній БД):
+    python -m scripts.bench_api --base-url http://localhost:8000 --concurrency 50 --requests 2000 \
+        --label $(git rev-parse --short HEAD) --out bench_results.json
+    python -m scripts.bench_api --scenarios inventory.batches,sales.create --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from scripts.load_test import summarize
+
+# Облікові записи з scripts.seed_network (не імпортуємо його - він тягне за собою підключення до БД)
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "bench.admin@pharmasmart.local"
+
+
+def _sale(ctx, rng):
+    lines = rng.sample(ctx["batch_ids"], k=min(len(ctx["batch_ids"]), rng.randint(1, 3)))
+    body = {"items": [{"batch_id": batch_id, "quantity": 1, "price_per_unit": 100.0} for batch_id in lines]}
+    return "POST", "/sales/", {"json": body, "headers": ctx["manager"]}
+
+
+def _reading(ctx, rng):
+    serial = rng.choice(ctx["serials"])
+    body = {"temperature": round(rng.gauss(5.0, 2.0), 1), "humidity": round(rng.uniform(30, 70), 1), "battery_level": 80}
+    return "POST", f"/iot/devices/{serial}/readings", {"json": body}
+
+
+# Сценарій: (ctx, rng) -> (method, path, kwargs для httpx)
+SCENARIOS = {
+    "auth.login": lambda ctx, rng: ("POST", "/auth/login", {
+        "data": {"username": ctx["manager_email"], "password": BENCH_PASSWORD}
+    }),
+    "pharmacies.list": lambda ctx, rng: ("GET", "/pharmacies/", {"headers": ctx["manager"]}),
+    "pharmacies.locations": lambda ctx, rng: ("GET", "/pharmacies/locations", {"headers": ctx["manager"]}),
+    "inventory.medicines": lambda ctx, rng: ("GET", "/inventory/medicines", {"headers": ctx["manager"]}),
+    "inventory.medicines_search": lambda ctx, rng: ("GET", "/inventory/medicines", {
+        "params": {"q": rng.choice(["Pa", "Ibu", "Amox", "cillin", "Darn"]), "limit": 20}, "headers": ctx["manager"]
+    }),
+    "inventory.batches": lambda ctx, rng: ("GET", "/inventory/batches", {"headers": ctx["manager"]}),
+    "inventory.availability": lambda ctx, rng: ("GET", "/inventory/availability", {
+        "params": {"q": rng.choice(["Para", "Ibu", "Amox", "Insu", "Vit"])}, "headers": ctx["manager"]
+    }),
+    "inventory.expired": lambda ctx, rng: ("GET", "/inventory/expired", {
+        "params": {"days_to_expire": 30}, "headers": ctx["manager"]
+    }),
+    "iot.readings": _reading,
+    "iot.devices": lambda ctx, rng: ("GET", "/iot/devices", {"headers": ctx["manager"]}),
+    "iot.alerts": lambda ctx, rng: ("GET", "/iot/alerts", {"headers": ctx["manager"]}),
+    "sales.create": _sale,
+    "sales.list": lambda ctx, rng: ("GET", "/sales/", {"params": {"limit": 50}, "headers": ctx["manager"]}),
+    "admin.audit_logs": lambda ctx, rng: ("GET", "/admin/audit-logs", {"params": {"limit": 100}, "headers": ctx["admin"]}),
+    "admin.dashboard": lambda ctx, rng: ("GET", "/admin/dashboard-stats", {"headers": ctx["manager"]}),
+}
+
+
+async def login(client, email: str) -> dict:
+    response = await client.post("/auth/login", data={"username": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def prepare(client, pharmacy_id: int) -> dict:
+    manager_email = f"bench.manager.{pharmacy_id}@pharmasmart.local"
+    ctx = {
+        "manager_email": manager_email,
+        "admin": await login(client, ADMIN_EMAIL),
+        "manager": await login(client, manager_email),
+    }
+    batches = (await client.get("/inventory/batches", headers=ctx["manager"])).json()
+    ctx["batch_ids"] = [b["id"] for b in batches if b["current_quantity"] > 10] or [b["id"] for b in batches]
+    devices = (await client.get("/iot/devices", headers=ctx["admin"])).json()
+    ctx["serials"] = [d["serial_number"] for d in devices]
+    return ctx
+
+
+async def run_scenario(client, name, ctx, args):
+    build = SCENARIOS[name]
+    rng = random.Random(args.seed)
+    latencies, statuses = [], {}
+    remaining = args.requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, kwargs = build(ctx, rng)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                code = str(response.status_code)
+            except httpx.HTTPError as e:
+                code = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize(name, latencies, statuses, time.perf_counter() - started)
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)}")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        ctx = await prepare(client, args.pharmacy_id)
+        results = []
+        for name in names:
+            result = await run_scenario(client, name, ctx, args)
+            print(f"{name:<24} {result['throughput_rps']:>9} rps  p50={result['p50_ms']}ms  "
+                  f"p95={result['p95_ms']}ms  p99={result['p99_ms']}ms  {result['statuses']}")
+            results.append(result)
+
+    return {
+        "label": args.label,
+        "commit": current_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", help="Через кому; за замовчуванням - усі: " + ", ".join(SCENARIOS))
+    parser.add_argument("--pharmacy-id", type=int, default=1, help="Аптека, від імені менеджера якої йдуть запити")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000, help="Запитів на сценарій")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="Дописати результат у JSON-файл (список запусків)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+
+    if args.out:
+        try:
+            with open(args.out) as f:
+                runs = json.load(f)
+        except FileNotFoundError:
+            runs = []
+        runs.append(result)
+        with open(args.out, "w") as f:
+            json.dump(runs, f, indent=2)
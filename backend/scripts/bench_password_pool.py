@@ -0,0 +1,92 @@
+"""
+Бенчмарк ізоляції латентності: сплеск логінів (bcrypt у пулі процесів)
+паралельно з легкими запитами до інших маршрутів.
+
+Запуск (з каталогу backend, з налаштованими DATABASE_URL / SECRET_KEY):
+    python -m scripts.bench_password_pool --logins 50 --probes 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.main import app
+from app.db.database import SessionLocal
+from app.db.models import User
+from app.core.security import get_password_hash
+
+BENCH_EMAIL = "bench.login@pharmasmart.local"
+BENCH_PASSWORD = "bench-password"
+
+
+def ensure_bench_user():
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.email == BENCH_EMAIL).first():
+            db.add(User(
+                email=BENCH_EMAIL,
+                hashed_password=get_password_hash(BENCH_PASSWORD),
+                full_name="Benchmark User",
+                role="pharmacist",
+                is_active=True
+            ))
+            db.commit()
+    finally:
+        db.close()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {
+        "p50_ms": round(pick(0.50), 2),
+        "p95_ms": round(pick(0.95), 2),
+        "p99_ms": round(pick(0.99), 2),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+    }
+
+
+async def timed(client, method, url, **kwargs):
+    started = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    return time.perf_counter() - started, response.status_code
+
+
+async def probe_loop(client, count):
+    return [await timed(client, "GET", "/") for _ in range(count)]
+
+
+async def run(logins: int, probes: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Прогрів: запуск процесів пулу не повинен потрапити у вимірювання
+        await timed(client, "POST", "/auth/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        baseline = await probe_loop(client, probes)
+
+        login_tasks = [
+            timed(client, "POST", "/auth/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+            for _ in range(logins)
+        ]
+        results = await asyncio.gather(probe_loop(client, probes), *login_tasks)
+        under_load, login_results = results[0], results[1:]
+
+    statuses = {}
+    for _, code in login_results:
+        statuses[code] = statuses.get(code, 0) + 1
+
+    print("probe GET / (idle):       ", percentiles([t for t, _ in baseline]))
+    print("probe GET / (login burst):", percentiles([t for t, _ in under_load]))
+    print("login latency:            ", percentiles([t for t, _ in login_results]))
+    print("login statuses:           ", statuses)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+
+    ensure_bench_user()
+    asyncio.run(run(args.logins, args.probes))
@@ -0,0 +1,70 @@
+"""
+Мікробенчмарк серіалізації списків: кожен ендпоінт викликається в процесі
+(TestClient, без мережі) у двох режимах - ORM + response_model і швидкий шлях
+(FAST_LIST_SERIALIZATION). Друкує медіану часу, розмір відповіді та перевіряє,
+що обидва режими віддають однаковий JSON.
+
+Запуск (з каталогу backend, на засіяній БД - див. scripts.seed_network):
+    python -m scripts.bench_serialization --repeat 5 --out serialization.json
+"""
+import argparse
+import json
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.config import settings
+from app.core.security import create_access_token
+
+ADMIN_EMAIL = "bench.admin@pharmasmart.local"
+
+ENDPOINTS = [
+    "/inventory/medicines",
+    "/inventory/batches",
+    "/iot/devices",
+    "/iot/alerts",
+]
+
+
+def measure(client, path, headers, repeat):
+    client.get(path, headers=headers) # прогрів (кеш користувача, пул з'єднань)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return statistics.median(timings), response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--email", default=ADMIN_EMAIL, help="Від імені кого запити (адмін бачить усю мережу)")
+    parser.add_argument("--out", help="Зберегти результати у JSON-файл")
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {create_access_token(args.email)}"}
+    results = []
+    with TestClient(app) as client:
+        for path in ENDPOINTS:
+            row = {"endpoint": path}
+            bodies = {}
+            for mode, fast in (("orm", False), ("fast", True)):
+                settings.FAST_LIST_SERIALIZATION = fast
+                elapsed, response = measure(client, path, headers, args.repeat)
+                bodies[mode] = response.json()
+                row[f"{mode}_ms"] = round(elapsed * 1000, 1)
+                row["items"] = len(bodies[mode])
+                row["bytes"] = len(response.content)
+            row["speedup"] = round(row["orm_ms"] / row["fast_ms"], 2) if row["fast_ms"] else None
+            row["identical"] = bodies["orm"] == bodies["fast"]
+            results.append(row)
+            print(f"{path:<24} items={row['items']:<8} orm={row['orm_ms']:>8}ms  fast={row['fast_ms']:>8}ms  "
+                  f"x{row['speedup']}  identical={row['identical']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
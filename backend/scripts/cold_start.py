@@ -0,0 +1,92 @@
+"""
+Вимірювання холодного старту воркера: від запуску процесу uvicorn до першої
+успішної відповіді на GET /. Окремо - час імпорту app.main у чистому інтерпретаторі.
+Порівняння до/після: прогнати на обох ревізіях з різними --label і одним --out.
+
+Запуск (з каталогу backend, з налаштованими DATABASE_URL / SECRET_KEY,
+схема вже створена через `alembic upgrade head`):
+    python -m scripts.cold_start --runs 10 --label migrations --out cold_start.json
+"""
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> float:
+    code = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_response(timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).status_code == 200:
+                    return time.perf_counter() - started
+            except httpx.HTTPError:
+                pass
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            time.sleep(0.01)
+        raise TimeoutError(f"No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(samples):
+    ms = lambda value: round(value * 1000, 1)
+    return {
+        "p50_ms": ms(statistics.median(samples)),
+        "min_ms": ms(min(samples)),
+        "max_ms": ms(max(samples)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="Дописати результат у JSON-файл (список запусків)")
+    args = parser.parse_args()
+
+    import_times = [measure_import() for _ in range(args.runs)]
+    startup_times = [measure_first_response(args.timeout) for _ in range(args.runs)]
+
+    result = {
+        "label": args.label,
+        "runs": args.runs,
+        "import_app": summarize(import_times),
+        "first_response": summarize(startup_times),
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.out:
+        try:
+            with open(args.out) as f:
+                runs = json.load(f)
+        except FileNotFoundError:
+            runs = []
+        runs.append(result)
+        with open(args.out, "w") as f:
+            json.dump(runs, f, indent=2)
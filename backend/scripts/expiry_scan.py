@@ -0,0 +1,23 @@
+"""
+Одноразовий прохід сканера термінів придатності і, за бажанням, автосписання
+(для cron, коли фоновий сканер у воркерах вимкнено: EXPIRY_SCANNER_ENABLED=false або СУБД не PostgreSQL).
+
+Запуск (з каталогу backend):
+    python -m scripts.expiry_scan
+    python -m scripts.expiry_scan --today 2026-01-31   # "що буде на дату" - для перевірки
+    python -m scripts.expiry_scan --write-off          # спершу списати прострочене (AUTO_WRITE_OFF_GRACE_DAYS)
+"""
+import argparse
+import json
+from datetime import date
+
+from app.services.expiry_service import run_scan_cycle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сканування термінів придатності і тривоги партіям")
+    parser.add_argument("--today", type=date.fromisoformat, default=None)
+    parser.add_argument("--write-off", action="store_true", help="Автосписання прострочених партій перед скануванням")
+    args = parser.parse_args()
+
+    # Те саме блокування, що й у фонового сканера: паралельно з воркером прохід не виконується
+    print(json.dumps(run_scan_cycle(today=args.today, write_off=args.write_off)))
@@ -0,0 +1,133 @@
+"""
+Перевірка шини інвалідації (LISTEN/NOTIFY) на локальному PostgreSQL.
+
+Сценарії:
+  - LISTEN активний одразу після start(): подія, закомічена до того, як потік слухача
+    запустився (воркер саме будує індекси), доставляється; повного скидання при цьому немає;
+  - подія, опублікована в транзакції, що відкотилась, не доставляється;
+  - подія "іншого воркера" доставляється після коміту;
+  - власні події воркер пропускає (він уже оновив свої кеші сам);
+  - завеликий список ключів перетворюється на скидання всього типу;
+  - після обриву з'єднання слухача (pg_terminate_backend) він перепідключається,
+    робить повне скидання кешів і знову отримує події.
+
+Запуск (з каталогу backend):
+    DATABASE_URL=postgresql://localhost/pharma_dev python -m scripts.invalidation_bus_check
+"""
+import json
+import queue
+import sys
+import time
+
+from sqlalchemy import func, select, text
+
+from app.db.database import SessionLocal
+from app.services import invalidation_bus
+from app.services.invalidation_bus import InvalidationListener, publish
+
+EVENT_TYPE = "bus_check"
+TIMEOUT = 5.0
+
+received: "queue.SimpleQueue" = queue.SimpleQueue()
+flushes: "queue.SimpleQueue" = queue.SimpleQueue()
+
+
+def notify_as_other_worker(keys):
+    db = SessionLocal()
+    try:
+        payload = json.dumps({"origin": "other-worker", "events": {EVENT_TYPE: keys}})
+        db.execute(select(func.pg_notify(invalidation_bus.settings.INVALIDATION_CHANNEL, payload)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def expect(q, expected, label):
+    try:
+        value = q.get(timeout=TIMEOUT)
+    except queue.Empty:
+        value = "<nothing>"
+    ok = value == expected
+    print(f"{'OK ' if ok else 'FAIL'} {label}: got {value!r}")
+    return ok
+
+
+def expect_nothing(q, label):
+    try:
+        value = q.get(timeout=1.0)
+    except queue.Empty:
+        print(f"OK  {label}")
+        return True
+    print(f"FAIL {label}: got {value!r}")
+    return False
+
+
+def wait_connected(listener, previous_pid=None):
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline:
+        if listener.backend_pid is not None and listener.backend_pid != previous_pid:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+if __name__ == "__main__":
+    if not invalidation_bus.is_enabled():
+        sys.exit("Шина працює тільки на PostgreSQL з INVALIDATION_BUS_ENABLED=true")
+
+    invalidation_bus.subscribe(EVENT_TYPE, received.put)
+    invalidation_bus.on_full_flush(lambda: flushes.put(True))
+
+    listener = InvalidationListener(invalidation_bus.settings.INVALIDATION_CHANNEL, max_backoff=1.0, poll_interval=0.5)
+    listener.start()
+    results = []
+    results.append(listener.backend_pid is not None)
+    print(f"{'OK ' if results[-1] else 'FAIL'} first LISTEN is issued synchronously in start()")
+    if not results[-1]:
+        sys.exit(1)
+
+    notify_as_other_worker([0])
+    results.append(expect(received, [0], "event committed right after start() is delivered"))
+    results.append(expect_nothing(flushes, "no full flush on the first connect"))
+
+    db = SessionLocal()
+    try:
+        publish(db, {EVENT_TYPE: [1]})
+        db.rollback()
+    finally:
+        db.close()
+    results.append(expect_nothing(received, "rolled back event is not delivered"))
+
+    notify_as_other_worker([2])
+    results.append(expect(received, [2], "event from another worker is delivered"))
+
+    db = SessionLocal()
+    try:
+        publish(db, {EVENT_TYPE: [3]})
+        db.commit()
+    finally:
+        db.close()
+    results.append(expect_nothing(received, "own event is skipped"))
+
+    statement = invalidation_bus._notify_statement({EVENT_TYPE: list(range(5000))})
+    channel, payload = statement.compile().params.values()
+    payload = json.loads(payload)
+    results.append(payload["events"] == {EVENT_TYPE: None})
+    print(f"{'OK ' if results[-1] else 'FAIL'} oversized key list falls back to full type flush")
+
+    old_pid = listener.backend_pid
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT pg_terminate_backend(:pid)"), {"pid": old_pid})
+        db.commit()
+    finally:
+        db.close()
+    results.append(wait_connected(listener, previous_pid=old_pid))
+    print(f"{'OK ' if results[-1] else 'FAIL'} listener reconnected (reconnects={listener.reconnects})")
+    results.append(expect(flushes, True, "full flush after reconnect"))
+
+    notify_as_other_worker(None)
+    results.append(expect(received, None, "events are delivered after reconnect"))
+
+    listener.stop()
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,86 @@
+"""
+Навантажувальний тест одного маршруту на великій кількості одночасних з'єднань.
+Порівняння sync/async стеку: запустити сервер на потрібній ревізії і прогнати скрипт
+з однаковими параметрами, результати зберегти з різними --label.
+
+Запуск (сервер вже працює, напр. `uvicorn app.main:app --workers 4`):
+    python -m scripts.load_test --base-url http://localhost:8000 --path /inventory/medicines \
+        --token <JWT> --concurrency 1000 --requests 20000 --label async --out results.json
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+
+def summarize(label, latencies, statuses, elapsed):
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2) if latencies else None
+    return {
+        "label": label,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "statuses": statuses,
+    }
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    body = json.loads(args.body) if args.body else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    latencies, statuses = [], {}
+    remaining = args.requests
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await client.request(args.method, args.path, json=body)
+                    code = str(response.status_code)
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(args.label, latencies, statuses, elapsed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/inventory/medicines")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", help="JSON тіло запиту")
+    parser.add_argument("--token")
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", help="Дописати результат у JSON-файл (список запусків)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+
+    if args.out:
+        try:
+            with open(args.out) as f:
+                runs = json.load(f)
+        except FileNotFoundError:
+            runs = []
+        runs.append(result)
+        with open(args.out, "w") as f:
+            json.dump(runs, f, indent=2)
@@ -0,0 +1,239 @@
+"""
+Перевірка бюджету SQL-запитів на гарячих маршрутах (захист від N+1).
+
+Для кожного масштабу N база наповнюється заново (N ліків/партій/чеків на одному
+місці зберігання), кожен маршрут викликається через TestClient, а всі SQL-запити
+під час виклику підраховуються. Скрипт падає (код виходу 1), якщо:
+  - кількість запитів перевищує бюджет маршруту;
+  - кількість запитів зростає разом з N (очікуємо O(1)).
+У звіті про помилку - перелік запитів, що виконались.
+
+УВАГА: скрипт видаляє і створює всі таблиці - лише для окремої тестової БД.
+
+Запуск (з каталогу backend; за замовчуванням - SQLite у тимчасовому каталозі, що видаляється після перевірки):
+    python -m scripts.query_budget
+    python -m scripts.query_budget --database-url postgresql://localhost/pharma_budget --scales 1,20,200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+SALE_MAX_LINES = 20 # 20 позицій у чеку - типовий великий чек
+
+
+class Budget:
+    def __init__(self, name, max_statements, call, with_bus=0, without_bus=0):
+        self.name = name
+        self.max_statements = max_statements
+        self.call = call # (client, seeded) -> response
+        # Додаткові запити залежно від шини інвалідації (працює лише на PostgreSQL)
+        self.with_bus = with_bus
+        self.without_bus = without_bus
+
+    def limit(self, bus_enabled):
+        return self.max_statements + (self.with_bus if bus_enabled else self.without_bus)
+
+
+# Бюджети гарячих маршрутів. Менеджер уже автентифікований (кеш користувача прогрітий).
+BUDGETS = [
+    # UPDATE партій ... RETURNING, INSERT чека, INSERT позицій, INSERT аудиту (AUDIT_MODE=sync)
+    # і 2 запити перерахунку stock_levels (блокування пар + UPDATE; одним запитом паралельний
+    # продаж тих самих ліків загубив би зміну), незалежно від кількості позицій;
+    # +1 з шиною: NOTIFY (app.services.invalidation_bus)
+    Budget("POST /sales/ (N позицій, до 20)", 6, lambda c, s: c.post("/sales/", headers=s["headers"], json={
+        "items": [{"batch_id": batch_id, "quantity": 1, "price_per_unit": 100.0} for batch_id in s["batch_ids"][:SALE_MAX_LINES]]
+    }), with_bus=1),
+    # Датчик з активними тривогами, ліки місця зберігання, INSERT показника
+    Budget("POST /iot/devices/{serial}/readings", 3, lambda c, s: c.post(
+        f"/iot/devices/{s['serial']}/readings", json={"temperature": 5.0, "humidity": 40.0, "battery_level": 90}
+    )),
+    Budget("GET /sales/", 2, lambda c, s: c.get("/sales/", headers=s["headers"])),
+    Budget("GET /inventory/batches", 1, lambda c, s: c.get("/inventory/batches", headers=s["headers"])),
+    # +1 без шини: версія довідника читається з reference_versions на кожен умовний GET
+    Budget("GET /pharmacies/", 2, lambda c, s: c.get("/pharmacies/", headers=s["admin_headers"]), without_bus=1),
+    Budget("GET /inventory/medicines?q= (індекс у пам'яті)", 0, lambda c, s: c.get(
+        "/inventory/medicines", params={"q": "med", "limit": 20}, headers=s["headers"]
+    )),
+    Budget("GET /inventory/expired (частковий індекс)", 1, lambda c, s: c.get(
+        "/inventory/expired", params={"days_to_expire": 36500}, headers=s["headers"])),
+    Budget("GET /inventory/stock-levels/{id}", 1, lambda c, s: c.get(
+        f"/inventory/stock-levels/{s['medicine_ids'][0]}", headers=s["headers"])),
+    Budget("GET /iot/alerts", 1, lambda c, s: c.get("/iot/alerts", headers=s["headers"])),
+    Budget("GET /admin/dashboard-stats/by-pharmacy", 1, lambda c, s: c.get("/admin/dashboard-stats/by-pharmacy", headers=s["admin_headers"])),
+]
+
+
+class QueryRecorder:
+    """
+    Збирає текст усіх SQL-запитів обох рушіїв (sync і async) у межах capture().
+    """
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self._lock = threading.Lock()
+        self._active = False
+        self.statements = []
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._active:
+            with self._lock:
+                self.statements.append(" ".join(statement.split()))
+
+    @contextmanager
+    def capture(self):
+        self.statements = []
+        self._active = True
+        try:
+            yield self.statements
+        finally:
+            self._active = False
+
+
+def seed(db, scale):
+    """
+    Фікстура даних: одна аптека і холодильник з N ліками (по партії на кожні),
+    N чеків по дві позиції, датчик на холодильнику, адмін і менеджер.
+    Паролі не хешуються - токени видаються напряму.
+    """
+    from app.db.models import Pharmacy, StorageLocation, Medicine, Batch, IoTDevice, Sale, SaleItem, User
+
+    pharmacy = Pharmacy(name="Budget Pharmacy", address="Test st. 1", license_number="BUDGET-1")
+    db.add(pharmacy)
+    db.flush()
+    location = StorageLocation(pharmacy_id=pharmacy.id, name="Fridge", is_refrigerated=True)
+    db.add(location)
+    db.flush()
+
+    admin = User(email="budget.admin@pharmasmart.local", hashed_password="-", full_name="Admin", role="admin")
+    manager = User(email="budget.manager@pharmasmart.local", hashed_password="-", full_name="Manager",
+                   role="manager", pharmacy_id=pharmacy.id)
+    device = IoTDevice(serial_number="BUDGET-SENSOR", device_type="sensor", storage_location_id=location.id)
+    db.add_all([admin, manager, device])
+
+    medicines = [Medicine(name=f"Medicine {i}", min_temperature=2.0, max_temperature=8.0) for i in range(scale)]
+    db.add_all(medicines)
+    db.flush()
+    batches = [
+        Batch(medicine_id=medicine.id, storage_location_id=location.id, batch_number=f"B-{medicine.id}",
+              initial_quantity=1000, current_quantity=1000, expiration_date=date.today() + timedelta(days=365))
+        for medicine in medicines
+    ]
+    db.add_all(batches)
+    db.flush()
+
+    for i in range(scale):
+        sale = Sale(pharmacy_id=pharmacy.id, seller_id=manager.id, total_amount=200.0)
+        db.add(sale)
+        db.flush()
+        db.add_all([
+            SaleItem(sale_id=sale.id, batch_id=batches[i].id, quantity=1, price_at_moment=100.0),
+            SaleItem(sale_id=sale.id, batch_id=batches[(i + 1) % scale].id, quantity=1, price_at_moment=100.0),
+        ])
+    db.commit()
+
+    return {
+        "admin_email": admin.email,
+        "manager_email": manager.email,
+        "serial": device.serial_number,
+        "batch_ids": [batch.id for batch in batches],
+        "medicine_ids": [medicine.id for medicine in medicines],
+    }
+
+
+def reset_state(engine):
+    from app.db.database import Base
+    from app.api.deps import principal_cache
+    from app.services.dashboard_service import dashboard_cache
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    principal_cache.clear()
+    dashboard_cache.clear()
+
+
+def run(scales, show):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.db.database import engine, async_engine, SessionLocal
+    from app.core.security import create_access_token
+    from app.services.stock_index import stock_index
+    from app.services.tenant_scope import tenant_scope
+    from app.services.medicine_index import medicine_index
+    from app.services.reference_cache import clear_bodies, collection_versions
+    from app.services.stock_levels import rebuild_stock_levels
+    from app.services.invalidation_bus import is_enabled as bus_enabled
+
+    recorder = QueryRecorder([engine, async_engine.sync_engine])
+    counts = {budget.name: {} for budget in BUDGETS}
+    failures = []
+
+    reset_state(engine) # старт застосунку (перебудова індексів) потребує вже створених таблиць
+    with TestClient(app) as client:
+        for scale in scales:
+            reset_state(engine)
+            db = SessionLocal()
+            try:
+                seeded = seed(db, scale)
+                stock_index.rebuild(db)
+                tenant_scope.rebuild(db)
+                medicine_index.rebuild(db)
+                rebuild_stock_levels(db)
+                db.commit()
+                # Дані засіяні в обхід API - кешовані тіла довідників недійсні, версії таблиця почала з нуля
+                clear_bodies()
+                collection_versions.load(db)
+            finally:
+                db.close()
+            seeded["headers"] = {"Authorization": f"Bearer {create_access_token(seeded['manager_email'])}"}
+            seeded["admin_headers"] = {"Authorization": f"Bearer {create_access_token(seeded['admin_email'])}"}
+            # Прогрів кешу користувачів: пошук користувача не рахується в бюджет маршруту
+            client.get("/inventory/batches", headers=seeded["headers"])
+            client.get("/inventory/batches", headers=seeded["admin_headers"])
+
+            for budget in BUDGETS:
+                with recorder.capture() as statements:
+                    response = budget.call(client, seeded)
+                if response.status_code >= 400:
+                    failures.append((budget.name, scale, f"HTTP {response.status_code}: {response.text[:200]}", list(statements)))
+                    continue
+                counts[budget.name][scale] = len(statements)
+                if len(statements) > budget.limit(bus_enabled()):
+                    failures.append((budget.name, scale, f"{len(statements)} statements > budget {budget.limit(bus_enabled())}", list(statements)))
+
+    for budget in BUDGETS:
+        by_scale = counts[budget.name]
+        print(f"{budget.name:<45} budget={budget.limit(bus_enabled()):<3} " + "  ".join(f"N={n}: {c}" for n, c in by_scale.items()))
+        if len(set(by_scale.values())) > 1 and max(by_scale.values()) > by_scale[min(by_scale)]:
+            failures.append((budget.name, max(by_scale), f"statement count grows with N: {by_scale}", []))
+
+    for name, scale, reason, statements in failures:
+        print(f"\nFAIL {name} (N={scale}): {reason}")
+        for statement in statements[:show]:
+            print(f"    {statement[:300]}")
+    return not failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=None, help="Окрема БД (таблиці буде перестворено); без параметра - тимчасовий SQLite")
+    parser.add_argument("--scales", default="1,20,100", help="Розміри фікстури через кому")
+    parser.add_argument("--show", type=int, default=30, help="Скільки запитів показати для маршруту, що впав")
+    args = parser.parse_args()
+
+    # Файл, а не sqlite:// - sync і async рушії відкривають окремі з'єднання і мають бачити одну БД
+    with tempfile.TemporaryDirectory(prefix="query_budget_") as scratch:
+        # Налаштування читаються при імпорті app - тому імпортуємо застосунок лише після цього
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(scratch, 'query_budget.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        os.environ.setdefault("SECRET_KEY", "query-budget")
+        os.environ["AUDIT_MODE"] = "sync"
+        os.environ["EXPIRY_SCANNER_ENABLED"] = "false" # фоновий потік не повинен потрапляти в підрахунок
+
+        ok = run([int(s) for s in args.scales.split(",")], args.show)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,147 @@
+"""
+Перевірка маршрутизації читань на репліку і виходу "read-your-writes" (app.db.routing).
+
+"Репліка" - окрема БД з тими самими довідниками, але без частини рядків основної:
+так виглядає репліка, що відстає. Рядки, записані лише в основну БД, показують,
+звідки маршрут прочитав дані. Сценарії (sync- і async-сесії читання):
+  - GET без заголовка і cookie читає з репліки;
+  - GET із заголовком X-Read-Your-Writes: 1 читає з основної БД;
+  - успішний запис ставить cookie, і GET-запити клієнта читають з основної БД,
+    поки не мине READ_YOUR_WRITES_SECONDS, після цього - знову з репліки;
+  - запис, що завершився помилкою, cookie не ставить;
+  - сам запис іде в основну БД, а не в репліку.
+Скрипт падає (код виходу 1), якщо хоч одна перевірка не пройшла.
+
+УВАГА: скрипт видаляє і створює всі таблиці в обох БД - лише для окремих тестових БД.
+
+Запуск (з каталогу backend; за замовчуванням - два SQLite у тимчасовому каталозі):
+    python -m scripts.read_replica_check
+    python -m scripts.read_replica_check --database-url postgresql://localhost:5432/pharma_check \\
+        --replica-url postgresql://localhost:5433/pharma_check
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+STICKY_SECONDS = 1
+
+
+def seed(session_factory, primary: bool):
+    """
+    Однакові аптека, місце зберігання, ліки, партія і користувачі в обох БД;
+    в основній - ще партія PRIMARY-ONLY і чек, яких репліка "ще не отримала".
+    """
+    from app.db.models import Pharmacy, StorageLocation, Medicine, Batch, Sale, User
+
+    db = session_factory()
+    try:
+        pharmacy = Pharmacy(name="Replica Pharmacy", address="Test st. 1", license_number="REPLICA-1")
+        db.add(pharmacy)
+        db.flush()
+        location = StorageLocation(pharmacy_id=pharmacy.id, name="Shelf", is_refrigerated=False)
+        medicine = Medicine(name="Replica Medicine", min_temperature=15.0, max_temperature=25.0)
+        admin = User(email="replica.admin@pharmasmart.local", hashed_password="-", full_name="Admin", role="admin")
+        db.add_all([location, medicine, admin])
+        db.flush()
+        batch = dict(medicine_id=medicine.id, storage_location_id=location.id, initial_quantity=10,
+                     current_quantity=10, expiration_date=date.today() + timedelta(days=365))
+        db.add(Batch(batch_number="BOTH", **batch))
+        if primary:
+            db.add(Batch(batch_number="PRIMARY-ONLY", **batch))
+            db.add(Sale(pharmacy_id=pharmacy.id, seller_id=admin.id, total_amount=1.0))
+        db.commit()
+        return admin.email
+    finally:
+        db.close()
+
+
+def check(results, ok, label):
+    results.append(ok)
+    print(f"{'OK ' if ok else 'FAIL'} {label}")
+
+
+def run():
+    from sqlalchemy import func, select
+    from fastapi.testclient import TestClient
+    from app.core.security import create_access_token
+    from app.db.database import Base, engine, replica_engine, SessionLocal, ReplicaSessionLocal
+    from app.db.models import Medicine, Sale
+    from app.db.routing import READ_YOUR_WRITES_COOKIE, READ_YOUR_WRITES_HEADER
+    from app.main import app
+
+    for bind in (engine, replica_engine):
+        Base.metadata.drop_all(bind=bind)
+        Base.metadata.create_all(bind=bind)
+    admin_email = seed(SessionLocal, primary=True)
+    seed(ReplicaSessionLocal, primary=False)
+    with SessionLocal() as db:
+        sale_id = db.scalar(select(func.max(Sale.id)))
+
+    auth = {"Authorization": f"Bearer {create_access_token(admin_email)}"}
+    primary = {READ_YOUR_WRITES_HEADER: "1"}
+    results = []
+
+    def batch_numbers(client, headers):
+        # async-сесія читання (get_async_read_db)
+        response = client.get("/inventory/batches", headers=headers)
+        response.raise_for_status()
+        return {row["batch_number"] for row in response.json()}
+
+    def sale_status(client, headers):
+        # sync-сесія читання (get_read_db)
+        return client.get(f"/sales/{sale_id}", headers=headers).status_code
+
+    def reads_primary(client, headers):
+        return "PRIMARY-ONLY" in batch_numbers(client, headers) and sale_status(client, headers) == 200
+
+    def reads_replica(client, headers):
+        return batch_numbers(client, headers) == {"BOTH"} and sale_status(client, headers) == 404
+
+    with TestClient(app) as client:
+        check(results, reads_replica(client, auth), "GET without header or cookie reads from the replica")
+        check(results, reads_primary(client, {**auth, **primary}), f"GET with {READ_YOUR_WRITES_HEADER}: 1 reads from the primary")
+
+        response = client.post("/inventory/medicines", headers=auth, json={
+            "name": "Written Medicine", "min_temperature": 15.0, "max_temperature": 25.0
+        })
+        check(results, response.status_code == 201, f"write succeeds (HTTP {response.status_code})")
+        check(results, READ_YOUR_WRITES_COOKIE in response.cookies, "successful write sets the read-your-writes cookie")
+        check(results, reads_primary(client, auth), "GET with the cookie reads from the primary")
+        with SessionLocal() as db, ReplicaSessionLocal() as replica:
+            written = select(func.count()).select_from(Medicine).where(Medicine.name == "Written Medicine")
+            check(results, db.scalar(written) == 1 and replica.scalar(written) == 0, "write goes to the primary")
+
+        time.sleep(STICKY_SECONDS + 0.2)
+        check(results, reads_replica(client, auth), "GET reads from the replica again once the cookie has expired")
+
+        client.cookies.clear()
+        response = client.post("/inventory/medicines", headers=auth, json={})
+        check(results, response.status_code == 422 and READ_YOUR_WRITES_COOKIE not in response.cookies,
+              f"failed write (HTTP {response.status_code}) sets no cookie")
+        check(results, reads_replica(client, auth), "GET after a failed write reads from the replica")
+
+    return all(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=None, help="Основна БД (таблиці буде перестворено); без параметра - тимчасовий SQLite")
+    parser.add_argument("--replica-url", default=None, help="БД у ролі репліки (таблиці буде перестворено); без параметра - тимчасовий SQLite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="read_replica_check_") as scratch:
+        # Налаштування читаються при імпорті app - тому імпортуємо застосунок лише після цього
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(scratch, 'primary.db')}"
+        os.environ["READ_REPLICA_URL"] = args.replica_url or f"sqlite:///{os.path.join(scratch, 'replica.db')}"
+        for name in ("ASYNC_DATABASE_URL", "ASYNC_READ_REPLICA_URL"):
+            os.environ.pop(name, None)
+        os.environ.setdefault("SECRET_KEY", "read-replica-check")
+        os.environ["READ_YOUR_WRITES_SECONDS"] = str(STICKY_SECONDS)
+        os.environ["AUDIT_MODE"] = "sync"
+        os.environ["EXPIRY_SCANNER_ENABLED"] = "false"
+
+        ok = run()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,315 @@
+"""
+Генератор синтетичної мережі аптек для бенчмарків.
+
+Будує реалістичні обсяги: тисячі аптек з холодильниками і датчиками, великий
+довідник ліків, мільйони партій, чеків з позиціями, показників сенсорів і
+записів аудиту. Рядки вставляються пакетами через Core insert (executemany,
+без ORM), ідентифікатори призначаються наперед - тому позиції чеків можуть
+посилатися на партії без RETURNING. Дані дописуються до наявних (id від max+1).
+Наприкінці stock_levels перебудовується з партій (партії вставлено в обхід обробників,
+що його підтримують) і збільшуються версії довідників.
+
+Облікові записи (пароль для всіх - BENCH_PASSWORD):
+    bench.admin@pharmasmart.local, bench.manager.<id>@pharmasmart.local,
+    bench.pharmacist.<id>@pharmasmart.local (id - ідентифікатор аптеки)
+
+Запуск (з каталогу backend, схема вже створена через `alembic upgrade head`):
+    python -m scripts.seed_network --pharmacies 2000 --medicines 20000 --batches 2000000 \
+        --sales 1000000 --readings 3000000 --audit-logs 1000000
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text
+
+from app.db.database import SessionLocal, engine
+from app.db.models import (
+    Pharmacy, StorageLocation, User, Medicine, Batch, IoTDevice, SensorReading, Alert, Sale, SaleItem, AuditLog
+)
+from app.core.security import get_password_hash
+from app.services.reference_cache import LOCATIONS, MEDICINES, PHARMACIES, bump_versions
+from app.services.stock_levels import rebuild_stock_levels
+
+BENCH_PASSWORD = "bench-password"
+ADMIN_EMAIL = "bench.admin@pharmasmart.local"
+
+MANUFACTURERS = ["Darnitsa", "Farmak", "Kyivmedpreparat", "Arterium", "Bayer", "Sanofi", "Teva", "KRKA", "Gedeon Richter"]
+FORMS = ["tablets", "capsules", "syrup", "solution", "ointment", "drops", "spray"]
+SUBSTANCES = [
+    "Paracetamol", "Ibuprofen", "Amoxicillin", "Metformin", "Omeprazole", "Atorvastatin", "Insulin", "Loratadine",
+    "Diclofenac", "Ceftriaxone", "Azithromycin", "Enalapril", "Bisoprolol", "Pantoprazole", "Vitamin D3", "Heparin",
+]
+AUDIT_ACTIONS = ["SALE_CREATED", "BATCH_ADDED", "BATCH_DISPOSED", "USER_CREATED", "ALERT_AUTO_RESOLVED"]
+
+
+class Ids:
+    """
+    Лічильник id для таблиці: продовжує з поточного max(id).
+    """
+
+    def __init__(self, conn, model):
+        self.next = (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    def take(self) -> int:
+        value = self.next
+        self.next += 1
+        return value
+
+
+def bulk_insert(model, rows, chunk_size: int, label: str):
+    """
+    Вставка потоку рядків пакетами, кожен пакет - окрема транзакція.
+    """
+    started = time.perf_counter()
+    total = 0
+    chunk = []
+
+    def flush():
+        nonlocal total
+        with engine.begin() as conn:
+            conn.execute(insert(model), chunk)
+        total += len(chunk)
+        chunk.clear()
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {total:>10} rows  {elapsed:7.1f}s  {total / elapsed if elapsed else 0:,.0f} rows/s")
+
+
+def sync_sequences(models):
+    # id призначались вручну - послідовності PostgreSQL треба підтягнути до max(id)
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for model in models:
+            table = model.__tablename__
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), GREATEST((SELECT MAX(id) FROM {table}), 1))"
+            ))
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    today = date.today()
+    password_hash = get_password_hash(BENCH_PASSWORD) # bcrypt один раз на всіх
+
+    with engine.connect() as conn:
+        ids = {model: Ids(conn, model) for model in (
+            Pharmacy, StorageLocation, User, Medicine, Batch, IoTDevice, SensorReading, Alert, Sale, SaleItem, AuditLog
+        )}
+        has_admin = conn.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first() is not None
+
+    # --- АПТЕКИ, МІСЦЯ ЗБЕРІГАННЯ, ДАТЧИКИ ---
+    pharmacies, locations, devices = [], [], []
+    for _ in range(args.pharmacies):
+        pharmacy_id = ids[Pharmacy].take()
+        pharmacies.append({
+            "id": pharmacy_id,
+            "name": f"Pharmacy #{pharmacy_id}",
+            "address": f"{rng.choice(['Kyiv', 'Lviv', 'Odesa', 'Kharkiv', 'Dnipro'])}, {rng.randint(1, 200)} Main st.",
+            "license_number": f"BENCH-{pharmacy_id}",
+            "license_expiry_date": today + timedelta(days=rng.randint(-30, 1500)),
+            "phone": f"+380{rng.randint(100000000, 999999999)}",
+        })
+        for slot in range(args.locations_per_pharmacy):
+            location_id = ids[StorageLocation].take()
+            refrigerated = slot == 0
+            locations.append({
+                "id": location_id,
+                "pharmacy_id": pharmacy_id,
+                "name": "Fridge" if refrigerated else f"Shelf {slot}",
+                "is_refrigerated": refrigerated,
+            })
+            if refrigerated:
+                devices.append({
+                    "id": ids[IoTDevice].take(),
+                    "storage_location_id": location_id,
+                    "serial_number": f"BENCH-SENSOR-{location_id}",
+                    "device_type": "sensor",
+                    "status": "active",
+                })
+
+    bulk_insert(Pharmacy, pharmacies, args.chunk_size, "pharmacies")
+    bulk_insert(StorageLocation, locations, args.chunk_size, "locations")
+    bulk_insert(IoTDevice, devices, args.chunk_size, "iot_devices")
+
+    # --- КОРИСТУВАЧІ ---
+    def users():
+        if not has_admin:
+            yield {"id": ids[User].take(), "email": ADMIN_EMAIL, "hashed_password": password_hash,
+                   "full_name": "Bench Admin", "role": "admin", "pharmacy_id": None, "is_active": True}
+        for pharmacy in pharmacies:
+            for role in ("manager", "pharmacist"):
+                yield {"id": ids[User].take(), "email": f"bench.{role}.{pharmacy['id']}@pharmasmart.local",
+                       "hashed_password": password_hash, "full_name": f"Bench {role.title()} {pharmacy['id']}",
+                       "role": role, "pharmacy_id": pharmacy["id"], "is_active": True}
+
+    first_user_id = ids[User].next
+    bulk_insert(User, users(), args.chunk_size, "users")
+    user_ids = list(range(first_user_id, ids[User].next))
+
+    # --- ДОВІДНИК ЛІКІВ ---
+    medicines = []
+    for n in range(args.medicines):
+        cold = rng.random() < 0.2
+        medicines.append({
+            "id": ids[Medicine].take(),
+            "name": f"{rng.choice(SUBSTANCES)} {rng.choice([50, 100, 200, 250, 400, 500, 1000])}mg {rng.choice(FORMS)} #{n}",
+            "manufacturer": rng.choice(MANUFACTURERS),
+            "min_temperature": 2.0 if cold else 8.0,
+            "max_temperature": 8.0 if cold else 25.0,
+            "min_humidity": 0.0,
+            "max_humidity": 65.0,
+            "is_prescription": rng.random() < 0.3,
+            "requires_smart_lock": rng.random() < 0.05,
+        })
+    bulk_insert(Medicine, medicines, args.chunk_size, "medicines")
+
+    # --- ПАРТІЇ ---
+    # Холодовий ланцюг: ліки 2-8°C лежать у холодильниках, решта - на полицях (інакше датчики сиплять тривогами)
+    location_pharmacy = {loc["id"]: loc["pharmacy_id"] for loc in locations}
+    fridge_ids = [loc["id"] for loc in locations if loc["is_refrigerated"]]
+    shelf_ids = [loc["id"] for loc in locations if not loc["is_refrigerated"]] or fridge_ids
+    first_batch_id = ids[Batch].next
+    # Аптека кожної партії потрібна для чеків і аудиту - зберігаємо компактно (список за зсувом id)
+    batch_pharmacy = []
+
+    def batches():
+        for _ in range(args.batches):
+            batch_id = ids[Batch].take()
+            medicine = rng.choice(medicines)
+            location_id = rng.choice(fridge_ids if medicine["max_temperature"] <= 8.0 else shelf_ids)
+            batch_pharmacy.append(location_pharmacy[location_id])
+            initial = rng.randint(20, 500)
+            yield {
+                "id": batch_id,
+                "medicine_id": medicine["id"],
+                "storage_location_id": location_id,
+                "batch_number": f"B{batch_id:08d}",
+                "initial_quantity": initial,
+                "current_quantity": rng.randint(0, initial),
+                "expiration_date": today + timedelta(days=rng.randint(-60, 720)),
+                "arrival_date": now - timedelta(days=rng.randint(0, 365)),
+            }
+
+    bulk_insert(Batch, batches(), args.chunk_size, "batches")
+
+    # --- ЧЕКИ ТА ПОЗИЦІЇ ---
+    # Чек і його позиції - в одному пакеті і одній транзакції (FK позицій на чек)
+    started = time.perf_counter()
+    sales_total = items_total = 0
+    sales_rows, item_rows = [], []
+
+    def flush_sales():
+        nonlocal sales_total, items_total
+        with engine.begin() as conn:
+            conn.execute(insert(Sale), sales_rows)
+            conn.execute(insert(SaleItem), item_rows)
+        sales_total += len(sales_rows)
+        items_total += len(item_rows)
+        sales_rows.clear()
+        item_rows.clear()
+
+    for _ in range(args.sales if batch_pharmacy else 0):
+        sale_id = ids[Sale].take()
+        anchor = rng.randrange(len(batch_pharmacy))
+        total = 0.0
+        for _ in range(rng.randint(1, args.max_items_per_sale)):
+            offset = anchor if rng.random() < 0.5 else rng.randrange(len(batch_pharmacy))
+            price = round(rng.uniform(20, 1500), 2)
+            quantity = rng.randint(1, 3)
+            total += price * quantity
+            item_rows.append({"id": ids[SaleItem].take(), "sale_id": sale_id, "batch_id": first_batch_id + offset,
+                              "quantity": quantity, "price_at_moment": price})
+        sales_rows.append({"id": sale_id, "pharmacy_id": batch_pharmacy[anchor], "seller_id": rng.choice(user_ids),
+                           "total_amount": round(total, 2), "status": "completed",
+                           "created_at": now - timedelta(minutes=rng.randint(0, 525600))})
+        if len(sales_rows) >= args.chunk_size:
+            flush_sales()
+    if sales_rows:
+        flush_sales()
+
+    elapsed = time.perf_counter() - started
+    print(f"{'sales+items':<16} {sales_total + items_total:>10} rows  {elapsed:7.1f}s  "
+          f"({sales_total} sales, {items_total} items)")
+
+    # --- ТЕЛЕМЕТРІЯ ТА ТРИВОГИ ---
+    device_ids = [d["id"] for d in devices]
+
+    def readings():
+        for _ in range(args.readings):
+            yield {
+                "id": ids[SensorReading].take(),
+                "device_id": rng.choice(device_ids),
+                "temperature": round(rng.gauss(5.0, 2.5), 1),
+                "humidity": round(rng.uniform(30, 70), 1),
+                "battery_level": rng.randint(5, 100),
+                "recorded_at": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+            }
+
+    def alerts():
+        for device_id in device_ids:
+            if rng.random() < args.alert_ratio:
+                yield {"id": ids[Alert].take(), "device_id": device_id, "severity": "critical",
+                       "message": "Critical: synthetic temperature excursion", "is_resolved": rng.random() < 0.5}
+
+    if device_ids:
+        bulk_insert(SensorReading, readings(), args.chunk_size, "sensor_readings")
+        bulk_insert(Alert, alerts(), args.chunk_size, "alerts")
+
+    # --- ЖУРНАЛ АУДИТУ ---
+    def audit_logs():
+        for _ in range(args.audit_logs):
+            offset = rng.randrange(len(batch_pharmacy))
+            yield {
+                "id": ids[AuditLog].take(),
+                "user_id": rng.choice(user_ids),
+                "action": rng.choice(AUDIT_ACTIONS),
+                "details": {"pharmacy_id": batch_pharmacy[offset], "batch_number": f"B{first_batch_id + offset:08d}"},
+                "created_at": now - timedelta(minutes=rng.randint(0, 525600)),
+            }
+
+    if batch_pharmacy:
+        bulk_insert(AuditLog, audit_logs(), args.chunk_size, "audit_logs")
+
+    sync_sequences([Pharmacy, StorageLocation, User, Medicine, Batch, IoTDevice, SensorReading, Alert, Sale, SaleItem, AuditLog])
+
+    db = SessionLocal()
+    try:
+        stock_started = time.perf_counter()
+        levels = rebuild_stock_levels(db)
+        # Довідники змінено в обхід API: ETag, видані клієнтам до засіву, стають недійсними
+        bump_versions(db, MEDICINES, PHARMACIES, LOCATIONS)
+        db.commit()
+        print(f"{'stock_levels':<16} {levels:>10} rows  {time.perf_counter() - stock_started:7.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pharmacies", type=int, default=1000)
+    parser.add_argument("--locations-per-pharmacy", type=int, default=3, help="Перше місце - холодильник з датчиком")
+    parser.add_argument("--medicines", type=int, default=10000)
+    parser.add_argument("--batches", type=int, default=1000000)
+    parser.add_argument("--sales", type=int, default=500000)
+    parser.add_argument("--max-items-per-sale", type=int, default=5)
+    parser.add_argument("--readings", type=int, default=1000000)
+    parser.add_argument("--alert-ratio", type=float, default=0.1, help="Частка датчиків з тривогою")
+    parser.add_argument("--audit-logs", type=int, default=500000)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args)
+    print(f"done in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,50 @@
+"""
+Обслуговування таблиці stock_levels (залишки по аптеці й ліках).
+
+    check   - порівняти stock_levels з агрегатом партій; код виходу 1, якщо є розбіжності
+    rebuild - перебудувати таблицю з партій в одній транзакції
+
+Запуск (з каталогу backend):
+    python -m scripts.stock_levels check --limit 50
+    python -m scripts.stock_levels rebuild
+    python -m scripts.stock_levels check --fix        # перебудувати лише пари з розбіжностями
+"""
+import argparse
+import sys
+
+from app.db.database import SessionLocal
+from app.services.stock_levels import find_drift, rebuild_stock_levels, refresh_stock_levels
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перевірка і перебудова stock_levels")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--limit", type=int, default=100, help="Скільки розбіжностей показати (check)")
+    parser.add_argument("--fix", action="store_true", help="Перерахувати пари з розбіжностями (check)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            rows = rebuild_stock_levels(db)
+            db.commit()
+            print(f"stock_levels rebuilt: {rows} rows")
+            sys.exit(0)
+
+        drift = find_drift(db, limit=args.limit)
+        for row in drift:
+            print(
+                f"pharmacy={row['pharmacy_id']} medicine={row['medicine_id']} "
+                f"quantity {row['stored_quantity']} != {row['expected_quantity']} "
+                f"nearest_expiry {row['stored_nearest_expiry']} / {row['expected_nearest_expiry']}"
+            )
+        if not drift:
+            print("stock_levels: no drift")
+            sys.exit(0)
+        if args.fix:
+            refresh_stock_levels(db, [(row["pharmacy_id"], row["medicine_id"]) for row in drift])
+            db.commit()
+            print(f"fixed {len(drift)} pairs")
+            sys.exit(0)
+        sys.exit(1)
+    finally:
+        db.close()